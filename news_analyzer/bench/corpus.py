@@ -0,0 +1,118 @@
+"""
+合成新闻语料
+
+按刷新快照的形式生成可复现的合成新闻：中英文混合的标题和摘要、
+若干来源和分类、分布在一段时间内的发布时间，相邻快照之间有一定比例的重复新闻，
+与真实刷新结果的特征接近。语料逐个快照生成，内存中只保留当前快照。
+"""
+
+import random
+from datetime import datetime, timedelta
+
+
+SOURCES = [
+    ('新华网', '国内'), ('人民网', '国内'), ('澎湃新闻', '社会'), ('财新网', '财经'),
+    ('36氪', '科技'), ('NHK国际', '国际'), ('BBC News', 'International'),
+    ('Reuters', 'Business'), ('The Verge', 'Technology'), ('New Scientist', 'Science'),
+]
+
+CJK_WORDS = [
+    '经济', '市场', '政策', '发展', '科技', '人工智能', '数据', '增长', '改革', '国际',
+    '合作', '能源', '气候', '教育', '医疗', '城市', '交通', '金融', '投资', '消费',
+    '创新', '安全', '网络', '芯片', '电池', '汽车', '制造', '出口', '就业', '研究',
+    '会议', '发布', '报告', '预计', '宣布', '推动', '加强', '提升', '全球', '地区',
+]
+
+LATIN_WORDS = [
+    'market', 'policy', 'growth', 'technology', 'climate', 'energy', 'election',
+    'government', 'research', 'company', 'report', 'global', 'trade', 'security',
+    'inflation', 'battery', 'startup', 'science', 'health', 'vaccine', 'chip',
+    'network', 'investment', 'economy', 'launch', 'announce', 'record', 'study',
+]
+
+
+class SyntheticCorpus:
+    """合成新闻语料类"""
+
+    def __init__(self, total_items, items_per_snapshot=1000, repeat_ratio=0.3,
+                 days=30, end=None, seed=42):
+        """初始化语料
+
+        Args:
+            total_items: 所有快照中的新闻总条数（包含重复出现的新闻）
+            items_per_snapshot: 每个快照的条目数
+            repeat_ratio: 每个快照中与上一个快照重复的新闻比例
+            days: 快照覆盖的天数
+            end: 最后一个快照的时间（默认为今天零点，使所有快照都早于今天）
+            seed: 随机种子
+        """
+        self.total_items = total_items
+        self.items_per_snapshot = items_per_snapshot
+        self.repeat_ratio = repeat_ratio
+        self.days = days
+        self.end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.seed = seed
+
+    @property
+    def snapshot_count(self):
+        return max(1, -(-self.total_items // self.items_per_snapshot))
+
+    @property
+    def start(self):
+        return self.end - timedelta(days=self.days)
+
+    def _text(self, rng, words):
+        """生成一段中英文混合文本"""
+        parts = []
+        for _ in range(words):
+            if rng.random() < 0.6:
+                parts.append(''.join(rng.choice(CJK_WORDS) for _ in range(rng.randint(1, 3))))
+            else:
+                parts.append(rng.choice(LATIN_WORDS))
+        return ' '.join(parts)
+
+    def _item(self, rng, serial, saved_at):
+        source_name, category = SOURCES[serial % len(SOURCES)]
+        published = saved_at - timedelta(minutes=rng.randint(0, 720))
+        return {
+            'title': self._text(rng, rng.randint(4, 10)),
+            'link': f"https://news.example.com/{serial}",
+            'description': self._text(rng, rng.randint(20, 60)),
+            'pub_date': published.strftime('%a, %d %b %Y %H:%M:%S +0800'),
+            'source_name': source_name,
+            'source_url': f"https://news.example.com/{source_name}/rss",
+            'category': category,
+            'collected_at': saved_at.strftime('%Y-%m-%d %H:%M:%S')
+        }
+
+    def snapshots(self):
+        """按时间顺序生成快照
+
+        Yields:
+            tuple: (快照文件名, 新闻条目列表)
+        """
+        rng = random.Random(self.seed)
+        count = self.snapshot_count
+        step = timedelta(days=self.days) / count
+        serial = 0
+        previous = []
+        remaining = self.total_items
+
+        for index in range(count):
+            saved_at = self.start + step * index
+            size = min(self.items_per_snapshot, remaining)
+            remaining -= size
+
+            repeats = min(len(previous), int(size * self.repeat_ratio))
+            items = rng.sample(previous, repeats) if repeats else []
+            while len(items) < size:
+                items.append(self._item(rng, serial, saved_at))
+                serial += 1
+
+            previous = items
+            yield saved_at.strftime('news_%Y%m%d_%H%M%S.json'), items
+
+    def sample_queries(self, count=10, seed=None):
+        """生成用于搜索基准的查询词"""
+        rng = random.Random(self.seed if seed is None else seed)
+        return [rng.choice(CJK_WORDS + LATIN_WORDS) for _ in range(count)]
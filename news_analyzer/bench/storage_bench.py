@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+存储基准测试
+
+为每种存储后端生成合成语料，分别测量写入、完整加载、分页读取、快照列表、
+时间范围查询、全文搜索和快照整理的耗时，结果写入JSON文件，便于比较不同版本。
+
+用法:
+    python bench/storage_bench.py --sizes 10000 100000 --backends json sqlite
+    python bench/storage_bench.py --sizes 1000000 --data-root /dev/shm/bench
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+
+# 确保项目根目录在Python路径中
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from news_analyzer.storage.news_storage import NewsStorage
+from news_analyzer.storage.backends import BACKENDS
+from news_analyzer.storage.compactor import SnapshotCompactor
+
+from bench.corpus import SyntheticCorpus
+
+
+class Timer:
+    """记录一组操作耗时的计时器"""
+
+    def __init__(self):
+        self.samples = []
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self._started)
+        return False
+
+    def summary(self, items=None):
+        """汇总耗时（秒），items为处理的条目数时附带吞吐量"""
+        samples = sorted(self.samples)
+        total = sum(samples)
+        result = {
+            'runs': len(samples),
+            'total_s': round(total, 6),
+            'mean_s': round(total / len(samples), 6) if samples else None,
+            'p50_s': round(samples[len(samples) // 2], 6) if samples else None,
+            'max_s': round(samples[-1], 6) if samples else None
+        }
+        if items is not None and total > 0:
+            result['items_per_s'] = round(items / total, 1)
+        return result
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_root,
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def bench_backend(backend, corpus, data_dir, samples, rng):
+    """对一个后端运行全部基准
+
+    Returns:
+        dict: 各项操作的耗时汇总
+    """
+    results = {}
+    storage = NewsStorage(data_dir, backend=backend)
+
+    # 写入：逐个保存快照（包含索引和统计的增量更新）
+    write = Timer()
+    for filename, items in corpus.snapshots():
+        with write:
+            storage.save_news(items, filename)
+    results['write'] = write.summary(corpus.total_items)
+
+    # 快照列表
+    listing = Timer()
+    for _ in range(samples):
+        with listing:
+            files = storage.list_news_files()
+            storage.snapshot_catalog()
+    results['list'] = listing.summary()
+    results['snapshots'] = len(files)
+    results['disk_bytes'] = sum(size for _, _, size in storage.snapshot_catalog())
+
+    picks = [rng.choice(files) for _ in range(samples)]
+
+    # 完整加载：冷读取（清空缓存）和热读取（命中缓存）
+    cold, warm = Timer(), Timer()
+    loaded = 0
+    for filename in picks:
+        storage.snapshot_cache.clear()
+        with cold:
+            loaded += len(storage.load_news(filename))
+        with warm:
+            storage.load_news(filename)
+    results['load_cold'] = cold.summary(loaded)
+    results['load_warm'] = warm.summary(loaded)
+
+    # 分页读取：首页延迟和完整遍历
+    first_page, full_scan = Timer(), Timer()
+    scanned = 0
+    for filename in picks:
+        storage.snapshot_cache.clear()
+        with first_page:
+            pages = storage.iter_news_pages(filename, 200)
+            next(pages, None)
+            pages.close()
+        storage.snapshot_cache.clear()
+        with full_scan:
+            for page in storage.iter_news_pages(filename, 200):
+                scanned += len(page)
+    results['page_first'] = first_page.summary()
+    results['page_scan'] = full_scan.summary(scanned)
+
+    # 时间范围查询：首次查询需要建立时间索引
+    first_query, query = Timer(), Timer()
+    with first_query:
+        storage.query(limit=500)
+    for _ in range(samples):
+        start = corpus.start + timedelta(days=rng.uniform(0, corpus.days - 1))
+        with query:
+            storage.query(start, start + timedelta(days=1), limit=500)
+    results['query_index_build'] = first_query.summary()
+    results['query'] = query.summary()
+
+    # 全文搜索：写入时已增量建立索引
+    search = Timer()
+    for word in corpus.sample_queries(samples):
+        with search:
+            storage.search(word, limit=50)
+    results['search'] = search.summary()
+
+    # 快照整理：所有快照都早于今天，全部合并为日归档和月归档
+    compaction = Timer()
+    with compaction:
+        summary = SnapshotCompactor(storage, monthly_after_days=corpus.days // 2).run()
+    results['compaction'] = compaction.summary(corpus.total_items)
+    results['compaction_summary'] = summary
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新闻存储基准测试")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                        help="语料规模（新闻条数），可指定多个")
+    parser.add_argument('--backends', nargs='+', default=sorted(BACKENDS),
+                        choices=sorted(BACKENDS), help="要测试的存储后端")
+    parser.add_argument('--items-per-snapshot', type=int, default=1000,
+                        help="每个快照的新闻条数")
+    parser.add_argument('--days', type=int, default=30, help="语料覆盖的天数")
+    parser.add_argument('--samples', type=int, default=20, help="读取和查询类操作的重复次数")
+    parser.add_argument('--data-root', default=None,
+                        help="存放测试数据的目录（默认使用临时目录，可指定tmpfs或其他磁盘）")
+    parser.add_argument('--output', default=None,
+                        help="结果文件路径（默认写入 bench/results/）")
+    parser.add_argument('--label', default=None, help="结果标签，如版本号")
+    parser.add_argument('--keep', action='store_true', help="保留生成的测试数据")
+    args = parser.parse_args()
+
+    report = {
+        'label': args.label,
+        'revision': _git_revision(),
+        'created_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'params': {
+            'items_per_snapshot': args.items_per_snapshot,
+            'days': args.days,
+            'samples': args.samples,
+            'data_root': args.data_root
+        },
+        'runs': []
+    }
+
+    root = args.data_root or tempfile.mkdtemp(prefix='news_bench_')
+    os.makedirs(root, exist_ok=True)
+
+    try:
+        for size in args.sizes:
+            corpus = SyntheticCorpus(size, args.items_per_snapshot, days=args.days)
+            for backend in args.backends:
+                data_dir = os.path.join(root, f"{backend}_{size}")
+                shutil.rmtree(data_dir, ignore_errors=True)
+
+                print(f"[{backend}] {size} 条新闻 ({corpus.snapshot_count} 个快照)...", flush=True)
+                started = time.perf_counter()
+                results = bench_backend(backend, corpus, data_dir, args.samples,
+                                        random.Random(size))
+                print(f"[{backend}] 完成，用时 {time.perf_counter() - started:.1f} 秒", flush=True)
+
+                report['runs'].append({'backend': backend, 'items': size, 'results': results})
+                if not args.keep:
+                    shutil.rmtree(data_dir, ignore_errors=True)
+    finally:
+        if not args.keep and not args.data_root:
+            shutil.rmtree(root, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"storage_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,7 @@ import os
 import logging
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QIcon
+from PyQt5.QtCore import QSettings
 
 # 确保项目根目录在Python路径中
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -20,7 +21,7 @@ if project_root not in sys.path:
 
 # 导入项目模块
 from news_analyzer.ui.main_window import MainWindow
-from news_analyzer.storage.news_storage import NewsStorage
+from news_analyzer.storage.news_storage import NewsStorage, DATA_DIR_ENV, BACKEND_ENV
 from news_analyzer.collectors.rss_collector import RSSCollector
 from news_analyzer.collectors.default_sources import initialize_sources
 
@@ -54,8 +55,12 @@ def main():
     logger = setup_logging()
     
     try:
-        # 初始化数据存储
-        storage = NewsStorage()
+        # 初始化数据存储：环境变量优先，其次是应用设置
+        settings = QSettings("NewsAnalyzer", "NewsAggregator")
+        storage = NewsStorage(
+            data_dir=os.environ.get(DATA_DIR_ENV) or settings.value("storage/data_dir") or None,
+            backend=os.environ.get(BACKEND_ENV) or settings.value("storage/backend") or None
+        )
         
         # 初始化RSS收集器
         rss_collector = RSSCollector()
@@ -0,0 +1,198 @@
+"""
+LLM分析结果缓存
+
+将分析结果持久化到 data/analysis 目录，前面加一层内存LRU缓存。
+相同的新闻内容、分析类型、模型和提示词版本只需调用一次API。
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    """分析结果缓存类"""
+
+    def __init__(self, cache_dir, max_memory_items=256, max_disk_bytes=50 * 1024 * 1024):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缓存文件目录
+            max_memory_items: 内存中最多缓存的结果数
+            max_disk_bytes: 磁盘缓存的最大总字节数，超出时淘汰最久未使用的结果
+        """
+        self.logger = logging.getLogger('news_analyzer.llm.analysis_cache')
+        self.cache_dir = cache_dir
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+
+        # 磁盘缓存索引: {key: (文件大小, 最近访问时间)}，首次使用时扫描目录建立
+        self._disk_index = None
+        self._disk_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """根据若干组成部分生成缓存键
+
+        Args:
+            *parts: 组成缓存键的字符串或数字
+
+        Returns:
+            str: 十六进制SHA-256缓存键
+        """
+        raw = '\x1f'.join(str(part) for part in parts)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_disk_index(self):
+        """扫描缓存目录，建立磁盘缓存索引"""
+        if self._disk_index is not None:
+            return
+
+        self._disk_index = {}
+        self._disk_bytes = 0
+        try:
+            for filename in os.listdir(self.cache_dir):
+                if not filename.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, filename))
+                except OSError:
+                    continue
+                self._disk_index[filename[:-5]] = (stat.st_size, stat.st_mtime)
+                self._disk_bytes += stat.st_size
+        except OSError as e:
+            self.logger.error(f"扫描分析缓存目录失败: {str(e)}")
+
+    def _remember(self, key, value):
+        """放入内存LRU缓存"""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """读取缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的值，未命中时返回None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+            self._load_disk_index()
+            if key not in self._disk_index:
+                self.misses += 1
+                return None
+
+            path = self._path(key)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    value = json.load(f).get('value')
+                # 更新访问时间，使淘汰顺序在重启后仍然有效
+                now = time.time()
+                os.utime(path, (now, now))
+                self._disk_index[key] = (self._disk_index[key][0], now)
+            except Exception as e:
+                self.logger.warning(f"读取分析缓存失败: {str(e)}")
+                self._forget_disk(key)
+                self.misses += 1
+                return None
+
+            self._remember(key, value)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, **meta):
+        """写入缓存
+
+        Args:
+            key: 缓存键
+            value: 可JSON序列化的值
+            **meta: 附加的元数据（仅用于排查，不参与读取）
+        """
+        with self._lock:
+            self._remember(key, value)
+            self._load_disk_index()
+
+            path = self._path(key)
+            tmp_path = path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({
+                        'created_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                        'meta': meta,
+                        'value': value
+                    }, f, ensure_ascii=False)
+                os.replace(tmp_path, path)
+                size = os.path.getsize(path)
+            except Exception as e:
+                self.logger.error(f"写入分析缓存失败: {str(e)}")
+                return
+
+            self._forget_disk(key, remove_file=False)
+            self._disk_index[key] = (size, time.time())
+            self._disk_bytes += size
+            self._evict()
+
+    def _forget_disk(self, key, remove_file=True):
+        """从磁盘缓存索引中移除"""
+        entry = self._disk_index.pop(key, None)
+        if entry:
+            self._disk_bytes -= entry[0]
+        if remove_file:
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """淘汰最久未使用的磁盘缓存，直到总大小不超过上限"""
+        if self._disk_bytes <= self.max_disk_bytes:
+            return
+
+        evicted = 0
+        for key, _ in sorted(self._disk_index.items(), key=lambda kv: kv[1][1]):
+            if self._disk_bytes <= self.max_disk_bytes:
+                break
+            self._forget_disk(key)
+            self._memory.pop(key, None)
+            evicted += 1
+
+        self.logger.info(f"分析缓存超出上限，淘汰了 {evicted} 条结果")
+
+    def stats(self):
+        """获取缓存统计信息
+
+        Returns:
+            dict: 命中数、未命中数、内存条目数、磁盘条目数和磁盘占用字节数
+        """
+        with self._lock:
+            self._load_disk_index()
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'memory_items': len(self._memory),
+                'disk_items': len(self._disk_index),
+                'disk_bytes': self._disk_bytes
+            }
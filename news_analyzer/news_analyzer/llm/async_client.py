@@ -0,0 +1,278 @@
+"""
+异步LLM客户端
+
+基于aiohttp的非阻塞客户端，用于无界面的批量任务：一个事件循环中可以同时进行
+数百个请求，而不需要为每个请求占用一个线程。接口类型判断、请求构造、结果解析、
+分析缓存、重试策略和限流都与 LLMClient 一致。分析缓存的读写涉及文件IO，
+放在线程池中执行，不阻塞事件循环。
+
+aiohttp是可选依赖，未安装时创建 AsyncLLMClient 会抛出ImportError。
+
+用法:
+    async with AsyncLLMClient() as client:
+        async for result in client.analyze_many(news_items, concurrency=100):
+            ...
+"""
+
+import asyncio
+import logging
+import functools
+
+try:
+    import aiohttp
+except ImportError:  # 可选依赖
+    aiohttp = None
+
+from news_analyzer.llm.llm_client import LLMClient
+from news_analyzer.llm.stream_decoder import StreamParser
+
+
+class AsyncLLMClient:
+    """异步LLM客户端类"""
+
+    def __init__(self, api_key=None, api_url=None, model=None, analysis_cache=None,
+                 timeout=None, retry_count=None, requests_per_minute=None, max_connections=100):
+        """初始化异步客户端
+
+        Args:
+            api_key, api_url, model, analysis_cache, timeout, retry_count, requests_per_minute:
+                与 LLMClient 相同
+            max_connections: 连接池的最大连接数（即同时进行的最大请求数）
+
+        Raises:
+            ImportError: 未安装aiohttp
+        """
+        if aiohttp is None:
+            raise ImportError("AsyncLLMClient 需要 aiohttp，请先安装: pip install aiohttp")
+
+        self.logger = logging.getLogger('news_analyzer.llm.async_client')
+
+        # 同步客户端只用于提供配置和各API的请求构造、结果解析，不会发送请求
+        self.provider = LLMClient(
+            api_key=api_key, api_url=api_url, model=model, analysis_cache=analysis_cache,
+            timeout=timeout, retry_count=retry_count, requests_per_minute=requests_per_minute
+        )
+        self.max_connections = max_connections
+        self._session = None
+
+        # 可重试的网络异常
+        self._retryable_exceptions = (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError
+        )
+
+    @property
+    def api_type(self):
+        return self.provider.api_type
+
+    @property
+    def model(self):
+        return self.provider.model
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _get_session(self):
+        """获取连接池会话（需要在事件循环中调用，首次使用时创建）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections,
+                keepalive_timeout=30
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _post(self, data, timeout=None):
+        """发送请求，按重试策略重试临时错误
+
+        Args:
+            data: 请求数据
+            timeout: 单次尝试的超时（秒），默认使用客户端设置
+
+        Returns:
+            aiohttp.ClientResponse: 响应对象，调用方读取完毕后需要释放
+        """
+        session = self._get_session()
+        headers = self.provider._get_headers()
+
+        async def send(attempt_timeout):
+            return await session.post(
+                self.provider.api_url,
+                headers=headers,
+                json=data,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=attempt_timeout,
+                                              sock_read=attempt_timeout)
+            )
+
+        return await self.provider.retry_policy.run_async(
+            send, timeout or self.provider.timeout, self._retryable_exceptions
+        )
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在默认线程池中执行阻塞调用（如分析缓存的文件读写）"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def _post_json(self, data):
+        """发送非流式请求并解析JSON响应"""
+        response = await self._post(data)
+        async with response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def analyze_news(self, news_item, analysis_type='摘要', use_cache=True):
+        """分析新闻
+
+        Args:
+            news_item: 新闻数据字典
+            analysis_type: 分析类型，默认为'摘要'
+            use_cache: 是否使用分析结果缓存
+
+        Returns:
+            str: 格式化的分析结果HTML
+        """
+        provider = self.provider
+        if not news_item:
+            raise ValueError("新闻数据不能为空")
+
+        if not provider.api_key:
+            return provider._mock_analysis(news_item, analysis_type)
+
+        if use_cache and provider.analysis_cache:
+            cached = await self._run_blocking(provider.get_cached_analysis, news_item, analysis_type)
+            if cached is not None:
+                return cached
+
+        prompt = provider._get_prompt(analysis_type, news_item)
+        try:
+            result = await self._post_json(provider._build_analysis_payload(prompt))
+            return await self._run_blocking(
+                provider._finish_analysis, news_item, analysis_type, result
+            )
+        except Exception as e:
+            self.logger.error(f"调用LLM API失败: {str(e)}")
+            raise
+
+    async def chat(self, messages, context=""):
+        """聊天（非流式）
+
+        Args:
+            messages: 聊天历史消息列表
+            context: 上下文文本，默认为空
+
+        Returns:
+            str: 回复内容
+        """
+        if not self.provider.api_key:
+            return "API密钥未设置，请在设置中配置有效的API密钥。"
+
+        processed_messages = self.provider._prepare_chat_messages(messages, context)
+        result = await self._post_json(self.provider._build_chat_payload(processed_messages))
+        content = self.provider._extract_content_from_response(result)
+        if not content:
+            raise ValueError("API返回的内容为空")
+        return content
+
+    async def stream_chat(self, messages, context=""):
+        """流式聊天
+
+        Args:
+            messages: 聊天历史消息列表
+            context: 上下文文本，默认为空
+
+        Yields:
+            str: 回复的文本增量
+        """
+        if not self.provider.api_key:
+            yield "API密钥未设置，请在设置中配置有效的API密钥。"
+            return
+
+        processed_messages = self.provider._prepare_chat_messages(messages, context)
+        response = await self._post(self.provider._build_chat_payload(processed_messages, stream=True))
+        async with response:
+            response.raise_for_status()
+
+            # 服务端忽略了stream参数，直接返回完整的JSON
+            if self.api_type != "ollama" and response.content_type == 'application/json':
+                content = self.provider._extract_content_from_response(await response.json())
+                if content:
+                    yield content
+                return
+
+            parser = StreamParser(self.api_type)
+            async for line in response.content:
+                content = parser.feed(line)
+                if content:
+                    yield content
+                if parser.done:
+                    return
+            content = parser.close()
+            if content:
+                yield content
+
+    async def analyze_many(self, news_items, analysis_type='摘要', concurrency=50, use_cache=True):
+        """批量分析新闻，按完成顺序逐条产生结果
+
+        请求数受concurrency和客户端限流器共同限制。提前退出迭代时取消尚未完成的请求。
+
+        Args:
+            news_items: 新闻数据字典列表
+            analysis_type: 分析类型，默认为'摘要'
+            concurrency: 同时进行的最大请求数
+            use_cache: 是否使用分析结果缓存
+
+        Yields:
+            dict: {'index', 'item', 'result', 'error', 'cached'}，与 LLMClient.analyze_many 相同
+        """
+        provider = self.provider
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+
+        def entry(index, result=None, error=None, cached=False):
+            return {
+                'index': index,
+                'item': news_items[index],
+                'result': result,
+                'error': error,
+                'cached': cached
+            }
+
+        def lookup():
+            return [provider.get_cached_analysis(news_item, analysis_type) for news_item in news_items]
+
+        cached_results = await self._run_blocking(lookup) if use_cache else [None] * len(news_items)
+
+        pending = []
+        for index, cached in enumerate(cached_results):
+            if cached is not None:
+                yield entry(index, cached, cached=True)
+            else:
+                pending.append(index)
+
+        async def work(index):
+            async with semaphore:
+                if provider.api_key:
+                    await provider.rate_limiter.acquire_async()
+                try:
+                    result = await self.analyze_news(news_items[index], analysis_type, use_cache=False)
+                    return entry(index, result)
+                except Exception as e:
+                    return entry(index, error=str(e))
+
+        tasks = [asyncio.ensure_future(work(index)) for index in pending]
+        try:
+            for future in asyncio.as_completed(tasks):
+                yield await future
+        finally:
+            for task in tasks:
+                task.cancel()
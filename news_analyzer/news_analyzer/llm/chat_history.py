@@ -0,0 +1,208 @@
+"""
+聊天历史管理
+
+保留最近几轮对话的原文，更早的对话在后台线程中压缩为一段滚动摘要，
+每次请求时在token上限内组装"摘要 + 最近对话"，使请求大小不再随对话长度增长。
+摘要尚未完成或生成失败时，超出上限的最早消息直接不发送。
+"""
+
+import logging
+import threading
+
+from news_analyzer.llm.token_utils import estimate_tokens, truncate_to_tokens
+
+
+class ChatHistory:
+    """聊天历史管理器类"""
+
+    SUMMARY_PROMPT = """请将以下对话压缩为一段简洁的摘要，供后续对话参考。
+保留用户关心的话题、讨论过的新闻和事实、已得出的结论以及尚未解决的问题，省略寒暄和重复内容。
+摘要不超过{limit}字，直接输出摘要内容。
+
+{previous}对话内容：
+{dialogue}
+
+摘要："""
+
+    def __init__(self, complete=None, max_tokens=6000, recent_turns=4,
+                 summary_tokens=400, message_tokens=500):
+        """初始化聊天历史
+
+        Args:
+            complete: 生成摘要的函数，参数为 (提示词, 最大token数)，返回文本，通常为LLMClient.complete；
+                为None时不生成摘要，只按上限截取最近的消息
+            max_tokens: 每次请求中聊天历史与上下文合计的token上限
+            recent_turns: 保留原文的最近对话轮数（一问一答为一轮）
+            summary_tokens: 摘要的最大token数
+            message_tokens: 生成摘要时每条消息最多使用的token数
+        """
+        self.logger = logging.getLogger('news_analyzer.llm.chat_history')
+        self.complete = complete
+        self.max_tokens = max_tokens
+        self.recent_turns = recent_turns
+        self.summary_tokens = summary_tokens
+        self.message_tokens = message_tokens
+
+        self._lock = threading.Lock()
+        self._messages = []
+        self._summary = ""
+        self._summarizing = False
+
+        # 清空历史时递增，丢弃清空前启动的摘要任务的结果
+        self._generation = 0
+
+    def __len__(self):
+        return len(self._messages)
+
+    @property
+    def summary(self):
+        """已压缩的早期对话摘要"""
+        return self._summary
+
+    def add(self, role, content):
+        """添加一条消息，较早的对话超出保留轮数时在后台压缩为摘要
+
+        Args:
+            role: 消息角色，"user" 或 "assistant"
+            content: 消息内容
+        """
+        with self._lock:
+            self._messages.append({"role": role, "content": content})
+        self._schedule_summary()
+
+    def clear(self):
+        """清空聊天历史和摘要"""
+        with self._lock:
+            self._messages = []
+            self._summary = ""
+            self._generation += 1
+
+    def _stale_count(self):
+        """本次需要压缩的较早消息数
+
+        只压缩完整的轮次，从用户消息开始的部分保留原文；每次最多压缩recent_turns轮，
+        积压较多时分几次压缩，避免单次摘要请求过大。
+        """
+        count = min(max(0, len(self._messages) - self.recent_turns * 2), self.recent_turns * 2)
+        while count and self._messages[count]['role'] != 'user':
+            count -= 1
+        return count
+
+    def _schedule_summary(self):
+        """有需要压缩的消息且没有正在进行的摘要任务时，启动后台摘要任务"""
+        if self.complete is None:
+            return
+
+        with self._lock:
+            if self._summarizing:
+                return
+            count = self._stale_count()
+            if not count:
+                return
+            self._summarizing = True
+            args = (self._generation, self._summary, list(self._messages[:count]))
+
+        thread = threading.Thread(target=self._summarize, args=args)
+        thread.daemon = True
+        thread.start()
+
+    def _summarize(self, generation, previous, messages):
+        """把较早的消息与已有摘要合并为新摘要（在后台线程中运行）"""
+        dialogue = '\n'.join(
+            f"{'用户' if message['role'] == 'user' else '助手'}: "
+            f"{truncate_to_tokens(' '.join(message['content'].split()), self.message_tokens)}"
+            for message in messages
+        )
+        prompt = self.SUMMARY_PROMPT.format(
+            limit=self.summary_tokens,
+            previous=f"已有摘要：\n{previous}\n\n" if previous else "",
+            dialogue=dialogue
+        )
+
+        summary = None
+        try:
+            summary = self.complete(prompt, self.summary_tokens).strip()
+        except Exception as e:
+            self.logger.warning(f"压缩聊天历史失败: {str(e)}")
+
+        with self._lock:
+            self._summarizing = False
+            if generation != self._generation:
+                return
+            if summary:
+                self._summary = truncate_to_tokens(summary, self.summary_tokens)
+                del self._messages[:len(messages)]
+                self.logger.debug(
+                    f"已将 {len(messages)} 条较早的消息压缩为摘要（约 {estimate_tokens(self._summary)} tokens）"
+                )
+
+        # 摘要期间又有对话超出保留轮数时继续压缩；失败时等下一条消息再重试
+        if summary:
+            self._schedule_summary()
+
+    def _summary_message(self, summary):
+        return {"role": "system", "content": f"此前对话的摘要：\n{summary}"}
+
+    def min_tokens(self):
+        """请求中聊天历史至少需要的token数：摘要和完整的最新一条消息
+
+        调用方的上下文超过 max_tokens - min_tokens() 时，最新一条消息会被截断，应先缩减上下文。
+
+        Returns:
+            int: token数
+        """
+        with self._lock:
+            summary = self._summary
+            latest = self._messages[-1]['content'] if self._messages else ''
+        tokens = estimate_tokens(latest) + 4 if latest else 0
+        if summary:
+            tokens += estimate_tokens(self._summary_message(summary)['content']) + 4
+        return tokens
+
+    def messages(self, reserve_tokens=0):
+        """组装本次请求的聊天历史
+
+        先放入摘要，再从新到旧放入消息，直到达到token上限；
+        最新一条消息总会保留，放不下时截断到剩余的token数，合计不超过上限。
+
+        Args:
+            reserve_tokens: 为上下文等其他内容预留的token数
+
+        Returns:
+            list: 消息列表，摘要以system消息放在最前
+        """
+        with self._lock:
+            summary = self._summary
+            history = list(self._messages)
+
+        remaining = self.max_tokens - reserve_tokens
+        summary_message = None
+        if summary:
+            summary_message = self._summary_message(summary)
+            remaining -= estimate_tokens(summary_message['content']) + 4
+
+        selected = []
+        for message in reversed(history):
+            cost = estimate_tokens(message['content']) + 4
+            if cost > remaining:
+                if not selected:
+                    selected.append({
+                        "role": message['role'],
+                        "content": truncate_to_tokens(message['content'], max(0, remaining - 4))
+                    })
+                break
+            selected.append(message)
+            remaining -= cost
+
+        # 以用户消息开头，避免从半轮对话开始
+        while len(selected) > 1 and selected[-1]['role'] != 'user':
+            selected.pop()
+        selected.reverse()
+
+        dropped = len(history) - len(selected)
+        if dropped:
+            self.logger.debug(f"聊天历史超出上限，本次请求省略了最早的 {dropped} 条消息")
+
+        if summary_message:
+            selected.insert(0, summary_message)
+        return selected
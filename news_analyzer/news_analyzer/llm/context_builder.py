@@ -0,0 +1,268 @@
+"""
+聊天上下文构建
+
+为聊天请求挑选与问题相关的多条新闻，并在token预算内组装为上下文。
+新闻按与问题的相关度排序（按词的稀有程度加权，标题中命中的词权重更高），
+问题中没有可匹配的词时按时间从新到旧排列。排名靠前的新闻带摘要，其后只列标题，
+超出预算的部分截断。也可以传入外部检索（如BM25索引）得到的相关新闻代替内部排序。组装结果在各轮对话之间缓存，候选新闻和问题的检索词不变时直接复用。
+"""
+
+import re
+import math
+import logging
+from html import unescape
+from collections import Counter, OrderedDict
+
+from news_analyzer.storage.item_utils import item_key, item_time
+from news_analyzer.storage.search_index import tokenize
+from news_analyzer.llm.token_utils import estimate_tokens, truncate_to_tokens
+
+
+_HTML_TAG = re.compile(r'<[^>]+>')
+
+class ContextBuilder:
+    """聊天上下文构建器类"""
+
+    # 标题中命中的检索词的权重（摘要中命中为1）
+    TITLE_WEIGHT = 2.0
+
+    # 新闻命中的检索词（按权重计）至少占问题全部检索词的比例，
+    # 避免只命中"最新"、"什么"等常见二元组的新闻排到前面
+    MIN_COVERAGE = 0.3
+
+    def __init__(self, budget_tokens=3000, item_tokens=200, current_tokens=800,
+                 detail_ratio=0.7, cache_size=32):
+        """初始化上下文构建器
+
+        Args:
+            budget_tokens: 上下文的token预算
+            item_tokens: 每条新闻摘要的最大token数
+            current_tokens: 当前选中新闻的内容的最大token数
+            detail_ratio: 带摘要的新闻最多占用的预算比例，其余预算用于列出更多标题
+            cache_size: 缓存的上下文数
+        """
+        self.logger = logging.getLogger('news_analyzer.llm.context_builder')
+        self.budget_tokens = budget_tokens
+        self.item_tokens = item_tokens
+        self.current_tokens = current_tokens
+        self.detail_ratio = detail_ratio
+        self.cache_size = cache_size
+
+        self._items = []
+        self._title_terms = []
+        self._body_terms = []
+        self._doc_freq = Counter()
+        self._version = 0
+
+        # {(候选版本, 当前新闻, 是否自行排序, 检索词或检索结果): 上下文}
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def set_items(self, news_items):
+        """设置候选新闻
+
+        Args:
+            news_items: 新闻条目列表（通常是当前新闻列表）
+        """
+        seen = set()
+        self._items = []
+        for item in news_items:
+            key = item_key(item)
+            if key and key not in seen:
+                seen.add(key)
+                self._items.append(item)
+
+        self._title_terms = [set(tokenize(item.get('title'))) for item in self._items]
+        self._body_terms = [set(tokenize(item.get('description'))) for item in self._items]
+        self._doc_freq = Counter()
+        for title_terms, body_terms in zip(self._title_terms, self._body_terms):
+            self._doc_freq.update(title_terms | body_terms)
+
+        self._version += 1
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+    def _query_terms(self, question):
+        """问题的检索词"""
+        return frozenset(tokenize(question))
+
+    def rank(self, question, limit=None):
+        """按与问题的相关度排列候选新闻
+
+        Args:
+            question: 用户的问题
+            limit: 最多返回的新闻数（可选）
+
+        Returns:
+            list: 相关的新闻条目列表，没有相关新闻时返回空列表
+        """
+        ranked, relevant = self._rank_indexes(self._query_terms(question))
+        return [self._items[index] for index in ranked[:relevant]][:limit]
+
+    def _recent_indexes(self):
+        """候选新闻按时间从新到旧排列的序号"""
+        return sorted(range(len(self._items)), key=lambda index: -(item_time(self._items[index], 0.0) or 0.0))
+
+    def _rank_indexes(self, terms):
+        """排列候选新闻
+
+        Returns:
+            tuple: (新闻序号列表, 相关新闻数)；相关新闻按相关度排在前面，其余按时间从新到旧排列
+        """
+        def recency(index):
+            return -(item_time(self._items[index], 0.0) or 0.0)
+
+        total = len(self._items)
+        if not terms or not total:
+            return self._recent_indexes(), 0
+
+        # 候选新闻中没有出现的词按最稀有的词计算，问题的主要词都没有命中时不算相关
+        idf = {term: math.log(1 + total / (self._doc_freq.get(term) or 1)) for term in terms}
+        min_matched = sum(idf.values()) * self.MIN_COVERAGE
+        scores = []
+        for index, (title_terms, body_terms) in enumerate(zip(self._title_terms, self._body_terms)):
+            score = matched = 0.0
+            for term in terms:
+                if term in title_terms:
+                    score += idf[term] * self.TITLE_WEIGHT
+                    matched += idf[term]
+                elif term in body_terms:
+                    score += idf[term]
+                    matched += idf[term]
+            if matched > 0 and matched >= min_matched:
+                scores.append((-score, recency(index), index))
+
+        scores.sort()
+        ranked = [index for _, _, index in scores]
+        matched = set(ranked)
+        ranked.extend(index for index in self._recent_indexes() if index not in matched)
+        return ranked, len(scores)
+
+    def build(self, question, current_news=None, retrieved=None):
+        """构建聊天上下文
+
+        Args:
+            question: 用户的问题
+            current_news: 当前选中的新闻，放在最前并保留更多内容（可选）
+            retrieved: 外部检索到的相关新闻，按相关度排列（可选）；
+                提供时代替候选新闻中的相关新闻，候选新闻按时间排在其后
+
+        Returns:
+            str: 上下文文本，没有候选新闻时返回空字符串
+        """
+        if retrieved is None:
+            query = self._query_terms(question)
+        else:
+            query = tuple(item_key(item) for item in retrieved)
+        cache_key = (self._version, item_key(current_news) if current_news else '', retrieved is None, query)
+        if cache_key in self._cache:
+            self._cache.move_to_end(cache_key)
+            self.hits += 1
+            return self._cache[cache_key]
+
+        self.misses += 1
+        if retrieved is None:
+            ranked, relevant = self._rank_indexes(query)
+            relevant_items = [self._items[index] for index in ranked[:relevant]]
+            other_items = [self._items[index] for index in ranked[relevant:]]
+        else:
+            relevant_items = list(retrieved)
+            keys = set(query)
+            other_items = [self._items[index] for index in self._recent_indexes()
+                           if item_key(self._items[index]) not in keys]
+        context = self._assemble(relevant_items, other_items, current_news)
+
+        self._cache[cache_key] = context
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return context
+
+    def _assemble(self, relevant_items, other_items, current_news):
+        """按预算组装上下文
+
+        Args:
+            relevant_items: 与问题相关的新闻，按相关度排列
+            other_items: 其余新闻，按时间排列
+            current_news: 当前选中的新闻（可选）
+        """
+        parts = []
+        remaining = self.budget_tokens
+
+        current_key = None
+        if current_news:
+            current_key = item_key(current_news)
+            text = "当前选中的新闻：\n" + self._entry(current_news, self.current_tokens)
+            if current_news.get('link'):
+                text += f"\n原文链接: {current_news['link']}"
+            text = truncate_to_tokens(text, remaining)
+            parts.append(text)
+            remaining -= estimate_tokens(text) + 1
+
+        relevant = len(relevant_items)
+        detail_budget = remaining * self.detail_ratio
+        detail_used = 0
+        detailed = True
+        number = 0
+        section = None
+        for position, item in enumerate(relevant_items + other_items):
+            if current_key and item_key(item) == current_key:
+                continue
+
+            # 每部分的标题随该部分实际输出的第一条新闻一起输出
+            item_section = 'relevant' if position < relevant else 'other'
+            header = None
+            if item_section != section:
+                if item_section == 'relevant':
+                    header = "与问题相关的新闻（按相关度排列）："
+                else:
+                    header = "其他最新的新闻（按时间排列）：" if section else "最新的新闻（按时间排列）："
+            header_cost = estimate_tokens(header) + 1 if header else 0
+            available = remaining - header_cost
+
+            entry = None
+            if detailed:
+                entry = self._entry(item, self.item_tokens, number + 1)
+                cost = estimate_tokens(entry) + 1
+                if cost > available or detail_used + cost > detail_budget:
+                    # 带摘要部分的预算已用完，其余新闻只列标题
+                    detailed = False
+                    entry = None
+                else:
+                    detail_used += cost
+            if entry is None:
+                entry = self._title_line(item, number + 1)
+                cost = estimate_tokens(entry) + 1
+                if cost > available:
+                    break
+
+            if header:
+                parts.append(header)
+                section = item_section
+            parts.append(entry)
+            remaining = available - cost
+            number += 1
+
+        return '\n'.join(parts) if number or current_news else ''
+
+    @staticmethod
+    def _entry(item, max_tokens, number=None):
+        """带摘要的新闻条目"""
+        title = (item.get('title') or '无标题').strip()
+        prefix = f"[{number}] " if number else ''
+        lines = [
+            f"{prefix}{title}",
+            f"来源: {item.get('source_name') or '未知来源'} | 发布时间: {item.get('pub_date') or '未知'}"
+        ]
+        description = ' '.join(unescape(_HTML_TAG.sub('', item.get('description') or '')).split())
+        if description and description != title:
+            lines.append(truncate_to_tokens(description, max_tokens))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _title_line(item, number):
+        """只有标题的新闻条目"""
+        title = (item.get('title') or '无标题').strip()
+        return f"[{number}] {title}（{item.get('source_name') or '未知来源'}）"
@@ -0,0 +1,824 @@
+"""
+新闻简报生成
+
+将一次刷新的全部新闻按分类或事件聚类分组，先并发摘要每个分组（map），
+再把分组摘要逐层合并为一份简报（reduce）。每一层的输入都按token预算分批。
+每次模型调用的结果按提示词内容缓存，少量新闻变化后重新生成时，
+只有受影响分组的调用和最终合并需要重新计算。
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html import escape
+
+from news_analyzer.storage.item_utils import content_hash, item_time
+from news_analyzer.llm.token_utils import estimate_tokens, truncate_to_tokens, pack_by_tokens
+
+
+# 分组方式
+GROUP_BY_CATEGORY = 'category'
+GROUP_BY_STORY = 'story'
+
+# 标题相似度达到该阈值的新闻归为同一事件
+STORY_THRESHOLD = 0.5
+
+_HTML_TAG = re.compile(r'<[^>]+>')
+_TITLE_NOISE = re.compile(r'[\s\W_]+')
+
+
+def _title_shingles(title):
+    """标题的字符二元组集合（去掉空白和标点）"""
+    text = _TITLE_NOISE.sub('', (title or '').lower())
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+def cluster_stories(news_items, threshold=STORY_THRESHOLD):
+    """按标题相似度将新闻聚类为事件
+
+    新闻与某个事件首条新闻标题的二元组Jaccard相似度达到阈值时归入该事件。
+    通过二元组倒排索引只比较有共同二元组的事件。
+
+    Args:
+        news_items: 新闻条目列表
+        threshold: 相似度阈值
+
+    Returns:
+        list: 事件列表，每个事件是新闻条目的列表，按首次出现的顺序排列
+    """
+    clusters = []
+    representatives = []
+    postings = {}
+
+    for item in news_items:
+        shingles = _title_shingles(item.get('title'))
+        overlaps = Counter()
+        for shingle in shingles:
+            for cluster_id in postings.get(shingle, ()):
+                overlaps[cluster_id] += 1
+
+        best, best_score = None, threshold
+        for cluster_id, overlap in overlaps.items():
+            union = len(shingles) + len(representatives[cluster_id]) - overlap
+            score = overlap / union if union else 0.0
+            if score >= best_score:
+                best, best_score = cluster_id, score
+
+        if best is not None:
+            clusters[best].append(item)
+            continue
+
+        cluster_id = len(clusters)
+        clusters.append([item])
+        representatives.append(shingles)
+        for shingle in shingles:
+            postings.setdefault(shingle, []).append(cluster_id)
+
+    return clusters
+
+
+def _similarity(a, b):
+    """两个二元组集合的Jaccard相似度"""
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+class _Cancelled(Exception):
+    """生成过程被中止"""
+
+
+class DigestBuilder:
+    """新闻简报生成器类
+
+    同一实例不能在多个线程中同时调用 build。
+    """
+
+    # 提示词版本，修改提示词后需要递增，使缓存的中间摘要失效
+    PROMPT_VERSION = 1
+
+    MAP_PROMPT = """请为以下"{group}"分组的 {count} 条新闻写一段综述。
+要求：
+1. 合并报道同一事件的新闻，按重要性排列
+2. 保留关键的人物、机构、数字和时间
+3. 不超过{words}字，不要逐条罗列
+
+新闻：
+{body}
+"""
+
+    REDUCE_PROMPT = """以下是"{group}"分组新闻的几段综述，请合并为一段不超过{words}字的综述，
+去掉重复内容，保留最重要的信息。
+
+{body}
+"""
+
+    MERGE_PROMPT = """以下是若干分组的新闻综述，请压缩为不超过{words}字的内容，
+保留每个分组的标题行（以"## "开头），去掉次要细节。
+
+{body}
+"""
+
+    FINAL_PROMPT = """你是新闻编辑。以下是本次更新中各个分组的新闻综述，请整理为一份新闻简报。
+要求：
+1. 开头用2-3句话概括最重要的事件
+2. 按重要性列出各分组的要点，每个分组以"## 分组名"作为标题
+3. 不超过{words}字
+
+{body}
+"""
+
+    def __init__(self, llm_client, analysis_cache=None, group_by=GROUP_BY_CATEGORY, concurrency=4,
+                 context_tokens=6000, item_tokens=300, summary_tokens=400, digest_tokens=1500):
+        """初始化简报生成器
+
+        Args:
+            llm_client: LLMClient实例
+            analysis_cache: 中间结果缓存（AnalysisCache实例），默认使用llm_client的分析缓存
+            group_by: 分组方式，'category'（按分类）或 'story'（按事件聚类）
+            concurrency: 同时进行的最大请求数
+            context_tokens: 每次调用的输入token预算（不含回复）
+            item_tokens: 每条新闻在提示词中的最大token数
+            summary_tokens: 分组摘要和中间合并结果的最大token数
+            digest_tokens: 最终简报的最大token数
+        """
+        self.logger = logging.getLogger('news_analyzer.llm.digest')
+        self.llm_client = llm_client
+        self.cache = analysis_cache if analysis_cache is not None else llm_client.analysis_cache
+        self.group_by = group_by
+        self.concurrency = max(1, concurrency)
+        self.context_tokens = context_tokens
+        self.item_tokens = item_tokens
+        self.summary_tokens = summary_tokens
+        self.digest_tokens = digest_tokens
+
+        # 每批至少要容纳两段摘要，逐层合并才能收敛
+        if self._input_budget(self.REDUCE_PROMPT) < 2 * (summary_tokens + 1):
+            raise ValueError("context_tokens 过小，至少需要容纳两段分组摘要")
+        if self._input_budget(self.MAP_PROMPT) < item_tokens + 1:
+            raise ValueError("context_tokens 过小，至少需要容纳一条新闻")
+
+        self._stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def _input_budget(self, template):
+        """提示词模板之外可用于输入内容的token数"""
+        return self.context_tokens - estimate_tokens(template) - 50
+
+    @staticmethod
+    def _words(tokens):
+        """回复token上限对应的字数要求（留出余量）"""
+        return max(50, int(tokens * 0.8))
+
+    def group(self, news_items):
+        """将新闻分组
+
+        按事件聚类时，只有一条新闻的事件归入其分类下的"其他"分组。
+
+        Args:
+            news_items: 新闻条目列表
+
+        Returns:
+            list: [(分组名, 新闻列表), ...]，按新闻数从多到少排列
+        """
+        by_category = {}
+        for item in news_items:
+            by_category.setdefault(item.get('category') or '未分类', []).append(item)
+
+        if self.group_by != GROUP_BY_STORY:
+            groups = list(by_category.items())
+        else:
+            groups = []
+            for category, items in by_category.items():
+                others = []
+                for cluster in cluster_stories(items):
+                    if len(cluster) > 1:
+                        title = (cluster[0].get('title') or '无标题')[:20]
+                        groups.append((f"{category}: {title}", cluster))
+                    else:
+                        others.extend(cluster)
+                if others:
+                    groups.append((f"{category}: 其他", others))
+
+        groups.sort(key=lambda group: (-len(group[1]), group[0]))
+        return groups
+
+    def _item_text(self, item):
+        """新闻在提示词中的文本"""
+        title = (item.get('title') or '无标题').strip()
+        source = item.get('source_name') or '未知来源'
+        description = _HTML_TAG.sub('', item.get('description') or '').strip()
+        text = f"- [{source}] {title}"
+        if description and description != title:
+            text += f"：{description}"
+        return truncate_to_tokens(' '.join(text.split()), self.item_tokens)
+
+    def _ordered(self, items):
+        """分组内的新闻按时间从新到旧排列，顺序确定，使相同的新闻生成相同的提示词"""
+        return sorted(items, key=lambda item: (-(item_time(item, 0.0) or 0.0), content_hash(item)))
+
+    def _call(self, kind, prompt, max_tokens, should_stop):
+        """调用模型，结果按提示词内容缓存"""
+        key = None
+        if self.cache is not None:
+            key = self.cache.make_key(
+                'digest', kind, self.llm_client.model, self.PROMPT_VERSION, max_tokens, prompt
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                with self._stats_lock:
+                    self._stats['cache_hits'] += 1
+                return cached
+
+        if should_stop():
+            raise _Cancelled()
+        if not self.llm_client.rate_limiter.acquire(should_stop=should_stop):
+            raise _Cancelled()
+
+        content = self.llm_client.complete(prompt, max_tokens=max_tokens).strip()
+        with self._stats_lock:
+            self._stats['calls'] += 1
+            self._stats['prompt_tokens'] += estimate_tokens(prompt)
+
+        if key is not None:
+            self.cache.put(key, content, kind=kind, model=self.llm_client.model)
+        return content
+
+    def _run_calls(self, calls, should_stop, on_done=None):
+        """并发执行一批模型调用
+
+        Args:
+            calls: [(类型, 提示词, 最大token数), ...]
+            should_stop: 返回True时中止的函数
+            on_done: 每完成一个调用后调用的函数，参数为 (已完成数, 总数)
+
+        Returns:
+            list: 与calls顺序一致的回复文本
+        """
+        results = [None] * len(calls)
+        if not calls:
+            return results
+
+        workers = min(self.concurrency, len(calls))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-digest') as pool:
+            futures = {
+                pool.submit(self._call, kind, prompt, max_tokens, should_stop): index
+                for index, (kind, prompt, max_tokens) in enumerate(calls)
+            }
+            try:
+                for completed, future in enumerate(as_completed(futures), 1):
+                    results[futures[future]] = future.result()
+                    if on_done:
+                        on_done(completed, len(calls))
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+        return results
+
+    def _merge_round(self, lists, make_call, should_stop):
+        """对每个列表做一轮合并：按预算分批，每批多于一段时合并为一段
+
+        Args:
+            lists: 文本列表的列表（每个分组一个）
+            make_call: 根据 (列表序号, 一批文本) 生成调用的函数
+            should_stop: 返回True时中止的函数
+
+        Returns:
+            list: 合并后的文本列表的列表
+        """
+        calls = []
+        layouts = []
+        for index, texts in enumerate(lists):
+            if len(texts) <= 1:
+                layouts.append([(False, text) for text in texts])
+                continue
+
+            texts = [truncate_to_tokens(text, self.summary_tokens) for text in texts]
+            template = make_call(index, [])[1]
+            slots = []
+            for batch in pack_by_tokens(texts, self._input_budget(template)):
+                if len(batch) == 1:
+                    slots.append((False, batch[0]))
+                else:
+                    slots.append((True, len(calls)))
+                    calls.append(make_call(index, batch))
+            layouts.append(slots)
+
+        results = self._run_calls(calls, should_stop)
+        return [[results[value] if is_call else value for is_call, value in slots] for slots in layouts]
+
+    def _reduce_until(self, lists, done, make_call, should_stop):
+        """逐轮合并各列表，直到每个列表都满足结束条件
+
+        Args:
+            lists: 文本列表的列表
+            done: 根据 (列表序号, 文本列表) 判断是否结束的函数
+            make_call: 根据 (列表序号, 一批文本) 生成调用的函数
+            should_stop: 返回True时中止的函数
+
+        Returns:
+            list: 合并后的文本列表的列表
+        """
+        lists = list(lists)
+        while True:
+            pending = [index for index, texts in enumerate(lists) if not done(index, texts)]
+            if not pending:
+                return lists
+            merged = self._merge_round(
+                [lists[index] for index in pending],
+                lambda position, batch: make_call(pending[position], batch),
+                should_stop
+            )
+            for index, texts in zip(pending, merged):
+                lists[index] = texts
+
+    def _reduce_groups(self, names, partials, should_stop):
+        """将每个分组的多段摘要逐层合并为一段
+
+        Returns:
+            list: 每个分组的摘要
+        """
+        partials = self._reduce_until(
+            partials,
+            lambda index, texts: len(texts) <= 1,
+            lambda index, batch: ('reduce', self._prompt(
+                self.REDUCE_PROMPT, self.summary_tokens, batch, group=names[index]
+            ), self.summary_tokens),
+            should_stop
+        )
+        return [texts[0] for texts in partials]
+
+    def build(self, news_items, progress_callback=None, should_stop=None):
+        """生成新闻简报
+
+        Args:
+            news_items: 新闻条目列表（通常是一次刷新的全部新闻）
+            progress_callback: 进度回调函数，参数为 (百分比, 状态消息)（可选）
+            should_stop: 返回True时中止生成的函数（可选）
+
+        Returns:
+            dict: {'text': 简报文本, 'html': 简报HTML, 'groups': [{'name', 'count', 'summary'}, ...],
+                   'items': 新闻数, 'calls': 模型调用次数, 'cache_hits': 缓存命中次数,
+                   'prompt_tokens': 估算的输入token数, 'cancelled': 是否已中止}
+        """
+        should_stop = should_stop or (lambda: False)
+        progress = progress_callback or (lambda percent, message: None)
+        self._stats = Counter()
+
+        summary = {
+            'text': '', 'html': '', 'groups': [], 'items': len(news_items),
+            'calls': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'cancelled': False
+        }
+        if not news_items:
+            summary['text'] = "没有可生成简报的新闻"
+            summary['html'] = f"<p>{summary['text']}</p>"
+            return summary
+
+        groups = self.group(news_items)
+        self.logger.info(f"开始生成新闻简报: {len(news_items)} 条新闻，{len(groups)} 个分组")
+
+        try:
+            partials = self._map_groups(groups, progress, should_stop)
+
+            progress(70, "正在合并分组摘要...")
+            group_summaries = self._reduce_groups([name for name, _ in groups], partials, should_stop)
+            progress(85, "正在生成简报...")
+            text = self._finish(groups, group_summaries, should_stop)
+        except _Cancelled:
+            summary['cancelled'] = True
+            summary.update({key: self._stats[key] for key in ('calls', 'cache_hits', 'prompt_tokens')})
+            self.logger.info("新闻简报生成已取消")
+            return summary
+
+        summary.update({key: self._stats[key] for key in ('calls', 'cache_hits', 'prompt_tokens')})
+        summary['text'] = text
+        summary['groups'] = [
+            {'name': name, 'count': len(items), 'summary': group_summary}
+            for (name, items), group_summary in zip(groups, group_summaries)
+        ]
+        summary['html'] = self._to_html(text, summary)
+        progress(100, "简报生成完成")
+
+        self.logger.info(
+            f"新闻简报生成完成: 调用模型 {summary['calls']} 次，缓存命中 {summary['cache_hits']} 次，"
+            f"输入约 {summary['prompt_tokens']} tokens"
+        )
+        return summary
+
+    def _prompt(self, template, max_tokens, texts, **fields):
+        return template.format(words=self._words(max_tokens), body='\n\n'.join(texts), **fields)
+
+    def _map_groups(self, groups, progress, should_stop):
+        """并发摘要每个分组的新闻，分组过大时拆成多批
+
+        Returns:
+            list: 每个分组的摘要列表
+        """
+        calls = []
+        owners = []
+        for index, (name, items) in enumerate(groups):
+            texts = [self._item_text(item) for item in self._ordered(items)]
+            for batch in pack_by_tokens(texts, self._input_budget(self.MAP_PROMPT)):
+                prompt = self.MAP_PROMPT.format(
+                    group=name, count=len(batch), words=self._words(self.summary_tokens),
+                    body='\n'.join(batch)
+                )
+                calls.append(('map', prompt, self.summary_tokens))
+                owners.append(index)
+
+        progress(5, f"正在摘要 {len(groups)} 个分组...")
+        results = self._run_calls(
+            calls, should_stop,
+            lambda done, total: progress(5 + int(done * 65 / total), f"已完成分组摘要 {done}/{total}")
+        )
+
+        partials = [[] for _ in groups]
+        for index, result in zip(owners, results):
+            partials[index].append(result)
+        return partials
+
+    def _finish(self, groups, group_summaries, should_stop):
+        """将分组摘要合并为最终简报，输入超出预算时先逐层压缩"""
+        sections = [
+            f"## {name}（{len(items)}条）\n{group_summary}"
+            for (name, items), group_summary in zip(groups, group_summaries)
+        ]
+
+        budget = self._input_budget(self.FINAL_PROMPT)
+        sections = self._reduce_until(
+            [sections],
+            lambda index, texts: len(pack_by_tokens(texts, budget)) <= 1,
+            lambda index, batch: ('merge', self._prompt(
+                self.MERGE_PROMPT, self.summary_tokens, batch
+            ), self.summary_tokens),
+            should_stop
+        )[0]
+
+        prompt = self._prompt(self.FINAL_PROMPT, self.digest_tokens, sections)
+        return self._run_calls([('final', prompt, self.digest_tokens)], should_stop)[0]
+
+    @staticmethod
+    def _to_html(text, summary):
+        """将简报文本转换为HTML"""
+        parts = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            heading = line.lstrip('#').strip()
+            if line.startswith('#'):
+                parts.append(f"<h3 style='color: #1976D2;'>{escape(heading)}</h3>")
+            elif line.startswith(('- ', '* ')):
+                parts.append(f"<li>{escape(line[2:])}</li>")
+            else:
+                parts.append(f"<p>{escape(line)}</p>")
+
+        footer = (f"共 {summary['items']} 条新闻，调用模型 {summary['calls']} 次，"
+                  f"缓存命中 {summary['cache_hits']} 次")
+        return f'''
+        <div style="font-family: 'Segoe UI', 'Microsoft YaHei', sans-serif; padding: 15px; line-height: 1.5;">
+            <h2 style="color: #1976D2; border-bottom: 1px solid #E0E0E0; padding-bottom: 8px;">新闻简报</h2>
+            {''.join(parts)}
+            <p style="color: #757575; font-size: 12px;">{footer}</p>
+        </div>
+        '''
+
+
+class RollingDigestBuilder(DigestBuilder):
+    """增量简报生成器类
+
+    保存上一次的简报和各分组的摘要。再次生成时只把新增或内容变化的新闻
+    （按内容哈希判断）交给模型并入对应分组的摘要，再重新输出完整简报，
+    模型调用次数和输入token数随变化的新闻数增长，而不是随新闻总数增长。
+    """
+
+    # 状态文件的格式版本
+    STATE_VERSION = 1
+
+    UPDATE_PROMPT = """以下是"{group}"分组的现有综述，以及之后新增的 {count} 条新闻（或其综述）。
+请将新增内容并入综述：
+1. 新事件按重要性插入，已有事件有新进展时更新对应内容
+2. 保留关键的人物、机构、数字和时间
+3. 不超过{words}字，不要逐条罗列
+
+现有综述：
+{summary}
+
+新增内容：
+{body}
+"""
+
+    def __init__(self, llm_client, state_path, rebuild_ratio=0.5, **kwargs):
+        """初始化增量简报生成器
+
+        Args:
+            llm_client: LLMClient实例
+            state_path: 保存上一次简报和分组摘要的文件路径
+            rebuild_ratio: 分组中已移除的新闻达到该比例时重新摘要整个分组
+            **kwargs: 其余参数与 DigestBuilder 相同
+        """
+        super().__init__(llm_client, **kwargs)
+        self.state_path = state_path
+        self.rebuild_ratio = rebuild_ratio
+
+        if self._input_budget(self.UPDATE_PROMPT) - self.summary_tokens < 2 * (self.summary_tokens + 1):
+            raise ValueError("context_tokens 过小，更新分组摘要时至少需要容纳三段摘要")
+
+    def load_state(self):
+        """读取上一次生成的状态
+
+        Returns:
+            dict: 状态，不存在、无法读取或生成参数已变化时返回None
+        """
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.warning(f"读取增量简报状态失败: {str(e)}")
+            return None
+
+        if any(state.get(key) != value for key, value in self._state_params().items()):
+            self.logger.info("简报生成参数已变化，重新生成完整简报")
+            return None
+        return state
+
+    def reset(self):
+        """删除保存的状态，下次生成完整简报"""
+        try:
+            os.remove(self.state_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.error(f"删除增量简报状态失败: {str(e)}")
+
+    def _state_params(self):
+        """影响分组摘要的参数，任何一项变化后旧状态都不再可用"""
+        return {
+            'version': self.STATE_VERSION,
+            'prompt_version': self.PROMPT_VERSION,
+            'group_by': self.group_by,
+            'model': self.llm_client.model
+        }
+
+    def _save_state(self, sections, text):
+        state = dict(self._state_params())
+        state.update({
+            'updated_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'digest': text,
+            'sections': sections
+        })
+
+        tmp_path = self.state_path + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, self.state_path)
+        except Exception as e:
+            self.logger.error(f"保存增量简报状态失败: {str(e)}")
+
+    def build(self, news_items, progress_callback=None, should_stop=None):
+        """增量生成新闻简报
+
+        没有可用的状态时生成完整简报。中止时不更新保存的状态。
+
+        Args:
+            news_items: 新闻条目列表（当前的全部新闻）
+            progress_callback: 进度回调函数，参数为 (百分比, 状态消息)（可选）
+            should_stop: 返回True时中止生成的函数（可选）
+
+        Returns:
+            dict: 与 DigestBuilder.build 相同，另外包含 'new_items'（交给模型的新闻数）、
+                  'removed_items'（已移除的新闻数）和 'updated_groups'（更新或新建的分组数）
+        """
+        should_stop = should_stop or (lambda: False)
+        progress = progress_callback or (lambda percent, message: None)
+        self._stats = Counter()
+
+        current = {}
+        for item in news_items:
+            current.setdefault(content_hash(item), item)
+
+        state = self.load_state()
+        sections = state['sections'] if state else []
+        previous = {item_hash for section in sections for item_hash in section['hashes']}
+
+        summary = {
+            'text': '', 'html': '', 'groups': [], 'items': len(news_items),
+            'calls': 0, 'cache_hits': 0, 'prompt_tokens': 0, 'cancelled': False,
+            'new_items': 0, 'removed_items': len(previous.difference(current)), 'updated_groups': 0
+        }
+        if not current:
+            summary['text'] = "没有可生成简报的新闻"
+            summary['html'] = f"<p>{summary['text']}</p>"
+            return summary
+
+        kept, rebuild = self._prune(sections, current)
+        fresh = [item_hash for item_hash in current if item_hash not in previous] + rebuild
+        summary['new_items'] = len(fresh)
+        self.logger.info(
+            f"开始增量生成新闻简报: {len(current)} 条新闻，新增或变化 {len(fresh)} 条，"
+            f"移除 {summary['removed_items']} 条"
+        )
+
+        try:
+            if not fresh and len(kept) == len(sections):
+                # 只有分组内的部分新闻被移除，沿用上一次的简报
+                text = state['digest']
+            else:
+                updates, created = self._assign(kept, [current[item_hash] for item_hash in fresh])
+                self._apply_updates(kept, updates, created, progress, should_stop)
+                for section in created:
+                    items = section.pop('items')
+                    section['hashes'] = [content_hash(item) for item in items]
+                    kept.append(section)
+                summary['updated_groups'] = len(updates) + len(created)
+
+                kept.sort(key=lambda section: (-len(section['hashes']), section['name']))
+                progress(85, "正在生成简报...")
+                text = self._finish(
+                    [(section['name'], section['hashes']) for section in kept],
+                    [section['summary'] for section in kept],
+                    should_stop
+                )
+        except _Cancelled:
+            summary['cancelled'] = True
+            summary.update({key: self._stats[key] for key in ('calls', 'cache_hits', 'prompt_tokens')})
+            self.logger.info("新闻简报生成已取消")
+            return summary
+
+        self._save_state(kept, text)
+
+        summary.update({key: self._stats[key] for key in ('calls', 'cache_hits', 'prompt_tokens')})
+        summary['text'] = text
+        summary['groups'] = [
+            {'name': section['name'], 'count': len(section['hashes']), 'summary': section['summary']}
+            for section in kept
+        ]
+        summary['html'] = self._to_html(text, summary)
+        progress(100, "简报生成完成")
+
+        self.logger.info(
+            f"增量简报生成完成: 更新 {summary['updated_groups']} 个分组，调用模型 {summary['calls']} 次，"
+            f"缓存命中 {summary['cache_hits']} 次，输入约 {summary['prompt_tokens']} tokens"
+        )
+        return summary
+
+    def _prune(self, sections, current):
+        """去掉已移除的新闻
+
+        移除比例达到 rebuild_ratio 的分组整体重新摘要，避免旧摘要中留下过多已过时的内容。
+
+        Returns:
+            tuple: (保留的分组列表, 需要重新分配的新闻哈希列表)
+        """
+        kept = []
+        rebuild = []
+        for section in sections:
+            alive = [item_hash for item_hash in section['hashes'] if item_hash in current]
+            removed = len(section['hashes']) - len(alive)
+            if not alive:
+                continue
+            if removed and removed >= self.rebuild_ratio * len(section['hashes']):
+                rebuild.extend(alive)
+                continue
+            section['hashes'] = alive
+            kept.append(section)
+        return kept, rebuild
+
+    def _assign(self, sections, news_items):
+        """将新增的新闻分配到已有分组，无法分配的组成新分组
+
+        按事件聚类时，先与已有事件的标题比较，其余新闻再相互聚类。
+
+        Returns:
+            tuple: ({已有分组名: 新闻列表}, [{'name', 'category', 'title', 'summary', 'items'}, ...])
+        """
+        existing = {section['name'] for section in sections}
+        updates = {}
+        created = {}
+
+        def add(name, category, title, item):
+            if name in existing:
+                updates.setdefault(name, []).append(item)
+            else:
+                section = created.setdefault(name, {
+                    'name': name, 'category': category, 'title': title, 'summary': '', 'items': []
+                })
+                section['items'].append(item)
+
+        by_category = {}
+        for item in news_items:
+            by_category.setdefault(item.get('category') or '未分类', []).append(item)
+
+        for category, items in by_category.items():
+            if self.group_by != GROUP_BY_STORY:
+                for item in items:
+                    add(category, category, '', item)
+                continue
+
+            stories = [
+                (section['name'], _title_shingles(section['title']))
+                for section in sections
+                if section['category'] == category and section.get('title')
+            ]
+            unmatched = []
+            for item in items:
+                shingles = _title_shingles(item.get('title'))
+                best, best_score = None, STORY_THRESHOLD
+                for name, story in stories:
+                    score = _similarity(shingles, story)
+                    if score >= best_score:
+                        best, best_score = name, score
+                if best is not None:
+                    updates.setdefault(best, []).append(item)
+                else:
+                    unmatched.append(item)
+
+            for cluster in cluster_stories(unmatched):
+                if len(cluster) > 1:
+                    title = cluster[0].get('title') or '无标题'
+                    for item in cluster:
+                        add(f"{category}: {title[:20]}", category, title, item)
+                else:
+                    add(f"{category}: 其他", category, '', cluster[0])
+
+        return updates, list(created.values())
+
+    def _update_budget(self, section):
+        """更新分组摘要时可用于新增内容的token数"""
+        return (self._input_budget(self.UPDATE_PROMPT)
+                - estimate_tokens(truncate_to_tokens(section['summary'], self.summary_tokens))
+                - estimate_tokens(section['name']))
+
+    def _apply_updates(self, sections, updates, created, progress, should_stop):
+        """摘要新分组，并把新增新闻并入已有分组的摘要
+
+        新增内容能放进一次调用时直接交给模型更新摘要；否则先摘要新增新闻，
+        合并到预算之内后再更新。分组字典的summary在原处修改。
+
+        Args:
+            sections: 保留的已有分组列表
+            updates: {已有分组名: 新增新闻列表}
+            created: 新分组列表（含items）
+            progress: 进度回调函数
+            should_stop: 返回True时中止的函数
+        """
+        by_name = {section['name']: section for section in sections}
+        bodies = {}
+        overflow = []
+        for name, items in updates.items():
+            texts = [self._item_text(item) for item in self._ordered(items)]
+            if len(pack_by_tokens(texts, self._update_budget(by_name[name]))) <= 1:
+                bodies[name] = '\n'.join(texts)
+            else:
+                overflow.append((name, items))
+
+        # 新分组与新增内容过多的分组一起做map
+        groups = [(section['name'], section['items']) for section in created] + overflow
+        names = [name for name, _ in groups]
+        partials = self._map_groups(groups, progress, should_stop)
+
+        def done(index, texts):
+            if index < len(created):
+                return len(texts) <= 1
+            return len(pack_by_tokens(texts, self._update_budget(by_name[names[index]]))) <= 1
+
+        progress(70, "正在合并分组摘要...")
+        partials = self._reduce_until(
+            partials,
+            done,
+            lambda index, batch: ('reduce', self._prompt(
+                self.REDUCE_PROMPT, self.summary_tokens, batch, group=names[index]
+            ), self.summary_tokens),
+            should_stop
+        )
+
+        for section, texts in zip(created, partials):
+            section['summary'] = texts[0]
+        for name, texts in zip(names[len(created):], partials[len(created):]):
+            bodies[name] = '\n\n'.join(texts)
+
+        progress(75, f"正在更新 {len(bodies)} 个分组的摘要...")
+        update_names = list(bodies)
+        calls = [
+            ('update', self.UPDATE_PROMPT.format(
+                group=name, count=len(updates[name]), words=self._words(self.summary_tokens),
+                summary=truncate_to_tokens(by_name[name]['summary'], self.summary_tokens),
+                body=bodies[name]
+            ), self.summary_tokens)
+            for name in update_names
+        ]
+        for name, result in zip(update_names, self._run_calls(calls, should_stop)):
+            section = by_name[name]
+            section['summary'] = result
+            section['hashes'] = section['hashes'] + [content_hash(item) for item in updates[name]]
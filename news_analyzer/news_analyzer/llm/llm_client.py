@@ -5,24 +5,52 @@ LLM客户端
 """
 
 import os
-import json
 import logging
 import requests
 import time
 import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import Callable, Dict, List, Optional, Union, Any
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from news_analyzer.storage.item_utils import content_hash
+from news_analyzer.llm.stream_decoder import StreamParser
+from news_analyzer.llm.retry_policy import RetryPolicy, RETRYABLE_EXCEPTIONS
+from news_analyzer.llm.rate_limiter import TokenBucket
+
 
 class LLMClient:
     """LLM客户端类"""
     
-    def __init__(self, api_key=None, api_url=None, model=None):
+    # 提示词版本，修改_get_prompt中的提示词后需要递增，使旧的缓存结果失效
+    PROMPT_VERSION = 1
+    
+    # 流式输出时两次界面回调之间的最小间隔（秒），首个增量立即回调
+    STREAM_CALLBACK_INTERVAL = 0.05
+    
+    # 连接池：缓存的主机数和每个主机保持的连接数（批量分析时多个线程共用）
+    POOL_CONNECTIONS = 4
+    POOL_MAXSIZE = 16
+    
+    # 传输层重试：只重试建立连接失败，此时请求尚未发出，重试不会重复生成
+    CONNECT_RETRIES = 2
+    
+    def __init__(self, api_key=None, api_url=None, model=None, analysis_cache=None,
+                 timeout=None, retry_count=None, requests_per_minute=None):
         """初始化LLM客户端
         
         Args:
             api_key: API密钥，如果为None则尝试从环境变量获取
             api_url: API URL，如果为None则使用默认值
             model: 模型名称，如果为None则使用默认值
+            analysis_cache: 分析结果缓存（AnalysisCache实例，可选）
+            timeout: 单次请求超时（秒），如果为None则读取环境变量 LLM_TIMEOUT，默认60
+            retry_count: 临时错误的重试次数，如果为None则读取环境变量 LLM_RETRY_COUNT，默认3
+            requests_per_minute: 批量分析的请求速率上限，如果为None则读取环境变量
+                                 LLM_REQUESTS_PER_MINUTE，默认60
         """
         self.logger = logging.getLogger('news_analyzer.llm.client')
         
@@ -41,12 +69,130 @@ class LLMClient:
         # 默认参数
         self.temperature = 0.7
         self.max_tokens = 2048
-        self.timeout = 60
+        self.timeout = self._read_number(timeout, 'LLM_TIMEOUT', 60, float, minimum=1)
+        self.retry_count = self._read_number(retry_count, 'LLM_RETRY_COUNT', 3, int)
+        
+        # 重试策略：一次请求（含重试）的总时限为单次超时的3倍
+        self.retry_policy = RetryPolicy(
+            max_retries=self.retry_count,
+            deadline=self.timeout * 3
+        )
+        
+        # 批量分析的客户端限流（令牌桶，允许约5秒的突发请求）
+        rate = self._read_number(requests_per_minute, 'LLM_REQUESTS_PER_MINUTE', 60, float, minimum=1) / 60
+        self.rate_limiter = TokenBucket(rate, capacity=max(1.0, rate * 5))
+        
+        # 分析结果缓存
+        self.analysis_cache = analysis_cache
+        
+        # 连接池会话，首次请求时创建；替换客户端时等进行中的请求结束再关闭
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._in_flight = 0
+        self._closed = False
         
         # 确定API类型
         self.api_type = self._determine_api_type()
         self.logger.info(f"初始化LLM客户端，API类型: {self.api_type}, 模型: {self.model}")
     
+    def _read_number(self, value, env_name, default, cast, minimum=0):
+        """读取数值参数，未指定时使用环境变量，无效时使用默认值"""
+        if value is None:
+            value = os.environ.get(env_name, '')
+        try:
+            return max(minimum, cast(value))
+        except (TypeError, ValueError):
+            if value not in (None, ''):
+                self.logger.warning(f"{env_name} 的值无效: {value}，使用默认值 {default}")
+            return default
+    
+    @property
+    def session(self):
+        """带连接池和保持连接的HTTP会话，由使用该客户端的所有面板共享"""
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+    
+    def _create_session(self):
+        """创建HTTP会话"""
+        session = requests.Session()
+        retry = Retry(
+            total=self.CONNECT_RETRIES,
+            connect=self.CONNECT_RETRIES,
+            read=0,
+            status=0,
+            backoff_factor=0.2,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(
+            pool_connections=self.POOL_CONNECTIONS,
+            pool_maxsize=self.POOL_MAXSIZE,
+            max_retries=retry
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+    
+    @contextmanager
+    def _tracked_request(self):
+        """记录进行中的请求，客户端关闭后由最后一个请求关闭会话"""
+        with self._session_lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._session_lock:
+                self._in_flight -= 1
+                session = self._session if self._closed and self._in_flight == 0 else None
+                if session is not None:
+                    self._session = None
+            if session is not None:
+                session.close()
+    
+    def _post(self, data, stream=False, timeout=None, retry=True):
+        """通过连接池向API发送请求，按重试策略重试临时错误
+        
+        流式请求需要在 _tracked_request 中读取响应，读取完毕后关闭响应以归还连接。
+        
+        Args:
+            data: 请求数据
+            stream: 是否流式读取响应
+            timeout: 单次尝试的超时时间（秒），默认使用客户端设置
+            retry: 是否重试连接错误、限流和服务端错误
+            
+        Returns:
+            requests.Response: 响应对象
+        """
+        headers = self._get_headers()
+        
+        def send(attempt_timeout):
+            return self.session.post(
+                self.api_url,
+                headers=headers,
+                json=data,
+                stream=stream,
+                timeout=attempt_timeout
+            )
+        
+        timeout = timeout or self.timeout
+        if not retry:
+            return send(timeout)
+        return self.retry_policy.run(send, timeout)
+    
+    def close(self):
+        """关闭客户端的连接池
+        
+        仍有请求进行中时（例如替换客户端时正在进行的分析），等这些请求结束后再关闭。
+        """
+        with self._session_lock:
+            self._closed = True
+            session = self._session if self._in_flight == 0 else None
+            if session is not None:
+                self._session = None
+        if session is not None:
+            session.close()
+    
     def _determine_api_type(self):
         """确定API类型"""
         url_lower = self.api_url.lower()
@@ -59,12 +205,49 @@ class LLMClient:
         else:
             return "generic"
     
-    def analyze_news(self, news_item, analysis_type='摘要'):
+    def _analysis_cache_key(self, news_item, analysis_type):
+        """生成分析结果的缓存键"""
+        return self.analysis_cache.make_key(
+            content_hash(news_item), analysis_type, self.model, self.PROMPT_VERSION
+        )
+    
+    def get_cached_analysis(self, news_item, analysis_type='摘要'):
+        """获取已缓存的分析结果（不调用API）
+        
+        Args:
+            news_item: 新闻数据字典
+            analysis_type: 分析类型
+            
+        Returns:
+            str: 格式化的分析结果HTML，未缓存时返回None
+        """
+        if not self.analysis_cache or not self.api_key or not news_item:
+            return None
+        
+        content = self.analysis_cache.get(self._analysis_cache_key(news_item, analysis_type))
+        if content is None:
+            return None
+        
+        self.logger.info(f"分析缓存命中: {analysis_type} - {news_item.get('title', '')[:30]}")
+        return self._format_analysis_result(content, analysis_type)
+    
+    def get_cache_stats(self):
+        """获取分析缓存统计
+        
+        Returns:
+            dict: 缓存统计信息，未启用缓存时返回None
+        """
+        if not self.analysis_cache:
+            return None
+        return self.analysis_cache.stats()
+    
+    def analyze_news(self, news_item, analysis_type='摘要', use_cache=True):
         """分析新闻
         
         Args:
             news_item: 新闻数据字典
             analysis_type: 分析类型，默认为'摘要'
+            use_cache: 是否使用分析结果缓存
             
         Returns:
             str: 格式化的分析结果HTML
@@ -76,47 +259,183 @@ class LLMClient:
         if not self.api_key:
             return self._mock_analysis(news_item, analysis_type)
         
+        if use_cache and self.analysis_cache:
+            cached = self.get_cached_analysis(news_item, analysis_type)
+            if cached is not None:
+                return cached
+            self.logger.info(f"分析缓存未命中: {analysis_type} - {news_item.get('title', '')[:30]}")
+        
         # 获取提示词
         prompt = self._get_prompt(analysis_type, news_item)
         
         try:
-            # 调用API
-            headers = self._get_headers()
+            with self._tracked_request():
+                response = self._post(self._build_analysis_payload(prompt))
+                response.raise_for_status()
+                result = response.json()
             
-            # 根据API类型准备请求数据
-            if self.api_type == "anthropic":
-                data = self._prepare_anthropic_request(prompt)
-            elif self.api_type == "ollama":
-                data = self._prepare_ollama_request(prompt)
-            else:  # OpenAI或通用格式
-                data = {
-                    'model': self.model,
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'temperature': self.temperature,
-                    'max_tokens': self.max_tokens
-                }
+            return self._finish_analysis(news_item, analysis_type, result)
             
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                timeout=self.timeout
-            )
+        except Exception as e:
+            self.logger.error(f"调用LLM API失败: {str(e)}")
+            raise
+    
+    def complete(self, prompt, max_tokens=None):
+        """发送单轮提示词，返回模型的原始回复文本（不使用分析缓存，不格式化）
+        
+        Args:
+            prompt: 提示文本
+            max_tokens: 回复的最大token数，默认使用客户端设置
             
+        Returns:
+            str: 回复文本
+        """
+        if not self.api_key:
+            raise ValueError("API密钥未设置，请在设置中配置有效的API密钥")
+        
+        with self._tracked_request():
+            response = self._post(self._build_analysis_payload(prompt, max_tokens))
             response.raise_for_status()
             result = response.json()
+        
+        content = self._extract_content_from_response(result)
+        if not content:
+            raise ValueError("API返回的内容为空")
+        return content
+    
+    def _build_analysis_payload(self, prompt, max_tokens=None):
+        """根据API类型准备分析请求数据
+        
+        Args:
+            prompt: 提示文本
+            max_tokens: 回复的最大token数，默认使用客户端设置
             
-            # 提取回复内容
-            content = self._extract_content_from_response(result)
-            
-            if not content:
-                raise ValueError("API返回的内容为空")
+        Returns:
+            dict: 请求数据
+        """
+        if self.api_type == "anthropic":
+            data = self._prepare_anthropic_request(prompt)
+        elif self.api_type == "ollama":
+            data = self._prepare_ollama_request(prompt)
+        else:  # OpenAI或通用格式
+            data = {
+                'model': self.model,
+                'messages': [{'role': 'user', 'content': prompt}],
+                'temperature': self.temperature,
+                'max_tokens': self.max_tokens
+            }
+        
+        if max_tokens:
+            if self.api_type == "ollama":
+                data['options']['num_predict'] = max_tokens
+            else:
+                data['max_tokens'] = max_tokens
+        return data
+    
+    def _finish_analysis(self, news_item, analysis_type, result):
+        """从分析响应中提取内容，写入缓存并格式化
+        
+        Args:
+            news_item: 新闻数据字典
+            analysis_type: 分析类型
+            result: API响应的JSON数据
             
-            return self._format_analysis_result(content, analysis_type)
+        Returns:
+            str: 格式化的分析结果HTML
+        """
+        content = self._extract_content_from_response(result)
+        
+        if not content:
+            raise ValueError("API返回的内容为空")
+        
+        if self.analysis_cache:
+            self.analysis_cache.put(
+                self._analysis_cache_key(news_item, analysis_type), content,
+                title=news_item.get('title', ''), analysis_type=analysis_type,
+                model=self.model
+            )
+        
+        return self._format_analysis_result(content, analysis_type)
+    
+    def analyze_many(self, news_items, analysis_type='摘要', concurrency=4, callback=None,
+                     should_stop=None, use_cache=True):
+        """批量分析新闻
+        
+        缓存命中的新闻直接返回，其余新闻由线程池并发分析，请求速率受客户端限流器限制。
+        每条新闻完成后立即在调用方线程中回调，回调顺序为完成顺序。
+        
+        Args:
+            news_items: 新闻数据字典列表
+            analysis_type: 分析类型，默认为'摘要'
+            concurrency: 同时进行的最大请求数
+            callback: 每条新闻完成后调用的函数，参数为该条的结果字典（可选）
+            should_stop: 返回True时停止提交新请求的函数（可选）
+            use_cache: 是否使用分析结果缓存
             
-        except Exception as e:
-            self.logger.error(f"调用LLM API失败: {str(e)}")
-            raise
+        Returns:
+            list: [{'index': 序号, 'item': 新闻, 'result': 分析结果HTML, 'error': 错误信息,
+                    'cached': 是否来自缓存}, ...]，顺序与news_items一致；
+                  停止后未分析的新闻error为'已取消'
+        """
+        should_stop = should_stop or (lambda: False)
+        results = [None] * len(news_items)
+        
+        def entry(index, result=None, error=None, cached=False):
+            return {
+                'index': index,
+                'item': news_items[index],
+                'result': result,
+                'error': error,
+                'cached': cached
+            }
+        
+        def finish(result):
+            results[result['index']] = result
+            if callback:
+                callback(result)
+        
+        # 先返回缓存命中的结果
+        pending = []
+        for index, news_item in enumerate(news_items):
+            cached = self.get_cached_analysis(news_item, analysis_type) if use_cache else None
+            if cached is not None:
+                finish(entry(index, cached, cached=True))
+            else:
+                pending.append(index)
+        
+        def work(index):
+            if should_stop():
+                return entry(index, error='已取消')
+            # 模拟分析不调用API，无需限流
+            if self.api_key and not self.rate_limiter.acquire(should_stop=should_stop):
+                return entry(index, error='已取消')
+            try:
+                return entry(index, self.analyze_news(news_items[index], analysis_type, use_cache=False))
+            except Exception as e:
+                return entry(index, error=str(e))
+        
+        if pending:
+            workers = max(1, min(concurrency, len(pending)))
+            self.logger.info(f"开始批量{analysis_type}分析: {len(pending)} 条待分析，"
+                             f"{len(news_items) - len(pending)} 条命中缓存，并发数 {workers}")
+            
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='llm-batch') as pool:
+                futures = [pool.submit(work, index) for index in pending]
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    finish(future.result())
+                    if should_stop():
+                        for other in futures:
+                            other.cancel()
+        
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = entry(index, error='已取消')
+        
+        failed = sum(1 for result in results if result['error'])
+        self.logger.info(f"批量{analysis_type}分析结束: 共 {len(results)} 条，失败或取消 {failed} 条")
+        return results
     
     def _prepare_anthropic_request(self, prompt):
         """准备Anthropic API请求
@@ -146,12 +465,58 @@ class LLMClient:
         return {
             'model': self.model,
             'messages': [{'role': 'user', 'content': prompt}],
+            'stream': False,
             'options': {
                 'temperature': self.temperature,
                 'num_predict': self.max_tokens
             }
         }
     
+    def _build_chat_payload(self, messages, stream=False):
+        """准备聊天请求数据
+        
+        Args:
+            messages: 消息列表（可包含system消息）
+            stream: 是否请求流式响应
+            
+        Returns:
+            dict: 请求数据
+        """
+        if self.api_type == "anthropic":
+            # Anthropic的系统提示词是顶层参数，不能作为消息发送
+            system = "\n\n".join(m['content'] for m in messages if m.get('role') == 'system')
+            data = {
+                'model': self.model,
+                'messages': [m for m in messages if m.get('role') != 'system'],
+                'temperature': self.temperature,
+                'max_tokens': self.max_tokens,
+                'stream': stream
+            }
+            if system:
+                data['system'] = system
+            return data
+        elif self.api_type == "ollama":
+            # Ollama默认返回流式响应，非流式时需要显式关闭
+            return {
+                'model': self.model,
+                'messages': messages,
+                'stream': stream,
+                'options': {
+                    'temperature': self.temperature,
+                    'num_predict': self.max_tokens
+                }
+            }
+        else:  # OpenAI或通用格式
+            data = {
+                'model': self.model,
+                'messages': messages,
+                'temperature': self.temperature,
+                'max_tokens': self.max_tokens
+            }
+            if stream:
+                data['stream'] = True
+            return data
+    
     def _extract_content_from_response(self, result):
         """从不同API响应中提取内容
         
@@ -169,7 +534,8 @@ class LLMClient:
                         return item.get('text', '')
             return result.get('content', [{}])[0].get('text', '')
         elif self.api_type == "ollama":
-            return result.get('response', '')
+            # /api/chat 返回message，/api/generate 返回response
+            return (result.get('message') or {}).get('content') or result.get('response', '')
         else:  # OpenAI或通用格式
             return result.get('choices', [{}])[0].get('message', {}).get('content', '')
     
@@ -193,30 +559,13 @@ class LLMClient:
                 callback(mock_response, True)
             return mock_response
         
-        # 准备消息列表
-        processed_messages = []
-        
-        # 添加系统消息
-        if context:
-            system_msg = {
-                'role': 'system',
-                'content': f"你是一个新闻分析助手。以下是相关的新闻信息：\n\n{context}"
-            }
-            processed_messages.append(system_msg)
-        else:
-            processed_messages.append({
-                'role': 'system',
-                'content': "你是一个专业的新闻分析助手，可以回答各种问题。"
-            })
-        
-        # 添加历史消息
-        processed_messages.extend(messages)
+        processed_messages = self._prepare_chat_messages(messages, context)
         
         # 如果是流式模式且有回调函数
         if stream and callback:
             # 启动线程进行流式处理
             thread = threading.Thread(
-                target=self._simulated_stream_response,
+                target=self._stream_chat_response,
                 args=(processed_messages, callback)
             )
             thread.daemon = True
@@ -229,164 +578,96 @@ class LLMClient:
                 callback(response, True)
             return response
     
-    def _simulated_stream_response(self, messages, callback):
-        """模拟流式响应
-        
-        此方法先获取完整回复，然后逐字符发送以模拟打字效果
+    def _prepare_chat_messages(self, messages, context=""):
+        """在聊天历史前加上系统消息
         
         Args:
-            messages: 消息列表
-            callback: 回调函数，用于接收更新
-        """
-        try:
-            # 先获取完整响应
-            full_response = self._send_chat_request(messages)
-            
-            # 分段发送响应，模拟流式效果
-            collected_message = ""
-            
-            # 定义每次发送的字符数和延迟
-            chunk_size = 5  # 每次发送字符数
-            delay = 0.05    # 每次发送后的延迟(秒)
-            
-            # 分段发送
-            for i in range(0, len(full_response), chunk_size):
-                chunk = full_response[i:i+chunk_size]
-                collected_message += chunk
-                
-                # 发送部分响应（未完成）
-                callback(collected_message, False)
-                
-                # 添加延迟模拟打字效果
-                time.sleep(delay)
+            messages: 聊天历史消息列表
+            context: 上下文文本，默认为空
             
-            # 发送最终完整响应
-            callback(full_response, True)
+        Returns:
+            list: 发送给API的消息列表
+        """
+        # 准备消息列表
+        processed_messages = []
         
-        except Exception as e:
-            self.logger.error(f"流式处理失败: {str(e)}")
-            error_message = f"""
-            <div style="color: #d32f2f; font-weight: bold;">
-                处理失败: {str(e)}
-            </div>
-            <div>
-                请检查API设置和网络连接。可能需要在语言模型设置中重新配置API密钥和URL。
-            </div>
-            """
-            callback(error_message, True)
+        # 添加系统消息
+        if context:
+            system_msg = {
+                'role': 'system',
+                'content': f"你是一个新闻分析助手。以下是相关的新闻信息：\n\n{context}"
+            }
+            processed_messages.append(system_msg)
+        else:
+            processed_messages.append({
+                'role': 'system',
+                'content': "你是一个专业的新闻分析助手，可以回答各种问题。"
+            })
+        
+        # 添加历史消息
+        processed_messages.extend(messages)
+        return processed_messages
     
     def _stream_chat_response(self, messages, callback):
-        """处理真实流式聊天响应（未使用）
+        """处理流式聊天响应
         
-        此方法尝试使用API的真实流式响应功能
-        但由于兼容性问题，现在使用模拟流式响应代替
+        边接收边回调累积的回复，OpenAI和Anthropic解析SSE事件，Ollama解析NDJSON。
+        服务端不支持流式输出或在收到任何内容前失败时，退回非流式请求。
         
         Args:
             messages: 消息列表
-            callback: 回调函数
+            callback: 回调函数，参数为 (累积的回复, 是否完成)
         """
+        collected_message = ""
         try:
-            headers = self._get_headers()
-            
-            # 根据API类型准备请求数据
-            if self.api_type == "anthropic":
-                data = {
-                    'model': self.model,
-                    'messages': messages,
-                    'temperature': self.temperature,
-                    'max_tokens': self.max_tokens,
-                    'stream': True
-                }
-            elif self.api_type == "ollama":
-                data = {
-                    'model': self.model,
-                    'messages': messages,
-                    'stream': True,
-                    'options': {
-                        'temperature': self.temperature,
-                        'num_predict': self.max_tokens
-                    }
-                }
-            else:  # OpenAI或通用格式
-                data = {
-                    'model': self.model,
-                    'messages': messages,
-                    'temperature': self.temperature,
-                    'max_tokens': self.max_tokens,
-                    'stream': True
-                }
-            
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                stream=True,
-                timeout=self.timeout
-            )
-            
-            response.raise_for_status()
-            
-            # 处理流式响应
-            collected_message = ""
-            
-            for chunk in response.iter_lines():
-                if not chunk:
-                    continue
-                
-                chunk = chunk.decode('utf-8', errors='ignore')
-                content = ""
-                is_done = False
-                
-                # 处理各种API格式的流式响应
-                try:
-                    if self.api_type == "openai":
-                        if chunk.startswith("data: "):
-                            if chunk == "data: [DONE]":
-                                is_done = True
-                                continue
-                                
-                            json_str = chunk[6:]
-                            chunk_data = json.loads(json_str)
-                            content = chunk_data.get('choices', [{}])[0].get('delta', {}).get('content', '')
+            with self._tracked_request():
+                data = self._build_chat_payload(messages, stream=True)
+                with self._post(data, stream=True) as response:
+                    response.raise_for_status()
                     
-                    elif self.api_type == "anthropic":
-                        if chunk.startswith("data: "):
-                            if chunk == "data: [DONE]":
-                                is_done = True
-                                continue
-                                
-                            json_str = chunk[6:]
-                            chunk_data = json.loads(json_str)
-                            
-                            if 'delta' in chunk_data:
-                                content = chunk_data['delta'].get('text', '')
-                            elif 'completion' in chunk_data:
-                                content = chunk_data['completion']
+                    # 服务端忽略了stream参数，直接返回完整的JSON
+                    content_type = response.headers.get('Content-Type', '')
+                    if self.api_type != "ollama" and 'application/json' in content_type:
+                        collected_message = self._extract_content_from_response(response.json())
+                    else:
+                        parser = StreamParser(self.api_type)
+                        last_callback = 0.0
                     
-                    elif self.api_type == "ollama":
-                        chunk_data = json.loads(chunk)
-                        content = chunk_data.get('response', '')
-                        is_done = chunk_data.get('done', False)
-                
-                except (json.JSONDecodeError, KeyError) as e:
-                    self.logger.error(f"解析流式响应失败: {str(e)}, chunk: {chunk}")
-                    continue
-                
-                # 如果有内容，更新累积消息并回调
-                if content:
-                    collected_message += content
-                    callback(collected_message, False)
-                
-                # 如果响应完成，发送最终回调
-                if is_done:
-                    callback(collected_message, True)
-                    break
+                        for line in response.iter_lines():
+                            content = parser.feed(line)
+                            if content:
+                                collected_message += content
+                                # 限制界面刷新频率，每次回调都会重新渲染整条回复
+                                now = time.monotonic()
+                                if now - last_callback >= self.STREAM_CALLBACK_INTERVAL:
+                                    callback(collected_message, False)
+                                    last_callback = now
+                            if parser.done:
+                                break
+                    
+                        collected_message += parser.close()
+            
+            if not collected_message:
+                raise ValueError("API返回的内容为空")
             
-            # 确保至少一次完成回调
             callback(collected_message, True)
-                
+            
         except Exception as e:
+            if not collected_message and self._should_fall_back(e):
+                # 尚未收到任何内容，退回非流式请求
+                self.logger.warning(f"流式请求失败，改用非流式请求: {str(e)}")
+                try:
+                    callback(self._send_chat_request(messages), True)
+                    return
+                except Exception as fallback_error:
+                    e = fallback_error
+            
             self.logger.error(f"流式处理失败: {str(e)}")
+            if collected_message:
+                # 保留已收到的内容
+                callback(f"{collected_message}\n\n（输出中断: {str(e)}）", True)
+                return
+            
             error_message = f"""
             <div style="color: #d32f2f; font-weight: bold;">
                 处理失败: {str(e)}
@@ -397,6 +678,18 @@ class LLMClient:
             """
             callback(error_message, True)
     
+    def _should_fall_back(self, error):
+        """流式请求失败后是否值得改用非流式请求
+        
+        网络错误、限流和服务端错误已经按重试策略重试过，认证错误重试也不会成功，
+        这些情况不再发送非流式请求；服务端拒绝流式参数等其他错误则退回。
+        """
+        if isinstance(error, RETRYABLE_EXCEPTIONS):
+            return False
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code in (400, 404, 405, 406, 415, 422, 501)
+        return True
+    
     def _send_chat_request(self, messages):
         """发送聊天请求
         
@@ -406,42 +699,10 @@ class LLMClient:
         Returns:
             str: 回复内容
         """
-        headers = self._get_headers()
-        
-        # 根据API类型准备请求数据
-        if self.api_type == "anthropic":
-            data = {
-                'model': self.model,
-                'messages': messages,
-                'temperature': self.temperature,
-                'max_tokens': self.max_tokens
-            }
-        elif self.api_type == "ollama":
-            data = {
-                'model': self.model,
-                'messages': messages,
-                'options': {
-                    'temperature': self.temperature,
-                    'num_predict': self.max_tokens
-                }
-            }
-        else:  # OpenAI或通用格式
-            data = {
-                'model': self.model,
-                'messages': messages,
-                'temperature': self.temperature,
-                'max_tokens': self.max_tokens
-            }
-        
-        response = requests.post(
-            self.api_url,
-            headers=headers,
-            json=data,
-            timeout=self.timeout
-        )
-        
-        response.raise_for_status()
-        result = response.json()
+        with self._tracked_request():
+            response = self._post(self._build_chat_payload(messages))
+            response.raise_for_status()
+            result = response.json()
         
         # 提取内容
         content = self._extract_content_from_response(result)
@@ -461,8 +722,6 @@ class LLMClient:
             return False
         
         try:
-            headers = self._get_headers()
-            
             # 根据API类型准备简单测试请求
             if self.api_type == "anthropic":
                 data = {
@@ -474,6 +733,7 @@ class LLMClient:
                 data = {
                     'model': self.model,
                     'messages': [{'role': 'user', 'content': '你好'}],
+                    'stream': False,
                     'options': {'num_predict': 5}
                 }
             else:  # OpenAI或通用格式
@@ -483,17 +743,12 @@ class LLMClient:
                     'max_tokens': 5
                 }
             
-            response = requests.post(
-                self.api_url,
-                headers=headers,
-                json=data,
-                timeout=10
-            )
-            
-            response.raise_for_status()
-            
-            # 尝试解析响应以确认有效性
-            result = response.json()
+            with self._tracked_request():
+                response = self._post(data, timeout=10, retry=False)
+                response.raise_for_status()
+                
+                # 尝试解析响应以确认有效性
+                result = response.json()
             
             # 验证响应中是否有预期的字段
             if self.api_type == "anthropic":
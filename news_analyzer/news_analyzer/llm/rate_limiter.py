@@ -0,0 +1,81 @@
+"""
+客户端限流
+
+令牌桶限流器：按固定速率补充令牌，桶容量决定允许的突发请求数。
+批量分析时多个工作线程共用同一个限流器，使请求速率不超过API的限额。
+"""
+
+import time
+import asyncio
+import threading
+
+
+class TokenBucket:
+    """线程安全的令牌桶类"""
+
+    def __init__(self, rate, capacity=None):
+        """初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            capacity: 桶容量（允许的最大突发数），默认与每秒速率相同且至少为1
+        """
+        if rate <= 0:
+            raise ValueError("限流速率必须大于0")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """尝试立即取出令牌
+
+        Returns:
+            float: 取出成功返回0，否则返回还需等待的秒数
+        """
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1, should_stop=None, timeout=None):
+        """取出令牌，令牌不足时等待
+
+        Args:
+            tokens: 需要的令牌数
+            should_stop: 返回True时放弃等待的函数（可选）
+            timeout: 最长等待时间（秒），None表示不限
+
+        Returns:
+            bool: 是否取到令牌
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if should_stop is not None and should_stop():
+                return False
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            # 分段等待，便于及时响应停止请求
+            time.sleep(min(wait, 0.2))
+
+    async def acquire_async(self, tokens=1):
+        """acquire的异步版本，等待时不阻塞事件循环"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            await asyncio.sleep(wait)
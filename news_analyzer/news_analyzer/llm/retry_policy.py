@@ -0,0 +1,246 @@
+"""
+LLM请求重试策略
+
+对连接错误、超时、限流（429）、服务端错误（5xx）和过载（529）进行重试。
+优先按响应头给出的等待时间（Retry-After、retry-after-ms、限流额度的重置时间）重试，
+否则使用带随机抖动的指数退避。每次请求有总的截止时间，
+单次尝试的超时和重试等待都不会超过剩余时间。
+"""
+
+import re
+import time
+import asyncio
+import random
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+
+
+# 可重试的HTTP状态码（529为Anthropic的过载错误）
+RETRYABLE_STATUS = frozenset([408, 409, 425, 429, 500, 502, 503, 504, 529])
+
+# 可重试的网络异常
+RETRYABLE_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError
+)
+
+# OpenAI限流重置时间的格式，如 "1s"、"6m0s"、"20ms"
+_DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'h': 3600, 'm': 60, 's': 1, 'ms': 0.001}
+
+
+def parse_duration(text):
+    """解析 "6m0s" 形式的时长
+
+    Returns:
+        float: 秒数，无法解析时返回None
+    """
+    parts = _DURATION_PART.findall(text or '')
+    if not parts or ''.join(value + unit for value, unit in parts) != text.strip():
+        return None
+    return sum(float(value) * _DURATION_UNITS[unit] for value, unit in parts)
+
+
+def parse_reset_time(text, now=None):
+    """解析限流额度的重置时间（时长、秒数或RFC 3339时间）
+
+    Returns:
+        float: 距离重置的秒数，无法解析时返回None
+    """
+    text = (text or '').strip()
+    if not text:
+        return None
+
+    duration = parse_duration(text)
+    if duration is not None:
+        return duration
+
+    try:
+        return max(0.0, float(text))
+    except ValueError:
+        pass
+
+    try:
+        reset_at = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if reset_at.tzinfo is None:
+        reset_at = reset_at.replace(tzinfo=timezone.utc)
+    now = now if now is not None else time.time()
+    return max(0.0, reset_at.timestamp() - now)
+
+
+def retry_after(headers, now=None):
+    """从响应头获取服务端要求的等待时间
+
+    Args:
+        headers: 响应头（不区分大小写的字典）
+        now: 当前时间戳（可选）
+
+    Returns:
+        float: 等待秒数，响应头中没有时返回None
+    """
+    value = headers.get('retry-after-ms')
+    if value:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+
+    value = headers.get('Retry-After')
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+                now = now if now is not None else time.time()
+                return max(0.0, retry_at.timestamp() - now)
+            except (TypeError, ValueError):
+                pass
+
+    # 限流额度已用完的维度（x-ratelimit-remaining-requests: 0 等），等到其重置
+    waits = []
+    for name, remaining in headers.items():
+        lower = name.lower()
+        if 'ratelimit' not in lower or 'remaining' not in lower:
+            continue
+        if str(remaining).strip() not in ('0', '0.0'):
+            continue
+        reset = headers.get(lower.replace('remaining', 'reset'))
+        wait = parse_reset_time(reset, now)
+        if wait is not None:
+            waits.append(wait)
+    return max(waits) if waits else None
+
+
+class RetryPolicy:
+    """LLM请求重试策略类"""
+
+    def __init__(self, max_retries=3, base_delay=1.0, max_delay=30.0, deadline=180.0):
+        """初始化重试策略
+
+        Args:
+            max_retries: 最多重试次数（不含首次请求）
+            base_delay: 指数退避的基础等待时间（秒）
+            max_delay: 单次退避的最长等待时间（秒）
+            deadline: 一次请求（含全部重试）的总时限（秒），None表示不限
+        """
+        self.logger = logging.getLogger('news_analyzer.llm.retry_policy')
+        self.max_retries = max(0, int(max_retries))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt):
+        """第attempt次重试前的退避时间（full jitter）"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def next_delay(self, attempt, elapsed, headers=None):
+        """判断一次失败的尝试是否重试
+
+        Args:
+            attempt: 已经进行的重试次数
+            elapsed: 自首次尝试开始经过的秒数
+            headers: 可重试状态码的响应头（网络错误时为None）
+
+        Returns:
+            float: 重试前的等待秒数，不再重试时返回None
+        """
+        hinted = retry_after(headers) if headers is not None else None
+        delay = hinted if hinted is not None else self.backoff(attempt)
+
+        out_of_time = self.deadline is not None and elapsed + delay >= self.deadline
+        if attempt >= self.max_retries or out_of_time:
+            return None
+        return delay
+
+    def _remaining(self, started):
+        """剩余的总时限，超过时抛出超时异常"""
+        if self.deadline is None:
+            return None
+        remaining = self.deadline - (time.monotonic() - started)
+        if remaining <= 0:
+            raise requests.Timeout(f"请求超过总时限 {self.deadline:.0f} 秒")
+        return remaining
+
+    def _log_retry(self, reason, delay, attempt):
+        self.logger.warning(
+            f"请求失败（{reason}），{delay:.1f} 秒后进行第 {attempt}/{self.max_retries} 次重试"
+        )
+
+    def run(self, send, timeout):
+        """发送请求，遇到临时错误时重试
+
+        Args:
+            send: 发送一次请求的函数，参数为本次尝试的超时秒数，返回requests.Response
+            timeout: 单次尝试的超时（秒）
+
+        Returns:
+            requests.Response: 最后一次尝试的响应（可能仍是错误状态，由调用方处理）
+
+        Raises:
+            requests.RequestException: 网络错误重试次数用完或超过截止时间
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self._remaining(started)
+            try:
+                response = send(timeout if remaining is None else min(timeout, remaining))
+            except RETRYABLE_EXCEPTIONS as e:
+                delay = self.next_delay(attempt, time.monotonic() - started)
+                if delay is None:
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    return response
+                delay = self.next_delay(attempt, time.monotonic() - started, response.headers)
+                if delay is None:
+                    return response
+                response.close()
+                reason = f"HTTP {response.status_code}"
+
+            attempt += 1
+            self._log_retry(reason, delay, attempt)
+            time.sleep(delay)
+
+    async def run_async(self, send, timeout, retryable_exceptions):
+        """run的异步版本
+
+        Args:
+            send: 发送一次请求的协程函数，参数为本次尝试的超时秒数，返回带status和headers的响应
+            timeout: 单次尝试的超时（秒）
+            retryable_exceptions: 可重试的网络异常类型
+
+        Returns:
+            最后一次尝试的响应（可能仍是错误状态，由调用方处理）
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            remaining = self._remaining(started)
+            try:
+                response = await send(timeout if remaining is None else min(timeout, remaining))
+            except retryable_exceptions as e:
+                delay = self.next_delay(attempt, time.monotonic() - started)
+                if delay is None:
+                    raise
+                reason = type(e).__name__
+            else:
+                if response.status not in RETRYABLE_STATUS:
+                    return response
+                delay = self.next_delay(attempt, time.monotonic() - started, response.headers)
+                if delay is None:
+                    return response
+                response.release()
+                reason = f"HTTP {response.status}"
+
+            attempt += 1
+            self._log_retry(reason, delay, attempt)
+            await asyncio.sleep(delay)
@@ -0,0 +1,188 @@
+"""
+流式响应解码
+
+解析LLM接口的流式响应：OpenAI和Anthropic使用SSE（server-sent events），
+Ollama 的 /api/chat 和 /api/generate 使用NDJSON。解码器按行输入，
+同步客户端（requests的iter_lines）和异步客户端都可以使用。
+"""
+
+import json
+import logging
+
+
+class StreamError(Exception):
+    """流式响应中返回的错误事件"""
+
+
+class SSEDecoder:
+    """SSE事件解码器
+
+    按行输入，遇到空行时产生一个事件。
+    """
+
+    def __init__(self):
+        self._event = None
+        self._data = []
+
+    def feed(self, line):
+        """输入一行（不含换行符）
+
+        Args:
+            line: str或bytes
+
+        Returns:
+            tuple: 完整的事件 (事件名, 数据)，事件尚未结束时返回None
+        """
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+        line = line.rstrip('\r\n')
+
+        if not line:
+            return self.flush()
+        if line.startswith(':'):
+            # 注释行（常用作心跳）
+            return None
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+
+        if field == 'event':
+            self._event = value
+        elif field == 'data':
+            self._data.append(value)
+        return None
+
+    def flush(self):
+        """结束当前事件
+
+        Returns:
+            tuple: (事件名, 数据)，没有数据时返回None
+        """
+        if not self._data:
+            self._event = None
+            return None
+        event = (self._event or 'message', '\n'.join(self._data))
+        self._event = None
+        self._data = []
+        return event
+
+
+class StreamParser:
+    """将流式响应的各行转换为文本增量"""
+
+    def __init__(self, api_type):
+        """初始化解析器
+
+        Args:
+            api_type: API类型 openai/anthropic/ollama/generic
+        """
+        self.logger = logging.getLogger('news_analyzer.llm.stream_decoder')
+        self.api_type = api_type
+        self.done = False
+        self.finish_reason = None
+        self._sse = SSEDecoder()
+
+    def feed(self, line):
+        """输入响应的一行
+
+        Args:
+            line: str或bytes，不含换行符
+
+        Returns:
+            str: 这一行带来的文本增量，没有时返回空字符串
+
+        Raises:
+            StreamError: 响应中包含错误事件
+        """
+        if isinstance(line, bytes):
+            line = line.decode('utf-8', errors='replace')
+
+        # Ollama以及部分兼容服务直接逐行返回JSON
+        if self.api_type == 'ollama' or line.lstrip().startswith('{'):
+            return self._handle_json_line(line)
+
+        event = self._sse.feed(line)
+        if event is None:
+            return ''
+        return self._handle_event(*event)
+
+    def close(self):
+        """响应结束，处理最后一个没有以空行结尾的事件
+
+        Returns:
+            str: 剩余的文本增量
+        """
+        event = self._sse.flush()
+        return self._handle_event(*event) if event else ''
+
+    def _loads(self, data):
+        try:
+            return json.loads(data)
+        except json.JSONDecodeError:
+            self.logger.warning(f"无法解析的流式数据: {data[:200]}")
+            return None
+
+    def _handle_json_line(self, line):
+        line = line.strip()
+        if not line:
+            return ''
+        payload = self._loads(line)
+        if not isinstance(payload, dict):
+            return ''
+
+        if payload.get('error'):
+            raise StreamError(self._error_message(payload))
+
+        if 'choices' in payload:
+            return self._openai_delta(payload)
+
+        if payload.get('done'):
+            self.done = True
+            self.finish_reason = payload.get('done_reason')
+        message = payload.get('message') or {}
+        return message.get('content') or payload.get('response') or ''
+
+    def _handle_event(self, event, data):
+        if data.strip() == '[DONE]':
+            self.done = True
+            return ''
+
+        payload = self._loads(data)
+        if not isinstance(payload, dict):
+            return ''
+
+        if event == 'error' or payload.get('type') == 'error' or payload.get('error'):
+            raise StreamError(self._error_message(payload))
+
+        if self.api_type == 'anthropic' or ('type' in payload and 'choices' not in payload):
+            return self._anthropic_delta(payload)
+        return self._openai_delta(payload)
+
+    def _anthropic_delta(self, payload):
+        event_type = payload.get('type')
+        if event_type == 'content_block_delta':
+            delta = payload.get('delta') or {}
+            if delta.get('type', 'text_delta') == 'text_delta':
+                return delta.get('text', '')
+        elif event_type == 'message_delta':
+            self.finish_reason = (payload.get('delta') or {}).get('stop_reason')
+        elif event_type == 'message_stop':
+            self.done = True
+        return ''
+
+    def _openai_delta(self, payload):
+        choices = payload.get('choices') or [{}]
+        choice = choices[0]
+        if choice.get('finish_reason'):
+            self.finish_reason = choice['finish_reason']
+        delta = choice.get('delta') or {}
+        # 部分兼容服务在流式响应中使用text字段
+        return delta.get('content') or choice.get('text') or ''
+
+    @staticmethod
+    def _error_message(payload):
+        error = payload.get('error')
+        if isinstance(error, dict):
+            return error.get('message') or json.dumps(error, ensure_ascii=False)
+        return str(error or payload)
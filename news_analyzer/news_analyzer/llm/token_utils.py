@@ -0,0 +1,83 @@
+"""
+Token估算工具
+
+在不依赖具体分词器的情况下估算文本的token数，用于控制提示词长度。
+中日韩文字大约每字1个token，其他文字大约每4个字符1个token；
+估算值偏保守，按估算值分批时不会超出模型的上下文长度。
+"""
+
+import re
+
+
+# 中日韩文字（含假名和谚文）
+_CJK = re.compile(r'[぀-ヿ㐀-䶿一-鿿가-힯豈-﫿]')
+
+# 非中日韩字符每个字符的token数
+_OTHER_CHAR_TOKENS = 0.25
+
+
+def estimate_tokens(text):
+    """估算文本的token数
+
+    Args:
+        text: 文本
+
+    Returns:
+        int: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + int((len(text) - cjk) * _OTHER_CHAR_TOKENS + 0.999)
+
+
+def truncate_to_tokens(text, max_tokens, marker='…'):
+    """将文本截断到不超过指定token数
+
+    Args:
+        text: 文本
+        max_tokens: 最大token数
+        marker: 截断后追加的标记
+
+    Returns:
+        str: 截断后的文本，未超出时原样返回
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    budget = max(0, max_tokens - estimate_tokens(marker))
+    used = 0.0
+    for index, char in enumerate(text):
+        used += 1 if _CJK.match(char) else _OTHER_CHAR_TOKENS
+        if used > budget:
+            return text[:index].rstrip() + marker
+    return text
+
+
+def pack_by_tokens(texts, budget, separator_tokens=1):
+    """按顺序将文本分批，使每批的估算token数不超过预算
+
+    单条文本超出预算时单独成批，调用方应先用 truncate_to_tokens 截断。
+
+    Args:
+        texts: 文本列表
+        budget: 每批的token预算
+        separator_tokens: 每条文本之间的分隔符占用的token数
+
+    Returns:
+        list: 批次列表，每个批次是原文本的列表
+    """
+    batches = []
+    batch = []
+    used = 0
+    for text in texts:
+        cost = estimate_tokens(text) + separator_tokens
+        if batch and used + cost > budget:
+            batches.append(batch)
+            batch = []
+            used = 0
+        batch.append(text)
+        used += cost
+    if batch:
+        batches.append(batch)
+    return batches
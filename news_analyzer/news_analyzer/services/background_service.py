@@ -2,9 +2,12 @@
 后台服务模块 - 使用QThread实现异步任务
 """
 
+import time
 import logging
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from news_analyzer.storage.item_utils import item_key, content_hash, SNAPSHOT_NAME_PATTERN
+
 
 class BackgroundService(QThread):
     """后台服务基类"""
@@ -45,9 +48,23 @@ class BackgroundService(QThread):
 class RSSFetchService(BackgroundService):
     """RSS获取服务"""
     
-    def __init__(self, rss_collector):
+    def __init__(self, rss_collector, stats_store=None, journal=None, storage=None, baseline=None):
         super().__init__()
         self.rss_collector = rss_collector
+        self.stats_store = stats_store
+        
+        # 每个新闻源的结果先写入预写日志，结果保存后由调用方删除日志段
+        self.journal = journal
+        self.journal_segment = journal.begin() if journal is not None else None
+        
+        # 比较基准：本次会话上次提交保存的刷新结果 {去重键: 内容哈希}；
+        # 为None时使用存储中最新的刷新快照（不使用整理生成的归档）
+        self.storage = storage
+        self.baseline = baseline
+        
+        # 任务完成后可用：本次结果的 {去重键: 内容哈希}，以及新出现或内容有变化的新闻的去重键
+        self.item_hashes = {}
+        self.fresh_keys = None
     
     def execute(self):
         """执行RSS获取任务"""
@@ -58,6 +75,7 @@ class RSSFetchService(BackgroundService):
             if not self._is_running:
                 break
             
+            started = time.monotonic()
             try:
                 self.progress_signal.emit(
                     int((i + 1) / total_sources * 100),
@@ -65,10 +83,184 @@ class RSSFetchService(BackgroundService):
                 )
                 
                 items = self.rss_collector._fetch_rss(source)
+                self._record_fetch(source, started, len(items), True)
+                self._journal_batch(source, items)
                 results.extend(items)
                 
                 self.logger.info(f"从 {source['name']} 获取了 {len(items)} 条新闻")
             except Exception as e:
+                self._record_fetch(source, started, 0, False)
                 self.logger.error(f"获取 {source['name']} 失败: {str(e)}")
         
+        self._compare_with_baseline(results)
         return results
+    
+    def _compare_with_baseline(self, results):
+        """与比较基准对照，找出新出现或内容有变化的新闻"""
+        self.item_hashes = {}
+        for item in results:
+            key = item_key(item)
+            if key:
+                self.item_hashes[key] = content_hash(item)
+        
+        try:
+            baseline = self.baseline
+            if baseline is None and self.storage is not None:
+                baseline = self._latest_snapshot_hashes()
+        except Exception as e:
+            self.logger.error(f"读取比较基准失败: {str(e)}")
+            baseline = None
+        
+        if baseline is not None:
+            self.fresh_keys = {key for key, digest in self.item_hashes.items() if baseline.get(key) != digest}
+    
+    def _latest_snapshot_hashes(self):
+        """读取存储中最新的刷新快照的 {去重键: 内容哈希}，没有时返回None"""
+        snapshots = [name for name in self.storage.list_news_files() if SNAPSHOT_NAME_PATTERN.match(name)]
+        if not snapshots:
+            return None
+        
+        hashes = {}
+        for page in self.storage.iter_news_pages(snapshots[-1], 1000):
+            for item in page:
+                key = item_key(item) if isinstance(item, dict) else None
+                if key:
+                    hashes[key] = content_hash(item)
+        return hashes
+    
+    def _record_fetch(self, source, started, item_count, success):
+        """记录单个新闻源的抓取耗时"""
+        if self.stats_store is None:
+            return
+        try:
+            self.stats_store.record_fetch(
+                source['name'], time.monotonic() - started, item_count, success
+            )
+        except Exception as e:
+            self.logger.warning(f"记录抓取统计失败: {str(e)}")
+    
+    def _journal_batch(self, source, items):
+        """将单个新闻源的结果写入预写日志"""
+        if self.journal is None:
+            return
+        try:
+            self.journal.append(self.journal_segment, source['name'], items)
+        except Exception as e:
+            self.logger.warning(f"写入刷新日志失败: {str(e)}")
+
+
+class CompactionService(BackgroundService):
+    """历史数据整理服务"""
+    
+    def __init__(self, compactor):
+        super().__init__()
+        self.compactor = compactor
+    
+    def execute(self):
+        """执行快照整理任务"""
+        return self.compactor.run(
+            progress_callback=self.progress_signal.emit,
+            should_stop=lambda: not self._is_running
+        )
+
+
+class RetrievalIndexService(BackgroundService):
+    """历史新闻检索索引服务"""
+    
+    def __init__(self, retrieval_index, storage):
+        super().__init__()
+        self.retrieval_index = retrieval_index
+        self.storage = storage
+    
+    def execute(self):
+        """为尚未建立索引的历史快照建立检索索引"""
+        return self.retrieval_index.sync_snapshots(
+            self.storage,
+            should_stop=lambda: not self._is_running
+        )
+
+
+class ImportService(BackgroundService):
+    """新闻文件导入服务"""
+    
+    def __init__(self, importer, path):
+        super().__init__()
+        self.importer = importer
+        self.path = path
+    
+    def execute(self):
+        """执行导入任务"""
+        return self.importer.run(
+            self.path,
+            progress_callback=self.progress_signal.emit,
+            should_stop=lambda: not self._is_running
+        )
+
+
+class ExportService(BackgroundService):
+    """新闻筛选导出服务"""
+    
+    def __init__(self, exporter, path, fmt, **filters):
+        super().__init__()
+        self.exporter = exporter
+        self.path = path
+        self.fmt = fmt
+        self.filters = filters
+    
+    def execute(self):
+        """执行导出任务"""
+        return self.exporter.run(
+            self.path, self.fmt,
+            progress_callback=self.progress_signal.emit,
+            should_stop=lambda: not self._is_running,
+            **self.filters
+        )
+
+
+class BatchAnalysisService(BackgroundService):
+    """批量新闻分析服务"""
+    
+    # 单条新闻分析完成，参数为该条的结果字典
+    result_signal = pyqtSignal(object)
+    
+    def __init__(self, llm_client, news_items, analysis_type, concurrency=4):
+        super().__init__()
+        self.llm_client = llm_client
+        self.news_items = news_items
+        self.analysis_type = analysis_type
+        self.concurrency = concurrency
+    
+    def execute(self):
+        """执行批量分析任务"""
+        total = len(self.news_items)
+        completed = 0
+        
+        def on_result(result):
+            nonlocal completed
+            completed += 1
+            self.result_signal.emit(result)
+            self.progress_signal.emit(int(completed * 100 / total), f"已完成 {completed}/{total} 条")
+        
+        return self.llm_client.analyze_many(
+            self.news_items, self.analysis_type,
+            concurrency=self.concurrency,
+            callback=on_result,
+            should_stop=lambda: not self._is_running
+        )
+
+
+class DigestService(BackgroundService):
+    """新闻简报生成服务"""
+    
+    def __init__(self, digest_builder, news_items):
+        super().__init__()
+        self.digest_builder = digest_builder
+        self.news_items = news_items
+    
+    def execute(self):
+        """执行简报生成任务"""
+        return self.digest_builder.build(
+            self.news_items,
+            progress_callback=self.progress_signal.emit,
+            should_stop=lambda: not self._is_running
+        )
@@ -0,0 +1,228 @@
+"""
+异步新闻写入器
+
+在后台线程中保存新闻快照，避免序列化和磁盘写入阻塞界面线程。
+待写入的快照放在有界队列中，同一文件的多次写入会合并为一次；
+未指定文件名的提交（刷新结果）在批量窗口内合并为一个快照，同一新闻保留最新提交的版本。
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from news_analyzer.storage.item_utils import item_key
+
+
+class AsyncNewsWriter:
+    """异步新闻写入器类"""
+
+    def __init__(self, storage, max_pending=8, batch_window=0.5):
+        """初始化写入器
+
+        Args:
+            storage: NewsStorage实例，实际的写入由它完成
+            max_pending: 队列中最多允许的待写入快照数
+            batch_window: 收到第一个写入请求后等待更多请求的时间（秒），窗口内的请求合并为一批
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.async_writer')
+        self.storage = storage
+        self.max_pending = max_pending
+        self.batch_window = batch_window
+
+        # 待写入快照: {filename: (news_items, [callback, ...])}
+        self._pending = OrderedDict()
+        # 正在合并刷新结果的待写入快照的文件名
+        self._merge_target = None
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._writing = False
+        self._closed = False
+        self._thread = None
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(
+            target=self._run, name='news-writer', daemon=True
+        )
+        self._thread.start()
+        self.logger.info("异步写入线程已启动")
+
+    def submit(self, news_items, filename=None, callback=None):
+        """提交写入请求（不阻塞）
+
+        Args:
+            news_items: 新闻条目列表
+            filename: 文件名（可选）；未指定时使用当前时间戳，并与尚未写入的
+                      其他未指定文件名的提交合并为一个快照
+            callback: 写入完成后在写入线程中调用的函数，参数为保存的文件路径
+                      （失败时为None）
+
+        Returns:
+            str: 将要写入的文件名；队列已满或写入器已关闭时返回None，
+                 调用方应自行决定是否同步保存
+        """
+        if not news_items:
+            return None
+
+        with self._condition:
+            if self._closed:
+                self.logger.warning("写入器已关闭，拒绝新的写入请求")
+                return None
+
+            if not filename and self._merge_target in self._pending:
+                # 与尚未写入的刷新结果合并，同一新闻以本次提交的版本为准
+                filename = self._merge_target
+                previous, callbacks = self._pending[filename]
+                merged = {item_key(item) or id(item): item for item in previous}
+                merged.update((item_key(item) or id(item), item) for item in news_items)
+                if callback:
+                    callbacks.append(callback)
+                self._pending[filename] = (list(merged.values()), callbacks)
+                self._condition.notify_all()
+                return filename
+
+            if not filename:
+                filename = self._new_filename()
+                self._merge_target = filename
+
+            if filename in self._pending:
+                # 同一文件尚未写入，用最新内容覆盖，回调合并
+                _, callbacks = self._pending.pop(filename)
+                if callback:
+                    callbacks.append(callback)
+                self._pending[filename] = (list(news_items), callbacks)
+            elif len(self._pending) >= self.max_pending:
+                self.logger.warning(f"写入队列已满 ({self.max_pending})，无法提交 {filename}")
+                return None
+            else:
+                self._pending[filename] = (list(news_items), [callback] if callback else [])
+
+            self._condition.notify_all()
+
+        return filename
+
+    def _new_filename(self):
+        """生成按当前时间命名、不与已有或待写入快照重名的文件名"""
+        saved_at = time.time()
+        while True:
+            filename = datetime.fromtimestamp(saved_at).strftime("news_%Y%m%d_%H%M%S.json")
+            if filename not in self._pending and not self.storage.backend.exists(filename):
+                return filename
+            saved_at += 1
+
+    def pending_count(self):
+        """获取待写入的快照数量"""
+        with self._condition:
+            return len(self._pending)
+
+    def flush(self, timeout=None):
+        """等待所有待写入的快照写入磁盘
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否在超时前全部写入
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            # 跳过批量等待窗口，立即写入
+            self._flush_requested = bool(self._pending)
+            self._condition.notify_all()
+            while self._pending or self._writing:
+                if self._thread is None or not self._thread.is_alive():
+                    # 线程未运行时直接在当前线程写入
+                    self._condition.release()
+                    try:
+                        self._drain()
+                    finally:
+                        self._condition.acquire()
+                    continue
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._condition.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """写入剩余快照并停止后台线程
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            bool: 是否所有快照都已写入
+        """
+        flushed = self.flush(timeout)
+
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+        if not flushed:
+            self.logger.warning(f"关闭写入器时仍有 {self.pending_count()} 个快照未写入")
+        else:
+            self.logger.info("异步写入线程已停止")
+        return flushed
+
+    def _run(self):
+        """写入线程主循环"""
+        while True:
+            with self._condition:
+                while not self._pending and not self._closed:
+                    self._condition.wait()
+                if self._closed and not self._pending:
+                    return
+
+            # 从第一个请求起等待固定的时间，期间的其他提交加入同一批，不会提前结束等待
+            if self.batch_window > 0:
+                deadline = time.monotonic() + self.batch_window
+                with self._condition:
+                    while not self._closed and not self._flush_requested:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+
+            self._drain()
+
+    def _drain(self):
+        """取出当前所有待写入快照并写入磁盘"""
+        with self._condition:
+            if not self._pending:
+                return
+            batch = list(self._pending.items())
+            self._pending.clear()
+            self._merge_target = None
+            self._flush_requested = False
+            self._writing = True
+
+        try:
+            for filename, (news_items, callbacks) in batch:
+                filepath = None
+                try:
+                    filepath = self.storage.save_news(news_items, filename)
+                except Exception as e:
+                    self.logger.error(f"异步保存 {filename} 失败: {str(e)}")
+
+                for callback in callbacks:
+                    try:
+                        callback(filepath)
+                    except Exception as e:
+                        self.logger.error(f"写入完成回调执行失败: {str(e)}")
+
+            self.logger.debug(f"批量写入了 {len(batch)} 个快照")
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
@@ -0,0 +1,371 @@
+"""
+快照存储后端
+
+NewsStorage 通过 StorageBackend 接口读写快照，索引、缓存和统计与具体格式无关。
+快照名称统一沿用 news_*.json 的命名，作为快照在各后端中的标识：
+
+- json: 每个快照一个JSON数组文件（默认，与早期版本的数据兼容）
+- ndjson: 每个快照一个NDJSON文件，每行一条新闻
+- sqlite: 所有快照保存在同一个SQLite数据库中
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from news_analyzer.storage.json_stream import iter_json_array, iter_ndjson
+
+
+class StorageBackend:
+    """快照存储后端基类"""
+
+    # 后端名称，用于配置
+    name = None
+
+    def __init__(self, root):
+        """初始化后端
+
+        Args:
+            root: 快照存储目录
+        """
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def location(self, name):
+        """获取快照的存储位置（用于日志和返回值）"""
+        return os.path.join(self.root, name)
+
+    def save(self, name, news_items):
+        """原子地保存一个快照，已存在时覆盖
+
+        Args:
+            name: 快照名称
+            news_items: 新闻条目列表
+        """
+        self.save_pages(name, [news_items])
+
+    def save_pages(self, name, pages):
+        """流式保存一个快照，全部写完后才对读取可见
+
+        Args:
+            name: 快照名称
+            pages: 产生新闻条目列表的可迭代对象
+
+        Returns:
+            int: 写入的条目数；为0时不创建快照
+        """
+        raise NotImplementedError("子类必须实现save_pages方法")
+
+    def iter_items(self, name):
+        """逐条迭代快照中的新闻
+
+        Raises:
+            FileNotFoundError: 快照不存在
+        """
+        raise NotImplementedError("子类必须实现iter_items方法")
+
+    def load(self, name):
+        """读取快照中的全部新闻"""
+        return list(self.iter_items(name))
+
+    def delete(self, name):
+        """删除快照
+
+        Returns:
+            bool: 快照存在并被删除时返回True
+        """
+        raise NotImplementedError("子类必须实现delete方法")
+
+    def stat(self, name):
+        """获取快照的修改时间和大小
+
+        Returns:
+            tuple: (修改时间戳, 字节数)，快照不存在时返回None
+        """
+        raise NotImplementedError("子类必须实现stat方法")
+
+    def exists(self, name):
+        """检查快照是否存在"""
+        return self.stat(name) is not None
+
+    def list_names(self):
+        """列出所有快照名称（不保证顺序）"""
+        raise NotImplementedError("子类必须实现list_names方法")
+
+    def catalog(self):
+        """获取所有快照的元数据
+
+        Returns:
+            list: [(快照名称, 修改时间戳, 字节数), ...]（不保证顺序）
+        """
+        catalog = []
+        for name in self.list_names():
+            info = self.stat(name)
+            if info is not None:
+                catalog.append((name,) + info)
+        return catalog
+
+
+class _FileBackend(StorageBackend):
+    """每个快照一个文件的后端基类"""
+
+    # 磁盘上的文件扩展名
+    extension = '.json'
+
+    def _path(self, name):
+        return os.path.join(self.root, os.path.splitext(name)[0] + self.extension)
+
+    def location(self, name):
+        return self._path(name)
+
+    def _write_header(self, f):
+        pass
+
+    def _write_item(self, f, item, index):
+        raise NotImplementedError
+
+    def _write_footer(self, f, count):
+        pass
+
+    def save_pages(self, name, pages):
+        filepath = self._path(name)
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        count = 0
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                self._write_header(f)
+                for page in pages:
+                    for item in page:
+                        self._write_item(f, item, count)
+                        count += 1
+                self._write_footer(f, count)
+                f.flush()
+                os.fsync(f.fileno())
+
+            if count:
+                os.replace(tmp_path, filepath)
+            else:
+                os.remove(tmp_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return count
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stat(self, name):
+        try:
+            stat = os.stat(self._path(name))
+        except OSError:
+            return None
+        return stat.st_mtime, stat.st_size
+
+    def list_names(self):
+        return [
+            f[:-len(self.extension)] + '.json'
+            for f in os.listdir(self.root)
+            if f.endswith(self.extension)
+        ]
+
+
+class JsonBackend(_FileBackend):
+    """JSON数组文件后端"""
+
+    name = 'json'
+    extension = '.json'
+
+    def save(self, name, news_items):
+        filepath = self._path(name)
+        tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(news_items, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _write_header(self, f):
+        f.write('[')
+
+    def _write_item(self, f, item, index):
+        # 与json.dump(indent=2)的输出格式保持一致
+        text = json.dumps(item, ensure_ascii=False, indent=2)
+        f.write(',\n  ' if index else '\n  ')
+        f.write(text.replace('\n', '\n  '))
+
+    def _write_footer(self, f, count):
+        f.write('\n]' if count else ']')
+
+    def iter_items(self, name):
+        with open(self._path(name), 'r', encoding='utf-8') as f:
+            yield from iter_json_array(f)
+
+    def load(self, name):
+        with open(self._path(name), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+
+class NdjsonBackend(_FileBackend):
+    """NDJSON文件后端"""
+
+    name = 'ndjson'
+    extension = '.ndjson'
+
+    def _write_item(self, f, item, index):
+        f.write(json.dumps(item, ensure_ascii=False))
+        f.write('\n')
+
+    def iter_items(self, name):
+        with open(self._path(name), 'r', encoding='utf-8') as f:
+            yield from iter_ndjson(f)
+
+
+class SqliteBackend(StorageBackend):
+    """SQLite数据库后端
+
+    快照元数据和新闻条目分表保存，按位置顺序逐条读取。
+    location返回快照目录下的虚拟路径，便于日志和调用方统一处理。
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, root):
+        super().__init__(root)
+        self.db_path = os.path.join(self.root, 'snapshots.db')
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    name TEXT PRIMARY KEY,
+                    updated_at REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS snapshot_items (
+                    name TEXT NOT NULL,
+                    pos INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    PRIMARY KEY (name, pos)
+                )
+            """)
+            # 清理上次异常退出时残留的未完成写入
+            self._conn.execute(
+                "DELETE FROM snapshot_items WHERE name NOT IN (SELECT name FROM snapshots)"
+            )
+
+    def save_pages(self, name, pages):
+        # 先写入临时名称，全部写完后在一个事务中替换，读取方不会看到写了一半的快照
+        staging = f"{name}.{threading.get_ident()}.tmp"
+        count = size = 0
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM snapshot_items WHERE name = ?", (staging,))
+            for page in pages:
+                rows = []
+                for item in page:
+                    data = json.dumps(item, ensure_ascii=False)
+                    rows.append((staging, count, data))
+                    size += len(data.encode('utf-8'))
+                    count += 1
+                with self._lock, self._conn:
+                    self._conn.executemany(
+                        "INSERT INTO snapshot_items (name, pos, data) VALUES (?, ?, ?)", rows
+                    )
+
+            with self._lock, self._conn:
+                if count:
+                    self._conn.execute("DELETE FROM snapshot_items WHERE name = ?", (name,))
+                    self._conn.execute(
+                        "UPDATE snapshot_items SET name = ? WHERE name = ?", (name, staging)
+                    )
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO snapshots (name, updated_at, size) VALUES (?, ?, ?)",
+                        (name, time.time(), size)
+                    )
+        except Exception:
+            with self._lock, self._conn:
+                self._conn.execute("DELETE FROM snapshot_items WHERE name = ?", (staging,))
+            raise
+        return count
+
+    def iter_items(self, name):
+        if self.stat(name) is None:
+            raise FileNotFoundError(name)
+
+        # 分批读取，避免长时间占用连接
+        pos = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT pos, data FROM snapshot_items WHERE name = ? AND pos > ? "
+                    "ORDER BY pos LIMIT 500", (name, pos)
+                ).fetchall()
+            if not rows:
+                return
+            for pos, data in rows:
+                yield json.loads(data)
+
+    def delete(self, name):
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM snapshots WHERE name = ?", (name,))
+            self._conn.execute("DELETE FROM snapshot_items WHERE name = ?", (name,))
+        return cursor.rowcount > 0
+
+    def stat(self, name):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT updated_at, size FROM snapshots WHERE name = ?", (name,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def list_names(self):
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM snapshots")]
+
+    def catalog(self):
+        with self._lock:
+            return [tuple(row) for row in self._conn.execute(
+                "SELECT name, updated_at, size FROM snapshots"
+            )]
+
+
+# 可用的后端，键为配置中使用的名称
+BACKENDS = {
+    backend.name: backend for backend in (JsonBackend, NdjsonBackend, SqliteBackend)
+}
+
+
+def create_backend(name, root):
+    """按名称创建存储后端
+
+    Args:
+        name: 后端名称，取值见 BACKENDS
+        root: 快照存储目录
+
+    Returns:
+        StorageBackend: 后端实例
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    try:
+        backend_class = BACKENDS[(name or 'json').lower()]
+    except KeyError:
+        raise ValueError(f"未知的存储后端: {name}，可选: {', '.join(BACKENDS)}")
+    return backend_class(root)
@@ -0,0 +1,539 @@
+"""
+本地BM25检索索引
+
+为新闻建立BM25倒排索引，用NumPy向量化计算得分，完全离线运行，
+用于为聊天挑选与问题相关的新闻。分词与全文索引相同（CJK按bigram，其他文字按单词）。
+
+索引按段增量构建：每次添加的一批新闻生成一个按词排列的不可变段，
+段数超过上限时合并为一个段。同一新闻（去重键相同）内容变化后重新添加时，旧版本被标记删除，
+在下一次合并时清除。
+
+索引只保存去重键、内容哈希和倒排数据，不保存新闻内容：检索结果按去重键从全文索引中读取，
+本次会话中刷新得到、尚未建立快照索引的新闻暂存在内存中。
+与快照同步后，倒排数据、已索引的快照及每个快照包含的新闻保存到 index/bm25.npz 和
+index/bm25.json，下次启动时只需读取新增的快照；快照被删除后，
+不再出现在任何快照中的新闻从索引中移除。
+"""
+
+import os
+import json
+import math
+import logging
+import threading
+from collections import Counter
+
+import numpy as np
+
+from news_analyzer.storage.item_utils import item_key, content_hash
+from news_analyzer.storage.search_index import tokenize
+
+
+class _Segment:
+    """按词排列的倒排段
+
+    terms: 段内出现的词ID（升序）；offsets: 每个词的倒排表在doc_ids/tfs中的起止位置
+    """
+
+    __slots__ = ('terms', 'offsets', 'doc_ids', 'tfs')
+
+    def __init__(self, doc_ids, term_ids, tfs):
+        order = np.lexsort((doc_ids, term_ids))
+        term_ids = term_ids[order]
+        self.doc_ids = doc_ids[order]
+        self.tfs = tfs[order]
+        self.terms, starts = np.unique(term_ids, return_index=True)
+        self.offsets = np.append(starts, len(term_ids)).astype(np.int64)
+
+    @classmethod
+    def from_arrays(cls, terms, offsets, doc_ids, tfs):
+        """由已按词排列的数组（如从磁盘读取的段）直接创建段"""
+        segment = cls.__new__(cls)
+        segment.terms = terms
+        segment.offsets = offsets
+        segment.doc_ids = doc_ids
+        segment.tfs = tfs
+        return segment
+
+    def __len__(self):
+        return len(self.doc_ids)
+
+    def postings(self, term_id):
+        """词的倒排表
+
+        Returns:
+            tuple: (文档ID数组, 词频数组)，词不在段内时返回None
+        """
+        pos = np.searchsorted(self.terms, term_id)
+        if pos >= len(self.terms) or self.terms[pos] != term_id:
+            return None
+        start, end = self.offsets[pos], self.offsets[pos + 1]
+        return self.doc_ids[start:end], self.tfs[start:end]
+
+    def triples(self):
+        """展开为 (文档ID, 词ID, 词频) 数组，用于合并"""
+        term_ids = np.repeat(self.terms, np.diff(self.offsets))
+        return self.doc_ids, term_ids, self.tfs
+
+
+class BM25Index:
+    """BM25检索索引类（线程安全）"""
+
+    # 标题中的词按出现该次数计入词频
+    TITLE_BOOST = 2
+
+    # 文档命中的检索词（按idf计）至少占问题全部检索词的比例，
+    # 避免只命中"最新"、"什么"等常见二元组的新闻被当作相关
+    MIN_COVERAGE = 0.3
+
+    # 保存到磁盘的索引格式版本
+    STATE_VERSION = 1
+    STATE_NAME = 'bm25'
+
+    def __init__(self, k1=1.5, b=0.75, max_segments=8):
+        """初始化索引
+
+        Args:
+            k1: BM25词频饱和参数
+            b: BM25文档长度归一化参数
+            max_segments: 段数上限，超过时合并所有段
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.bm25_index')
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+
+        self._lock = threading.Lock()
+        self._reset()
+
+        # 本次会话中添加、尚未在快照中建立索引的新闻: {去重键: 新闻条目}
+        self._live = {}
+
+        # 与快照同步后用于读取新闻内容和保存索引
+        self._storage = None
+        self._state_path = None
+
+    def _reset(self):
+        """清空索引数据"""
+        self._vocab = {}
+        self._df = np.zeros(1024, dtype=np.int32)
+        self._doc_len = np.zeros(1024, dtype=np.float32)
+        self._alive = np.zeros(1024, dtype=bool)
+        self._doc_key = np.zeros(1024, dtype=np.int32)
+        self._doc_count = 0
+        self._segments = []
+        self._alive_count = 0
+        self._total_len = 0.0
+
+        # 去重键表：键ID -> 去重键、内容哈希、当前文档ID（没有时为-1）
+        self._keys = []
+        self._key_ids = {}
+        self._key_hashes = []
+        self._key_doc = np.full(1024, -1, dtype=np.int32)
+
+        # 已建立索引的快照: {文件名: (修改时间, 大小, 快照中新闻的键ID数组)}
+        self._files = {}
+
+    def __len__(self):
+        return self._alive_count
+
+    @staticmethod
+    def _grow(array, size, fill=0):
+        """按需扩容数组（容量翻倍）"""
+        if size <= len(array):
+            return array
+        grown = np.full(max(size, len(array) * 2), fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _analyze(self, item):
+        """新闻的词频统计"""
+        counts = Counter(tokenize(item.get('description')))
+        for term in tokenize(item.get('title')):
+            counts[term] += self.TITLE_BOOST
+        return counts
+
+    def _is_current(self, key, item_hash):
+        """索引中是否已有内容相同的有效版本"""
+        key_id = self._key_ids.get(key)
+        if key_id is None or self._key_hashes[key_id] != item_hash:
+            return False
+        # 分词前的检查不加锁，数组可能正在被替换，按长度确认
+        doc, alive = self._key_doc[key_id], self._alive
+        return 0 <= doc < len(alive) and bool(alive[doc])
+
+    def _kill(self, doc):
+        """标记文档删除"""
+        self._alive[doc] = False
+        self._alive_count -= 1
+        self._total_len -= float(self._doc_len[doc])
+
+    def add_items(self, news_items):
+        """添加本次会话中获取的新闻，已索引且内容未变的新闻会被跳过
+
+        Args:
+            news_items: 新闻条目列表
+
+        Returns:
+            int: 新增或更新的新闻数
+        """
+        return self._add(news_items, live=True)[0]
+
+    def _add(self, news_items, live):
+        """添加新闻
+
+        Args:
+            news_items: 新闻条目列表
+            live: 是否在内存中暂存新增的新闻（尚未建立快照索引，无法从全文索引读取）
+
+        Returns:
+            tuple: (新增或更新的新闻数, 这批新闻的键ID列表)
+        """
+        # 分词在锁外进行，避免长时间阻塞检索；加锁后再确认一次是否已被其他线程添加
+        pending = []
+        keys = []
+        seen = set()
+        for item in news_items:
+            if not isinstance(item, dict):
+                continue
+            key = item_key(item)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            keys.append(key)
+            item_hash = content_hash(item)
+            if self._is_current(key, item_hash):
+                continue
+            pending.append((key, item_hash, item, self._analyze(item)))
+
+        with self._lock:
+            doc_ids, term_ids, tfs = [], [], []
+            added = 0
+            for key, item_hash, item, counts in pending:
+                if self._is_current(key, item_hash):
+                    continue
+
+                key_id = self._key_ids.get(key)
+                if key_id is None:
+                    key_id = len(self._keys)
+                    self._key_doc = self._grow(self._key_doc, key_id + 1, fill=-1)
+                    self._keys.append(key)
+                    self._key_hashes.append(item_hash)
+                    self._key_ids[key] = key_id
+                else:
+                    old = self._key_doc[key_id]
+                    if old >= 0 and self._alive[old]:
+                        self._kill(old)
+                    self._key_hashes[key_id] = item_hash
+
+                doc = self._doc_count
+                self._doc_count += 1
+                added += 1
+                if live:
+                    self._live[key] = item
+
+                length = 0
+                for term, tf in counts.items():
+                    term_id = self._vocab.setdefault(term, len(self._vocab))
+                    doc_ids.append(doc)
+                    term_ids.append(term_id)
+                    tfs.append(tf)
+                    length += tf
+
+                self._doc_len = self._grow(self._doc_len, doc + 1)
+                self._alive = self._grow(self._alive, doc + 1)
+                self._doc_key = self._grow(self._doc_key, doc + 1)
+                self._doc_len[doc] = length
+                self._alive[doc] = True
+                self._doc_key[doc] = key_id
+                self._key_doc[key_id] = doc
+                self._alive_count += 1
+                self._total_len += length
+
+            key_ids = [self._key_ids[key] for key in keys]
+            if not added:
+                return 0, key_ids
+
+            term_array = np.asarray(term_ids, dtype=np.int32)
+            self._df = self._grow(self._df, len(self._vocab))
+            np.add.at(self._df, term_array, 1)
+            self._segments.append(_Segment(
+                np.asarray(doc_ids, dtype=np.int32), term_array, np.asarray(tfs, dtype=np.float32)
+            ))
+
+            if len(self._segments) > self.max_segments:
+                self._merge()
+            return added, key_ids
+
+    def _merge(self):
+        """合并所有段，清除已删除的文档并重新计算文档频率"""
+        if not self._segments:
+            return
+        doc_ids, term_ids, tfs = (np.concatenate(parts) for parts in zip(
+            *(segment.triples() for segment in self._segments)
+        ))
+        keep = self._alive[doc_ids]
+        doc_ids, term_ids, tfs = doc_ids[keep], term_ids[keep], tfs[keep]
+
+        self._df = np.bincount(term_ids, minlength=len(self._df)).astype(np.int32)
+        self._segments = [_Segment(doc_ids, term_ids, tfs)]
+        self.logger.debug(f"合并检索索引段: {self._alive_count} 篇文档，{len(doc_ids)} 条倒排记录")
+
+    def _compact(self):
+        """合并所有段并重新编号文档，去掉已删除文档占用的位置"""
+        self._merge()
+        alive_docs = np.flatnonzero(self._alive[:self._doc_count])
+        remap = np.full(self._doc_count, -1, dtype=np.int32)
+        remap[alive_docs] = np.arange(len(alive_docs), dtype=np.int32)
+
+        if self._segments:
+            segment = self._segments[0]
+            segment.doc_ids = remap[segment.doc_ids]
+        self._doc_len = self._doc_len[alive_docs]
+        self._doc_key = self._doc_key[alive_docs]
+        self._alive = np.ones(len(alive_docs), dtype=bool)
+        self._doc_count = len(alive_docs)
+
+        valid = self._key_doc >= 0
+        self._key_doc[valid] = remap[self._key_doc[valid]]
+
+    def _drop_unowned(self, removed_key_ids):
+        """删除不再出现在任何已索引快照中的新闻（本次会话中刷新得到的除外，调用方需持有锁）
+
+        Args:
+            removed_key_ids: 已删除快照中新闻的键ID数组列表
+
+        Returns:
+            int: 删除的新闻数
+        """
+        if not removed_key_ids:
+            return 0
+        candidates = np.unique(np.concatenate(removed_key_ids))
+        owned = [key_ids for _, _, key_ids in self._files.values()]
+        if owned:
+            candidates = np.setdiff1d(candidates, np.concatenate(owned), assume_unique=False)
+
+        dropped = 0
+        for key_id in candidates:
+            if self._keys[key_id] in self._live:
+                continue
+            doc = self._key_doc[key_id]
+            if doc >= 0 and self._alive[doc]:
+                self._kill(doc)
+                dropped += 1
+            self._key_doc[key_id] = -1
+        return dropped
+
+    def sync_snapshots(self, storage, should_stop=None):
+        """与存储中的快照同步：为新增的快照建立索引，移除已删除快照中的新闻
+
+        第一次调用时先读取上次保存的索引。快照按时间从旧到新读取，同一新闻以最新快照中的版本为准。
+        索引有变化时保存到磁盘。
+
+        Args:
+            storage: NewsStorage实例
+            should_stop: 返回True时中止的函数（可选）
+
+        Returns:
+            int: 新增或更新的新闻数
+        """
+        if self._state_path is None:
+            self._load(os.path.join(storage.index_dir, self.STATE_NAME))
+        self._storage = storage
+
+        # 检索结果从全文索引读取新闻内容
+        storage.sync_search_index()
+
+        catalog = storage.snapshot_catalog()
+        current = {name: (mtime, size) for name, mtime, size in catalog}
+        with self._lock:
+            removed = [name for name, (mtime, size, _) in self._files.items()
+                       if current.get(name) != (mtime, size)]
+            removed_key_ids = [self._files.pop(name)[2] for name in removed]
+        changed = bool(removed)
+
+        added = 0
+        for filename, mtime, size in catalog:
+            if should_stop and should_stop():
+                break
+            if filename in self._files:
+                continue
+            key_ids = []
+            for page in storage.iter_news_pages(filename, 1000):
+                count, page_ids = self._add(page, live=False)
+                added += count
+                key_ids.extend(page_ids)
+            with self._lock:
+                key_ids = np.unique(np.asarray(key_ids, dtype=np.int32))
+                self._files[filename] = (mtime, size, key_ids)
+                # 已在快照中建立索引的新闻可以从全文索引读取，不再暂存
+                for key_id in key_ids:
+                    self._live.pop(self._keys[key_id], None)
+            changed = True
+
+        # 改写过的快照已重新建立索引，只删除不再属于任何快照的新闻
+        with self._lock:
+            dropped = self._drop_unowned(removed_key_ids)
+
+        if changed:
+            self._save()
+        if added or dropped:
+            self.logger.info(f"检索索引新增 {added} 条、移除 {dropped} 条历史新闻，共 {len(self)} 条")
+        return added
+
+    def _save(self):
+        """合并所有段并保存到磁盘（先写临时文件再替换）"""
+        with self._lock:
+            self._compact()
+            segment = self._segments[0] if self._segments else _Segment(
+                np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+            )
+            names = list(self._files)
+            file_keys = [self._files[name][2] for name in names]
+            arrays = {
+                'df': self._df[:len(self._vocab)].copy(),
+                'doc_len': self._doc_len.copy(),
+                'doc_key': self._doc_key.copy(),
+                'key_doc': self._key_doc[:len(self._keys)].copy(),
+                'terms': segment.terms,
+                'offsets': segment.offsets,
+                'doc_ids': segment.doc_ids,
+                'tfs': segment.tfs,
+                'file_offsets': np.cumsum([0] + [len(keys) for keys in file_keys]).astype(np.int64),
+                'file_keys': (np.concatenate(file_keys) if file_keys else np.zeros(0, dtype=np.int32))
+            }
+            state = {
+                'version': self.STATE_VERSION,
+                'vocab': list(self._vocab),
+                'keys': list(self._keys),
+                'hashes': list(self._key_hashes),
+                'files': [[name, self._files[name][0], self._files[name][1]] for name in names]
+            }
+
+        # 两个文件中的文档数一致才认为是同一次保存的结果
+        state['docs'] = len(arrays['doc_len'])
+        try:
+            with open(self._state_path + '.npz.tmp', 'wb') as f:
+                np.savez(f, **arrays)
+            with open(self._state_path + '.json.tmp', 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(self._state_path + '.npz.tmp', self._state_path + '.npz')
+            os.replace(self._state_path + '.json.tmp', self._state_path + '.json')
+        except Exception as e:
+            self.logger.error(f"保存检索索引失败: {str(e)}")
+
+    def _load(self, state_path):
+        """读取上次保存的索引，并重新加入本次会话中已添加的新闻"""
+        self._state_path = state_path
+        try:
+            with open(state_path + '.json', 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            with np.load(state_path + '.npz', allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.logger.error(f"读取检索索引失败，将重新建立: {str(e)}")
+            return
+        if state.get('version') != self.STATE_VERSION or state.get('docs') != len(arrays['doc_len']):
+            self.logger.warning("检索索引文件不一致，将重新建立")
+            return
+
+        with self._lock:
+            live = self._live
+            self._reset()
+            self._vocab = {term: term_id for term_id, term in enumerate(state['vocab'])}
+            self._keys = state['keys']
+            self._key_ids = {key: key_id for key_id, key in enumerate(self._keys)}
+            self._key_hashes = state['hashes']
+            self._key_doc = arrays['key_doc'].astype(np.int32)
+            self._df = arrays['df'].astype(np.int32)
+            self._doc_len = arrays['doc_len'].astype(np.float32)
+            self._doc_key = arrays['doc_key'].astype(np.int32)
+            self._doc_count = len(self._doc_len)
+            self._alive = np.ones(self._doc_count, dtype=bool)
+            self._alive_count = self._doc_count
+            self._total_len = float(self._doc_len.sum())
+            if len(arrays['doc_ids']):
+                self._segments = [_Segment.from_arrays(
+                    arrays['terms'], arrays['offsets'], arrays['doc_ids'], arrays['tfs']
+                )]
+            offsets = arrays['file_offsets']
+            for index, (name, mtime, size) in enumerate(state['files']):
+                self._files[name] = (mtime, size, arrays['file_keys'][offsets[index]:offsets[index + 1]])
+
+            # 上次会话中刷新得到、但没有保存到任何快照的新闻无法读取内容，不再保留
+            unowned = np.flatnonzero(~np.isin(self._doc_key, arrays['file_keys']))
+            for doc in unowned:
+                self._kill(doc)
+                self._key_doc[self._doc_key[doc]] = -1
+            self._live = live
+
+        # 读取之前已加入的本次会话的新闻
+        self._add(list(live.values()), live=True)
+        self.logger.info(f"读取检索索引: {len(self)} 条新闻，{len(self._files)} 个快照")
+
+    def _resolve(self, keys):
+        """按去重键读取新闻内容：优先使用暂存的新闻，其余从全文索引读取"""
+        items = {key: self._live[key] for key in keys if key in self._live}
+        missing = [key for key in keys if key not in items]
+        if missing and self._storage is not None:
+            try:
+                items.update(self._storage.search_index.get_items(missing))
+            except Exception as e:
+                self.logger.error(f"读取检索结果失败: {str(e)}")
+        return items
+
+    def search(self, query, k=10):
+        """检索与查询最相关的新闻
+
+        Args:
+            query: 查询文本
+            k: 返回的最大条目数
+
+        Returns:
+            list: [(新闻条目, 得分), ...]，按得分从高到低排列
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            total = self._alive_count
+            if not total:
+                return []
+            avg_len = self._total_len / total
+            doc_count = self._doc_count
+            scores = np.zeros(doc_count, dtype=np.float32)
+            coverage = np.zeros(doc_count, dtype=np.float32)
+            norm = self.k1 * (1 - self.b + self.b * self._doc_len[:doc_count] / avg_len)
+
+            # 索引中没有的词按最稀有的词计算，问题的主要词都没有命中时不算相关
+            max_idf = math.log(1 + (total - 0.5) / 1.5)
+            query_idf = 0.0
+            for term in terms:
+                term_id = self._vocab.get(term)
+                df = int(self._df[term_id]) if term_id is not None else 0
+                if not df:
+                    query_idf += max_idf
+                    continue
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                query_idf += idf
+                for segment in self._segments:
+                    postings = segment.postings(term_id)
+                    if postings is None:
+                        continue
+                    docs, tfs = postings
+                    scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm[docs])
+                    coverage[docs] += idf
+
+            alive = self._alive[:doc_count]
+            candidates = np.flatnonzero(alive & (scores > 0) & (coverage >= query_idf * self.MIN_COVERAGE))
+            if len(candidates) > k:
+                top = np.argpartition(-scores[candidates], k - 1)[:k]
+                candidates = candidates[top]
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            ranked = [(self._keys[self._doc_key[doc]], float(scores[doc])) for doc in candidates]
+
+        # 新闻内容在锁外读取；已从全文索引中移除（如所在快照已删除）的新闻不返回
+        items = self._resolve([key for key, _ in ranked])
+        return [(items[key], score) for key, score in ranked if key in items]
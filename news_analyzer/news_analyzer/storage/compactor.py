@@ -0,0 +1,184 @@
+"""
+快照整理
+
+将较早的刷新快照合并为去重后的日归档，再将较早的日归档合并为月归档，
+并按保留策略删除过期或超出容量的数据。归档文件仍是普通的JSON新闻列表，
+可以直接通过 NewsStorage.load_news 加载。
+"""
+
+import logging
+from datetime import datetime, timedelta
+
+from news_analyzer.storage.item_utils import (item_key, snapshot_period,
+                                             SNAPSHOT_NAME_PATTERN,
+                                             DAILY_ARCHIVE_PATTERN)
+
+
+class SnapshotCompactor:
+    """快照整理器类"""
+
+    def __init__(self, storage, daily_after_days=1, monthly_after_days=30,
+                 max_age_days=None, max_total_bytes=None):
+        """初始化整理器
+
+        Args:
+            storage: NewsStorage实例
+            daily_after_days: 保留最近多少天（含今天）的原始快照，更早的合并为日归档
+            monthly_after_days: 早于多少天的日归档合并为月归档
+            max_age_days: 数据最长保留天数，None表示不限
+            max_total_bytes: 新闻数据最大总字节数，None表示不限
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.compactor')
+        self.storage = storage
+        self.daily_after_days = daily_after_days
+        self.monthly_after_days = monthly_after_days
+        self.max_age_days = max_age_days
+        self.max_total_bytes = max_total_bytes
+
+    def run(self, progress_callback=None, should_stop=None):
+        """执行一次整理
+
+        Args:
+            progress_callback: 进度回调，参数为 (百分比, 状态消息)
+            should_stop: 返回True时中止整理的函数（可选）
+
+        Returns:
+            dict: 整理结果统计
+        """
+        def report(percent, message):
+            if progress_callback:
+                progress_callback(percent, message)
+
+        def stopped():
+            return bool(should_stop and should_stop())
+
+        summary = {
+            'daily_archives': 0,
+            'monthly_archives': 0,
+            'merged_files': 0,
+            'deleted_files': 0
+        }
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        # 合并前先将未统计的快照计入统计，避免整理后丢失统计历史
+        self.storage.sync_stats()
+
+        # 第一步：快照 -> 日归档
+        daily_cutoff = today - timedelta(days=self.daily_after_days - 1)
+        groups = self._group_files(
+            SNAPSHOT_NAME_PATTERN, daily_cutoff,
+            lambda start: start.strftime('news_daily_%Y%m%d.json')
+        )
+        self._merge_groups(groups, summary, 'daily_archives', report, 0, 45, stopped)
+
+        # 第二步：日归档 -> 月归档（已有的月归档会与新加入的日期再次合并）
+        if not stopped():
+            monthly_cutoff = today - timedelta(days=self.monthly_after_days)
+            groups = self._group_files(
+                DAILY_ARCHIVE_PATTERN, monthly_cutoff,
+                lambda start: start.strftime('news_monthly_%Y%m.json')
+            )
+            self._merge_groups(groups, summary, 'monthly_archives', report, 45, 90, stopped)
+
+        # 第三步：保留策略
+        if not stopped():
+            report(90, "正在应用保留策略")
+            summary['deleted_files'] = self._apply_retention(today)
+
+        report(100, "整理完成")
+        self.logger.info(
+            f"整理完成: 合并 {summary['merged_files']} 个文件, "
+            f"生成 {summary['daily_archives']} 个日归档和 {summary['monthly_archives']} 个月归档, "
+            f"删除 {summary['deleted_files']} 个过期文件"
+        )
+        return summary
+
+    def _group_files(self, pattern, cutoff, archive_name):
+        """将结束时间早于cutoff的文件按归档文件名分组
+
+        Returns:
+            dict: {归档文件名: [源文件名, ...]}（源文件按时间先后排列）
+        """
+        groups = {}
+        for filename in self.storage.list_news_files():
+            if not pattern.match(filename):
+                continue
+            start, end = snapshot_period(filename)
+            if start is None or end >= cutoff:
+                continue
+            groups.setdefault(archive_name(start), []).append(filename)
+        return groups
+
+    def _merge_groups(self, groups, summary, counter, report, progress_from, progress_to, stopped):
+        """合并每组文件并写入归档"""
+        total = len(groups)
+        for i, (archive_name, sources) in enumerate(sorted(groups.items())):
+            if stopped():
+                return
+
+            report(
+                progress_from + int((progress_to - progress_from) * i / max(total, 1)),
+                f"正在生成归档 {archive_name} ({len(sources)} 个文件)"
+            )
+
+            # 已存在的归档也参与合并，使整理可以重复执行
+            existing = archive_name in self.storage.list_news_files()
+            inputs = ([archive_name] if existing else []) + sources
+
+            merged = {}
+            for filename in inputs:
+                for page in self.storage.iter_news_pages(filename, 1000):
+                    for item in page:
+                        if not isinstance(item, dict):
+                            continue
+                        key = item_key(item)
+                        if key:
+                            # 同一新闻保留最新版本
+                            merged[key] = item
+
+            if not merged:
+                continue
+
+            # 先写入归档再删除源文件，中途失败时数据不会丢失
+            if not self.storage.save_news(list(merged.values()), archive_name):
+                self.logger.error(f"写入归档 {archive_name} 失败，保留源文件")
+                continue
+            self.storage.stats.mark_ingested(archive_name)
+
+            for filename in sources:
+                if self.storage.delete_news_file(filename):
+                    summary['merged_files'] += 1
+            summary[counter] += 1
+
+    def _apply_retention(self, today):
+        """删除超出保留期限或容量上限的文件
+
+        Returns:
+            int: 删除的文件数
+        """
+        deleted = 0
+        catalog = self.storage.snapshot_catalog()
+
+        if self.max_age_days is not None:
+            cutoff = today - timedelta(days=self.max_age_days)
+            remaining = []
+            for filename, mtime, size in catalog:
+                _, end = snapshot_period(filename)
+                if end is not None and end < cutoff:
+                    if self.storage.delete_news_file(filename):
+                        deleted += 1
+                        continue
+                remaining.append((filename, mtime, size))
+            catalog = remaining
+
+        if self.max_total_bytes is not None:
+            total = sum(size for _, _, size in catalog)
+            # 从最早的文件开始删除，始终保留最新的文件
+            for filename, _, size in catalog[:-1]:
+                if total <= self.max_total_bytes:
+                    break
+                if self.storage.delete_news_file(filename):
+                    total -= size
+                    deleted += 1
+
+        return deleted
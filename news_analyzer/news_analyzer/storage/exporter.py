@@ -0,0 +1,127 @@
+"""
+新闻导出
+
+按时间范围、来源、分类或关键词从存储中筛选新闻，分批流式写入NDJSON或CSV文件，
+内存中只保留当前批次。不带关键词时按快照顺序导出，每个快照只读取一次。
+"""
+
+import os
+import csv
+import json
+import logging
+
+
+class NewsExporter:
+    """新闻导出器类"""
+
+    # 支持的导出格式
+    FORMATS = ('ndjson', 'csv')
+
+    # CSV导出的列
+    CSV_FIELDS = ('pub_date', 'title', 'link', 'source_name', 'category',
+                  'description', 'collected_at')
+
+    def __init__(self, storage, batch_size=500):
+        """初始化导出器
+
+        Args:
+            storage: NewsStorage实例
+            batch_size: 每批读取和写入的条目数
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.exporter')
+        self.storage = storage
+        self.batch_size = batch_size
+
+    def _iter_batches(self, start, end, source, category, query, report):
+        """按批次产生符合条件的新闻"""
+        if query:
+            # 关键词筛选通过全文索引按ID分批读取；查询失败时抛出异常，不会产生空的导出文件
+            done = 0
+            for batch in self.storage.iter_search(
+                query, start, end, source=source, category=category, batch_size=self.batch_size
+            ):
+                done += len(batch)
+                report(None, done)
+                yield batch
+            return
+
+        done = 0
+        for total, batch in self.storage.iter_query(
+            start, end, category=category, source=source, batch_size=self.batch_size
+        ):
+            report(total, done)
+            done += len(batch)
+            yield batch
+
+    def run(self, path, fmt='ndjson', start=None, end=None, source=None, category=None,
+            query=None, progress_callback=None, should_stop=None):
+        """导出新闻
+
+        先写入同目录下的临时文件，完成后再重命名为目标文件；
+        中途停止时删除临时文件，不会留下不完整的导出结果。
+
+        Args:
+            path: 导出文件路径
+            fmt: 导出格式，'ndjson' 或 'csv'
+            start: 起始时间（datetime或时间戳），None表示不限
+            end: 结束时间（datetime或时间戳），None表示不限
+            source: 来源名称过滤（可选）
+            category: 分类过滤（可选）
+            query: 全文搜索关键词（可选）
+            progress_callback: 进度回调，参数为 (百分比, 状态消息)
+            should_stop: 返回True时中止导出的函数（可选）
+
+        Returns:
+            dict: 导出结果，包含exported（导出条数）、path和cancelled
+        """
+        if fmt not in self.FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+
+        summary = {'exported': 0, 'path': path, 'cancelled': False}
+
+        def report(total, done):
+            if not progress_callback:
+                return
+            percent = min(99, int(done * 100 / total)) if total else 0
+            progress_callback(percent, f"已导出 {done} 条")
+
+        tmp_path = f"{path}.part"
+        try:
+            # CSV使用带BOM的UTF-8，便于Excel直接打开
+            encoding = 'utf-8-sig' if fmt == 'csv' else 'utf-8'
+            with open(tmp_path, 'w', encoding=encoding, newline='') as f:
+                if fmt == 'csv':
+                    writer = csv.DictWriter(f, fieldnames=self.CSV_FIELDS, extrasaction='ignore')
+                    writer.writeheader()
+
+                for batch in self._iter_batches(start, end, source, category,
+                                                (query or '').strip(), report):
+                    if should_stop and should_stop():
+                        summary['cancelled'] = True
+                        break
+
+                    if fmt == 'csv':
+                        writer.writerows(
+                            {field: item.get(field, '') for field in self.CSV_FIELDS}
+                            for item in batch
+                        )
+                    else:
+                        f.write(''.join(
+                            json.dumps(item, ensure_ascii=False) + '\n' for item in batch
+                        ))
+                    summary['exported'] += len(batch)
+
+            if summary['cancelled']:
+                os.remove(tmp_path)
+                summary['exported'] = 0
+            else:
+                os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if progress_callback:
+            progress_callback(100, "导出已取消" if summary['cancelled'] else "导出完成")
+        self.logger.info(f"导出了 {summary['exported']} 条新闻到 {path}")
+        return summary
@@ -0,0 +1,552 @@
+"""
+内存映射的历史索引
+
+把所有快照中去重后的新闻按时间排序，写成定长记录的二进制索引文件
+（时间戳、条目ID、快照、位置、来源、分类、标题在数据段中的偏移和长度），
+标题单独存放在数据段文件中。浏览时两个文件都以内存映射方式打开，
+按时间二分查找，只在显示某一行时才读取对应的标题，
+因此即使有上百万条新闻，内存占用也基本不变。
+
+索引直接从时间索引（每个快照的条目、当前版本和标题都已保存在其中）流式生成，
+不需要读取快照文件，也不需要在内存中保存全部条目：
+
+- 基础段：一次完整重建写出的按时间排序的记录，之后不再修改；
+- 增量段：新增快照时只把当前版本位于新快照中的新闻追加到增量文件，
+  被新版本取代的基础段记录追加到删除标记文件，标题追加到数据段末尾；
+- 合并：增量积累较多时在后台完整重建，写入新一代的文件。
+
+元数据文件记录每个文件的有效长度，追加完成后原子地替换，
+正在被界面读取的旧视图不受影响。快照被删除或改写时完整重建。
+"""
+
+import os
+import json
+import mmap
+import struct
+import bisect
+import hashlib
+import logging
+import threading
+from array import array
+from collections import namedtuple
+
+
+# 索引中的一条新闻
+HistoryRecord = namedtuple(
+    'HistoryRecord', ['item_id', 'timestamp', 'filename', 'pos', 'source', 'category']
+)
+
+
+def _item_id(key):
+    """由去重键计算64位条目ID"""
+    return int.from_bytes(hashlib.sha1(key.encode('utf-8')).digest()[:8], 'little')
+
+
+def _intern(table, ids, value):
+    """返回名称在名称表中的序号，不存在时追加"""
+    index = ids.get(value)
+    if index is None:
+        index = ids[value] = len(table)
+        table.append(value)
+    return index
+
+
+def _read_prefix(path, length):
+    """读取文件开头的length个字节，文件不存在或长度不足时抛出ValueError"""
+    if not length:
+        return b''
+    with open(path, 'rb') as f:
+        data = f.read(length)
+    if len(data) != length:
+        raise ValueError(f"历史索引文件不完整: {path}")
+    return data
+
+
+class HistoryIndexReader:
+    """以内存映射方式读取一代历史索引（基础段叠加增量段）"""
+
+    def __init__(self, paths, meta):
+        """打开索引文件
+
+        Args:
+            paths: (定长记录文件, 标题数据段, 增量记录文件, 删除标记文件) 的路径
+            meta: 该代索引的元数据（各文件的有效长度、快照、来源和分类名称表）
+
+        Raises:
+            ValueError: 索引文件格式不正确
+        """
+        index_path, data_path, delta_path, tomb_path = paths
+        self.meta = meta
+        self.files = [entry[0] for entry in meta.get('files', [])]
+        self.sources = meta.get('sources', [])
+        self.categories = meta.get('categories', [])
+
+        self._index_file = open(index_path, 'rb')
+        self._data_file = open(data_path, 'rb')
+        self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        # 空文件不能映射，没有标题时数据段为空
+        if os.fstat(self._data_file.fileno()).st_size:
+            self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b''
+
+        magic, version, count = HistoryIndex.HEADER.unpack_from(self._index, 0)
+        expected = HistoryIndex.HEADER.size + count * HistoryIndex.RECORD.size
+        if magic != HistoryIndex.MAGIC or version != HistoryIndex.VERSION or len(self._index) != expected:
+            self.close()
+            raise ValueError(f"历史索引文件格式不正确: {index_path}")
+        self._base_count = count
+
+        try:
+            self._load_overlay(delta_path, tomb_path)
+        except Exception:
+            self.close()
+            raise
+
+    def _load_overlay(self, delta_path, tomb_path):
+        """读取增量记录和删除标记，计算叠加后的行区间
+
+        增量和删除标记的数量受合并阈值限制，可以放在内存中。叠加后的视图由若干区间组成：
+        基础段中连续的未删除记录为一个区间，每条增量记录单独为一个区间。
+        """
+        record_size = HistoryIndex.RECORD.size
+        data = _read_prefix(delta_path, self.meta.get('delta_count', 0) * record_size)
+        records = [HistoryIndex.RECORD.unpack_from(data, offset)
+                   for offset in range(0, len(data), record_size)]
+
+        # 后追加的增量是同一新闻更新的版本
+        seen = set()
+        deltas = []
+        for record in reversed(records):
+            if record[1] not in seen:
+                seen.add(record[1])
+                deltas.append(record)
+        deltas.reverse()
+        deltas.sort(key=lambda record: record[0])
+        self._deltas = deltas
+
+        tombs = array('Q')
+        tombs.frombytes(_read_prefix(tomb_path, self.meta.get('tomb_count', 0) * 8))
+        tombs = sorted(set(tombs))
+
+        # 事件按基础段位置排列：增量插入在该位置的基础记录之前，删除标记跳过该位置的基础记录
+        events = [(self._base_bisect(record[0], right=True), 0, index)
+                  for index, record in enumerate(deltas)]
+        events.extend((row, 1, None) for row in tombs)
+        events.sort()
+
+        starts, pieces = [], []
+        total = 0
+
+        def add_piece(kind, value, length):
+            nonlocal total
+            starts.append(total)
+            pieces.append((kind, value))
+            total += length
+
+        cursor = 0
+        for row, kind, index in events:
+            if row > cursor:
+                add_piece('base', cursor, row - cursor)
+                cursor = row
+            if kind == 0:
+                add_piece('delta', index, 1)
+            else:
+                cursor = row + 1
+        if cursor < self._base_count:
+            add_piece('base', cursor, self._base_count - cursor)
+
+        self._starts = starts
+        self._pieces = pieces
+        self._count = total
+
+    def __len__(self):
+        return self._count
+
+    def _base_unpack(self, row):
+        return HistoryIndex.RECORD.unpack_from(
+            self._index, HistoryIndex.HEADER.size + row * HistoryIndex.RECORD.size
+        )
+
+    def _base_bisect(self, ts, right=False):
+        """在基础段中二分查找时间戳的插入位置"""
+        lo, hi = 0, self._base_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self._base_unpack(mid)[0]
+            if value < ts or (right and value == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def find_base_row(self, ts, file_id, pos):
+        """在基础段中查找指定快照位置的记录
+
+        Returns:
+            int: 基础段中的记录序号，没有时返回None
+        """
+        row = self._base_bisect(ts)
+        while row < self._base_count:
+            record = self._base_unpack(row)
+            if record[0] != ts:
+                break
+            if record[2] == file_id and record[3] == pos:
+                return row
+            row += 1
+        return None
+
+    def _unpack(self, row):
+        if not 0 <= row < self._count:
+            raise IndexError(row)
+        piece = bisect.bisect_right(self._starts, row) - 1
+        kind, value = self._pieces[piece]
+        if kind == 'delta':
+            return self._deltas[value]
+        return self._base_unpack(value + row - self._starts[piece])
+
+    def timestamp(self, row):
+        """获取第row条记录的时间戳"""
+        return self._unpack(row)[0]
+
+    def record(self, row):
+        """获取第row条记录（不含标题）
+
+        Returns:
+            HistoryRecord: 索引记录
+        """
+        ts, item_id, file_id, pos, source_id, category_id, _, _ = self._unpack(row)
+        return HistoryRecord(
+            item_id, ts, self.files[file_id], pos,
+            self.sources[source_id], self.categories[category_id]
+        )
+
+    def entry(self, row):
+        """获取第row条记录的时间索引条目，可传给 NewsStorage.load_entries
+
+        Returns:
+            tuple: (时间戳, 文件名, 位置)
+        """
+        ts, _, file_id, pos = self._unpack(row)[:4]
+        return ts, self.files[file_id], pos
+
+    def title_bytes(self, row):
+        """按偏移从数据段读取第row条记录的UTF-8标题"""
+        offset, length = self._unpack(row)[6:]
+        return bytes(self._data[offset:offset + length])
+
+    def title(self, row):
+        """读取第row条记录的标题"""
+        return self.title_bytes(row).decode('utf-8', errors='replace')
+
+    def bisect(self, ts, right=False):
+        """二分查找时间戳的插入位置
+
+        Args:
+            ts: 时间戳
+            right: 为True时返回等于ts的记录之后的位置
+
+        Returns:
+            int: 记录序号
+        """
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = self.timestamp(mid)
+            if value < ts or (right and value == ts):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def range(self, start=None, end=None):
+        """获取时间范围对应的记录区间
+
+        Args:
+            start: 起始时间戳（包含），None表示不限
+            end: 结束时间戳（包含），None表示不限
+
+        Returns:
+            tuple: (lo, hi)，区间内的记录序号为 lo <= row < hi
+        """
+        lo = 0 if start is None else self.bisect(start)
+        hi = self._count if end is None else self.bisect(end, right=True)
+        return lo, max(lo, hi)
+
+    def close(self):
+        """关闭内存映射和文件"""
+        for handle in (self._index, self._data, self._index_file, self._data_file):
+            try:
+                if hasattr(handle, 'close'):
+                    handle.close()
+            except Exception:
+                pass
+
+
+class HistoryIndex:
+    """内存映射历史索引类"""
+
+    MAGIC = b'NAHI'
+    VERSION = 2
+
+    # 文件头：魔数、版本、记录数
+    HEADER = struct.Struct('<4sII')
+    # 记录：时间戳、条目ID、快照ID、位置、来源ID、分类ID、标题偏移、标题长度
+    RECORD = struct.Struct('<dQIIIIQI')
+
+    META_NAME = 'history_meta.json'
+
+    # 增量记录与删除标记合计超过该数量，且超过基础段的 1/MERGE_RATIO 时需要合并
+    MERGE_MIN_ROWS = 2000
+    MERGE_RATIO = 8
+
+    def __init__(self, index_dir):
+        """初始化历史索引
+
+        Args:
+            index_dir: 索引文件所在目录
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.history_index')
+        self.index_dir = index_dir
+        self._lock = threading.Lock()
+        os.makedirs(self.index_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.index_dir, name)
+
+    def _paths(self, generation):
+        """一代索引的 (定长记录, 标题数据段, 增量记录, 删除标记) 文件路径"""
+        return tuple(self._path(f"history_{generation}.{ext}") for ext in ('idx', 'dat', 'delta', 'tomb'))
+
+    def meta(self):
+        """读取当前一代索引的元数据，不存在或损坏时返回None"""
+        try:
+            with open(self._path(self.META_NAME), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.error(f"读取历史索引元数据失败: {str(e)}")
+            return None
+        if meta.get('version') != self.VERSION:
+            return None
+        return meta
+
+    def _write_meta(self, meta):
+        meta_path = self._path(self.META_NAME)
+        with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(meta_path + '.tmp', meta_path)
+
+    @staticmethod
+    def _changes(meta, files):
+        """比较索引中的快照与时间索引中的快照
+
+        Returns:
+            tuple: (新增的快照列表, 是否有快照被删除或改写)
+        """
+        indexed = {name: (mtime, size) for name, mtime, size in meta.get('files', [])}
+        rewritten = any(files.get(name) != signature for name, signature in indexed.items())
+        added = sorted(name for name in files if name not in indexed)
+        return added, rewritten
+
+    def needs_merge(self):
+        """增量是否已积累到需要合并"""
+        meta = self.meta()
+        if meta is None:
+            return False
+        pending = meta.get('delta_count', 0) + meta.get('tomb_count', 0)
+        return pending > max(self.MERGE_MIN_ROWS, meta.get('count', 0) // self.MERGE_RATIO)
+
+    def open(self):
+        """以内存映射方式打开当前一代索引
+
+        Returns:
+            HistoryIndexReader: 索引读取器，没有可用索引时返回None
+        """
+        meta = self.meta()
+        if meta is None:
+            return None
+        try:
+            return HistoryIndexReader(self._paths(meta['generation']), meta)
+        except Exception as e:
+            self.logger.error(f"打开历史索引失败: {str(e)}")
+            return None
+
+    def update(self, time_index):
+        """使索引与时间索引一致：只新增快照时追加增量，有快照被删除或改写时完整重建
+
+        Args:
+            time_index: TimeIndex实例
+
+        Returns:
+            bool: 索引是否发生变化
+        """
+        with self._lock, time_index.read_snapshot() as snapshot:
+            files = snapshot.files()
+            meta = self.meta()
+            reader = self.open() if meta is not None else None
+            if reader is None:
+                self._rebuild(snapshot, files, meta)
+                return True
+
+            try:
+                added, rewritten = self._changes(reader.meta, files)
+                # 上次追加中断时文件末尾可能留有多余内容；文件可能仍被映射，
+                # 不能原地截断，改为重建到新一代文件
+                if rewritten or (added and self._has_partial_append(reader.meta)):
+                    self._rebuild(snapshot, files, reader.meta)
+                elif added:
+                    self._append(snapshot, files, added, reader)
+                else:
+                    return False
+                return True
+            finally:
+                reader.close()
+
+    def rebuild(self, time_index):
+        """完整重建索引，合并所有增量（耗时较长，应在后台线程中调用）
+
+        Args:
+            time_index: TimeIndex实例
+
+        Returns:
+            int: 索引中的记录数
+        """
+        with self._lock, time_index.read_snapshot() as snapshot:
+            return self._rebuild(snapshot, snapshot.files(), self.meta())
+
+    def _rebuild(self, snapshot, files, previous_meta):
+        generation = (previous_meta['generation'] + 1) if previous_meta else 1
+        index_path, data_path, delta_path, tomb_path = self._paths(generation)
+
+        names = sorted(files)
+        file_ids = {name: index for index, name in enumerate(names)}
+        sources, categories = [], []
+        source_ids, category_ids = {}, {}
+        # 条目按时间顺序逐行写出，内存中只保留名称表
+        count = 0
+        offset = 0
+        try:
+            with open(index_path, 'wb') as index, open(data_path, 'wb') as data:
+                index.write(self.HEADER.pack(self.MAGIC, self.VERSION, 0))
+                for ts, key, filename, pos, source, category, title in snapshot.iter_latest():
+                    title = (title or '').encode('utf-8')
+                    index.write(self.RECORD.pack(
+                        ts, _item_id(key), file_ids[filename], pos,
+                        _intern(sources, source_ids, source or ''),
+                        _intern(categories, category_ids, category or ''),
+                        offset, len(title)
+                    ))
+                    data.write(title)
+                    offset += len(title)
+                    count += 1
+
+                index.seek(0)
+                index.write(self.HEADER.pack(self.MAGIC, self.VERSION, count))
+                for handle in (index, data):
+                    handle.flush()
+                    os.fsync(handle.fileno())
+            for path in (delta_path, tomb_path):
+                open(path, 'wb').close()
+
+            self._write_meta({
+                'version': self.VERSION,
+                'generation': generation,
+                'count': count,
+                'delta_count': 0,
+                'tomb_count': 0,
+                'data_size': offset,
+                'files': [[name] + list(files[name]) for name in names],
+                'sources': sources,
+                'categories': categories
+            })
+        except Exception:
+            for path in (index_path, data_path, delta_path, tomb_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+
+        self._remove_stale(generation)
+        self.logger.info(f"历史索引已重建，共 {count} 条")
+        return count
+
+    def _append_targets(self, meta):
+        """当前一代中追加写入的文件及其在元数据中记录的有效长度"""
+        _, data_path, delta_path, tomb_path = self._paths(meta['generation'])
+        return (
+            (data_path, meta['data_size']),
+            (delta_path, meta['delta_count'] * self.RECORD.size),
+            (tomb_path, meta['tomb_count'] * 8)
+        )
+
+    def _has_partial_append(self, meta):
+        """检查追加写入的文件是否比元数据记录的更长（上次追加在写入元数据前中断）"""
+        for path, size in self._append_targets(meta):
+            try:
+                if os.path.getsize(path) != size:
+                    return True
+            except OSError:
+                return True
+        return False
+
+    def _append(self, snapshot, files, added, reader):
+        """把当前版本位于新增快照中的新闻追加为增量，并标记被取代的基础段记录"""
+        meta = dict(reader.meta)
+        targets = self._append_targets(meta)
+
+        meta['files'] = meta['files'] + [[name] + list(files[name]) for name in added]
+        meta['sources'] = list(meta['sources'])
+        meta['categories'] = list(meta['categories'])
+        file_ids = {entry[0]: index for index, entry in enumerate(meta['files'])}
+        source_ids = {name: index for index, name in enumerate(meta['sources'])}
+        category_ids = {name: index for index, name in enumerate(meta['categories'])}
+        records = []
+        tombs = array('Q')
+        titles = []
+        offset = meta['data_size']
+        for ts, key, filename, pos, source, category, title in snapshot.iter_latest(added):
+            title = (title or '').encode('utf-8')
+            records.append(self.RECORD.pack(
+                ts, _item_id(key), file_ids[filename], pos,
+                _intern(meta['sources'], source_ids, source or ''),
+                _intern(meta['categories'], category_ids, category or ''),
+                offset, len(title)
+            ))
+            titles.append(title)
+            offset += len(title)
+
+            # 新闻此前在索引中显示的版本；位于增量中的旧版本由读取器按条目ID覆盖
+            previous = snapshot.previous_version(key, added)
+            if previous is not None and previous[1] in file_ids:
+                row = reader.find_base_row(previous[0], file_ids[previous[1]], previous[2])
+                if row is not None:
+                    tombs.append(row)
+
+        # 文件长度与元数据一致（update中已检查），只在末尾追加，不改动已被映射的内容
+        payloads = (b''.join(titles), b''.join(records), tombs.tobytes())
+        for (path, _), payload in zip(targets, payloads):
+            with open(path, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta['data_size'] = offset
+        meta['delta_count'] += len(records)
+        meta['tomb_count'] += len(tombs)
+        self._write_meta(meta)
+        self.logger.info(
+            f"历史索引追加了 {len(added)} 个快照的 {len(records)} 条新闻，"
+            f"替换 {len(tombs)} 条旧版本"
+        )
+
+    def _remove_stale(self, generation):
+        """删除旧一代的索引文件（仍被映射而无法删除的留到下次）"""
+        current = {os.path.basename(path) for path in self._paths(generation)}
+        for name in os.listdir(self.index_dir):
+            if (name.startswith('history_') and name.endswith(('.idx', '.dat', '.delta', '.tomb'))
+                    and name not in current):
+                try:
+                    os.remove(self._path(name))
+                except OSError:
+                    pass
@@ -0,0 +1,168 @@
+"""
+新闻导入
+
+流式读取外部JSON数组或NDJSON文件，逐条校验和规范化，
+与已保存的新闻去重后合并为一个新的快照。内存中只保留当前批次。
+"""
+
+import os
+import io
+import time
+import logging
+
+from news_analyzer.storage.item_utils import item_key
+from news_analyzer.storage.json_stream import iter_json_array, iter_ndjson, iter_pages
+
+
+# 规范化为字符串的字段
+_TEXT_FIELDS = ('title', 'link', 'description', 'pub_date', 'source_name',
+                'source_url', 'category', 'collected_at')
+
+
+def normalize_item(raw, collected_at):
+    """校验并规范化一条导入的新闻
+
+    Args:
+        raw: 解析得到的原始值
+        collected_at: 缺少收集时间时使用的时间字符串
+
+    Returns:
+        dict: 规范化后的新闻条目，无效时返回None
+    """
+    if not isinstance(raw, dict):
+        return None
+
+    item = dict(raw)
+    for field in _TEXT_FIELDS:
+        value = item.get(field)
+        if value is None:
+            item[field] = ''
+        elif isinstance(value, (str, int, float)) and not isinstance(value, bool):
+            item[field] = str(value).strip()
+        else:
+            return None
+
+    if not item['title'] and not item['link']:
+        return None
+
+    item['source_name'] = item['source_name'] or '导入'
+    item['category'] = item['category'] or '未分类'
+    item['collected_at'] = item['collected_at'] or collected_at
+    return item
+
+
+class NewsImporter:
+    """新闻导入器类"""
+
+    def __init__(self, storage, batch_size=1000):
+        """初始化导入器
+
+        Args:
+            storage: NewsStorage实例
+            batch_size: 每批处理的条目数
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.importer')
+        self.storage = storage
+        self.batch_size = batch_size
+
+    @staticmethod
+    def _is_ndjson(fp):
+        """根据第一个非空白字符判断文件格式"""
+        start = fp.tell()
+        head = fp.read(4096).lstrip('\ufeff \t\r\n')
+        fp.seek(start)
+        return not head.startswith('[')
+
+    def run(self, path, progress_callback=None, should_stop=None):
+        """导入文件
+
+        中途停止或遇到无法继续解析的错误时，已处理的新闻仍会保存。
+
+        Args:
+            path: 要导入的JSON或NDJSON文件路径
+            progress_callback: 进度回调，参数为 (百分比, 状态消息)
+            should_stop: 返回True时中止导入的函数（可选）
+
+        Returns:
+            dict: 导入结果统计，包含new、duplicate、invalid、filename和error
+        """
+        summary = {
+            'new': 0,
+            'duplicate': 0,
+            'invalid': 0,
+            'filename': None,
+            'error': None
+        }
+
+        def report(percent, message):
+            if progress_callback:
+                progress_callback(percent, message)
+
+        # 先为已有快照补建全文索引，去重以索引中的新闻为准
+        report(0, "正在准备去重索引")
+        self.storage.sync_search_index()
+
+        total_bytes = max(os.path.getsize(path), 1)
+        collected_at = time.strftime('%Y-%m-%d %H:%M:%S')
+
+        def invalid_line(lineno, message):
+            summary['invalid'] += 1
+            self.logger.warning(f"第 {lineno} 行无法解析，已跳过: {message}")
+
+        with open(path, 'rb') as raw:
+            fp = io.TextIOWrapper(raw, encoding='utf-8', errors='replace')
+
+            def values():
+                # 格式错误时停止读取，之前解析出的条目照常导入
+                try:
+                    if self._is_ndjson(fp):
+                        yield from iter_ndjson(fp, on_error=invalid_line)
+                    else:
+                        yield from iter_json_array(fp)
+                except ValueError as e:
+                    summary['error'] = str(e)
+                    self.logger.error(f"导入文件格式错误: {str(e)}")
+
+            def new_pages():
+                for batch in iter_pages(values(), self.batch_size):
+                    if should_stop and should_stop():
+                        summary['error'] = "导入已取消"
+                        return
+
+                    pending = {}
+                    for value in batch:
+                        item = normalize_item(value, collected_at)
+                        if item is None:
+                            summary['invalid'] += 1
+                            continue
+                        key = item_key(item)
+                        if key in pending:
+                            summary['duplicate'] += 1
+                        pending[key] = item
+
+                    existing = self.storage.search_index.existing_keys(pending)
+                    summary['duplicate'] += len(existing)
+                    page = [item for key, item in pending.items() if key not in existing]
+                    summary['new'] += len(page)
+
+                    report(
+                        min(99, int(raw.tell() * 100 / total_bytes)),
+                        f"已处理 {summary['new'] + summary['duplicate'] + summary['invalid']} 条"
+                    )
+                    if page:
+                        yield page
+
+            filepath = self.storage.save_news_pages(new_pages())
+
+        if filepath:
+            summary['filename'] = os.path.basename(filepath)
+        elif summary['new']:
+            summary['new'] = 0
+            summary['error'] = "保存导入的新闻失败"
+
+        report(100, "导入完成")
+        self.logger.info(
+            f"导入 {path}: 新增 {summary['new']} 条, 重复 {summary['duplicate']} 条, "
+            f"无效 {summary['invalid']} 条"
+        )
+        return summary
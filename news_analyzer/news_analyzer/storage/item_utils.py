@@ -0,0 +1,195 @@
+"""
+新闻条目工具函数
+
+提供条目去重键、时间归一化等存储层共用的辅助函数。
+"""
+
+import re
+import time
+import hashlib
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
+
+
+# 快照文件名格式：news_YYYYMMDD_HHMMSS.json
+SNAPSHOT_NAME_PATTERN = re.compile(r'^news_(\d{8}_\d{6})\.json$')
+
+# 归档文件名格式：news_daily_YYYYMMDD.json / news_monthly_YYYYMM.json
+DAILY_ARCHIVE_PATTERN = re.compile(r'^news_daily_(\d{8})\.json$')
+MONTHLY_ARCHIVE_PATTERN = re.compile(r'^news_monthly_(\d{6})\.json$')
+
+
+def item_key(item):
+    """获取新闻条目的去重键
+
+    优先使用链接，没有链接时退回到标题。
+
+    Args:
+        item: 新闻条目字典
+
+    Returns:
+        str: 去重键，无法确定时返回空字符串
+    """
+    link = (item.get('link') or '').strip()
+    if link:
+        return link
+    return (item.get('title') or '').strip()
+
+
+def content_hash(item):
+    """计算新闻条目内容的哈希值
+
+    只包含影响阅读和分析的字段，收集时间等元数据变化不会改变哈希值。
+
+    Args:
+        item: 新闻条目字典
+
+    Returns:
+        str: 十六进制SHA-1哈希值
+    """
+    parts = [
+        str(item.get(field) or '').strip()
+        for field in ('title', 'link', 'description', 'pub_date', 'source_name')
+    ]
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def to_timestamp(value):
+    """将datetime或数字统一转换为时间戳
+
+    Args:
+        value: datetime对象、时间戳或None
+
+    Returns:
+        float: 时间戳，value为None时返回None
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    return float(value)
+
+
+def parse_date_string(text):
+    """解析RSS/Atom中常见的日期字符串
+
+    支持RFC 822（RSS pubDate）、ISO 8601（Atom published）以及
+    收集器写入的"%Y-%m-%d %H:%M:%S"格式。没有时区信息的日期按本地时间处理。
+
+    Args:
+        text: 日期字符串
+
+    Returns:
+        float: 时间戳，解析失败时返回None
+    """
+    if not text:
+        return None
+
+    text = text.strip()
+    if not text:
+        return None
+
+    # RFC 822格式
+    try:
+        return parsedate_to_datetime(text).timestamp()
+    except (TypeError, ValueError, IndexError):
+        pass
+
+    # ISO 8601格式
+    try:
+        return datetime.fromisoformat(text.replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        pass
+
+    try:
+        return datetime.strptime(text, '%Y-%m-%d %H:%M:%S').timestamp()
+    except ValueError:
+        return None
+
+
+def snapshot_period(filename):
+    """获取快照或归档文件覆盖的时间段
+
+    普通快照的起止时间都是保存时间；日归档覆盖当天，月归档覆盖当月。
+
+    Args:
+        filename: 快照或归档文件名
+
+    Returns:
+        tuple: (起始datetime, 结束datetime)，无法识别的文件名返回 (None, None)
+    """
+    try:
+        match = SNAPSHOT_NAME_PATTERN.match(filename)
+        if match:
+            saved_at = datetime.strptime(match.group(1), '%Y%m%d_%H%M%S')
+            return saved_at, saved_at
+
+        match = DAILY_ARCHIVE_PATTERN.match(filename)
+        if match:
+            day = datetime.strptime(match.group(1), '%Y%m%d')
+            return day, day + timedelta(days=1) - timedelta(microseconds=1)
+
+        match = MONTHLY_ARCHIVE_PATTERN.match(filename)
+        if match:
+            month = datetime.strptime(match.group(1), '%Y%m')
+            next_month = (month + timedelta(days=32)).replace(day=1)
+            return month, next_month - timedelta(microseconds=1)
+    except ValueError:
+        pass
+
+    return None, None
+
+
+def snapshot_time(filename):
+    """从快照文件名中提取保存时间
+
+    归档文件返回其覆盖时间段的起始时间。
+
+    Args:
+        filename: 快照文件名
+
+    Returns:
+        float: 时间戳，文件名不符合快照格式时返回None
+    """
+    start, _ = snapshot_period(filename)
+    return start.timestamp() if start else None
+
+
+def snapshot_sort_key(filename):
+    """快照文件的排序键，使快照和归档按时间先后排列
+
+    Args:
+        filename: 快照文件名
+
+    Returns:
+        tuple: 可用于排序的键
+    """
+    saved_at = snapshot_time(filename)
+    return (saved_at if saved_at is not None else 0.0, filename)
+
+
+def item_time(item, fallback=None):
+    """获取新闻条目的归一化时间
+
+    优先使用发布时间；发布时间缺失、无法解析或明显晚于收集时间时，
+    使用收集时间；两者都不可用时返回fallback。
+
+    Args:
+        item: 新闻条目字典
+        fallback: 备用时间戳（通常是快照保存时间）
+
+    Returns:
+        float: 时间戳
+    """
+    collected = parse_date_string(item.get('collected_at', ''))
+    published = parse_date_string(item.get('pub_date', ''))
+
+    if published is not None:
+        # 部分来源的发布时间在未来，这种情况以收集时间为准
+        limit = collected if collected is not None else time.time()
+        if published <= limit + 86400:
+            return published
+
+    if collected is not None:
+        return collected
+    return fallback
@@ -0,0 +1,159 @@
+"""
+刷新预写日志
+
+刷新过程中每获取完一个新闻源，就把该批新闻追加到日志并刷新到磁盘。
+每次刷新使用单独的日志段，刷新结果成功保存后删除对应的日志段；
+程序异常退出时，启动后会把残留日志段中的新闻恢复为一个快照。
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+from news_analyzer.storage.item_utils import item_key
+
+
+class RefreshJournal:
+    """刷新预写日志类"""
+
+    SEGMENT_SUFFIX = '.ndjson'
+
+    def __init__(self, journal_dir):
+        """初始化日志
+
+        Args:
+            journal_dir: 日志段所在目录
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.journal')
+        self.journal_dir = journal_dir
+        self._lock = threading.Lock()
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+    def _path(self, segment):
+        return os.path.join(self.journal_dir, segment)
+
+    def begin(self):
+        """开始一次刷新，创建新的日志段
+
+        Returns:
+            str: 日志段名称
+        """
+        with self._lock:
+            stamp = time.strftime('%Y%m%d_%H%M%S')
+            segment = f"refresh_{stamp}{self.SEGMENT_SUFFIX}"
+            suffix = 1
+            while os.path.exists(self._path(segment)):
+                segment = f"refresh_{stamp}_{suffix}{self.SEGMENT_SUFFIX}"
+                suffix += 1
+            open(self._path(segment), 'a', encoding='utf-8').close()
+        return segment
+
+    def append(self, segment, source_name, news_items):
+        """追加一个新闻源的抓取结果
+
+        每条记录单独一行，写入后立即刷新到磁盘。
+
+        Args:
+            segment: begin返回的日志段名称
+            source_name: 新闻源名称
+            news_items: 该新闻源的新闻条目列表
+        """
+        if not news_items:
+            return
+
+        record = json.dumps({
+            'source': source_name,
+            'saved_at': time.time(),
+            'items': news_items
+        }, ensure_ascii=False)
+
+        with self._lock:
+            with open(self._path(segment), 'a', encoding='utf-8') as f:
+                f.write(record + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+
+    def discard(self, segment):
+        """刷新结果已保存，删除对应的日志段"""
+        with self._lock:
+            try:
+                os.remove(self._path(segment))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.error(f"删除日志段 {segment} 失败: {str(e)}")
+
+    def pending_segments(self):
+        """列出尚未删除的日志段（按创建时间排序）"""
+        try:
+            return sorted(
+                f for f in os.listdir(self.journal_dir) if f.endswith(self.SEGMENT_SUFFIX)
+            )
+        except OSError as e:
+            self.logger.error(f"读取日志目录失败: {str(e)}")
+            return []
+
+    def read_segment(self, segment):
+        """读取日志段中的新闻
+
+        崩溃时最后一行可能只写了一半，这样的行会被忽略。
+
+        Args:
+            segment: 日志段名称
+
+        Returns:
+            list: 新闻条目列表
+        """
+        news_items = []
+        try:
+            with open(self._path(segment), 'r', encoding='utf-8') as f:
+                for lineno, line in enumerate(f, 1):
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        self.logger.warning(f"日志段 {segment} 第 {lineno} 行不完整，已忽略")
+                        continue
+                    news_items.extend(record.get('items', []))
+        except OSError as e:
+            self.logger.error(f"读取日志段 {segment} 失败: {str(e)}")
+        return news_items
+
+    def replay(self, storage):
+        """将残留日志段中的新闻恢复为一个快照
+
+        恢复的快照保存成功后才删除日志段。
+
+        Args:
+            storage: NewsStorage实例
+
+        Returns:
+            int: 恢复的新闻条数
+        """
+        segments = self.pending_segments()
+        if not segments:
+            return 0
+
+        # 同一新闻在多个日志段中出现时保留最新的版本
+        merged = {}
+        for segment in segments:
+            for item in self.read_segment(segment):
+                if isinstance(item, dict):
+                    key = item_key(item)
+                    if key:
+                        merged[key] = item
+
+        if merged and not storage.save_news(list(merged.values())):
+            self.logger.error("恢复未保存的刷新结果失败，保留日志段")
+            return 0
+
+        for segment in segments:
+            self.discard(segment)
+
+        if merged:
+            self.logger.info(f"从 {len(segments)} 个日志段恢复了 {len(merged)} 条新闻")
+        return len(merged)
@@ -0,0 +1,151 @@
+"""
+JSON流式解析
+
+逐个读取JSON数组或NDJSON（每行一个JSON值）中的元素，避免一次性把大文件加载到内存。
+"""
+
+import json
+
+
+_WHITESPACE = ' \t\n\r'
+
+
+def iter_json_array(fp, chunk_size=65536):
+    """流式迭代JSON数组中的元素
+
+    Args:
+        fp: 以文本模式打开的文件对象
+        chunk_size: 每次读取的字符数
+
+    Yields:
+        数组中的每个元素
+
+    Raises:
+        ValueError: 文件内容不是JSON数组或格式错误
+    """
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        # 丢弃已解析的部分，避免缓冲区无限增长
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    skip_whitespace()
+    if pos < len(buf) and buf[pos] == '\ufeff':
+        pos += 1
+        skip_whitespace()
+    if pos >= len(buf) or buf[pos] != '[':
+        raise ValueError("文件内容不是JSON数组")
+    pos += 1
+
+    expect_value = True
+    count = 0
+    while True:
+        skip_whitespace()
+        if pos >= len(buf):
+            raise ValueError("JSON数组不完整")
+
+        char = buf[pos]
+        if char == ']':
+            if expect_value and count:
+                raise ValueError(f"JSON格式错误: 位置 {pos} 处多余的逗号")
+            return
+        if char == ',' and not expect_value:
+            pos += 1
+            expect_value = True
+            continue
+        if not expect_value:
+            raise ValueError(f"JSON格式错误: 位置 {pos} 处缺少逗号")
+
+        while True:
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if fill():
+                    continue
+                raise ValueError("JSON数组不完整或格式错误")
+
+            # 元素后面必须能看到分隔符；数字可能在缓冲区末尾被截断（如 "2." 后面还有 "5"），
+            # 这两种情况都需要读取更多内容后重试
+            lookahead = end
+            while lookahead < len(buf) and buf[lookahead] in _WHITESPACE:
+                lookahead += 1
+            truncated = lookahead >= len(buf) or (
+                buf[lookahead] not in ',]'
+                and isinstance(value, (int, float)) and not isinstance(value, bool)
+            )
+            if truncated and not eof and fill():
+                continue
+            break
+
+        pos = end
+        expect_value = False
+        count += 1
+        yield value
+
+
+def iter_ndjson(fp, on_error=None):
+    """流式迭代NDJSON文件中的每一行
+
+    空行会被跳过。
+
+    Args:
+        fp: 以文本模式打开的文件对象
+        on_error: 行解析失败时的回调，参数为 (行号, 错误消息)；
+                  未提供时抛出ValueError
+
+    Yields:
+        每一行解析出的值
+
+    Raises:
+        ValueError: 某一行不是合法的JSON且未提供on_error
+    """
+    for lineno, line in enumerate(fp, 1):
+        if lineno == 1 and line.startswith('\ufeff'):
+            line = line[1:]
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            if on_error is None:
+                raise ValueError(f"第 {lineno} 行JSON格式错误: {e.msg}")
+            on_error(lineno, e.msg)
+
+
+def iter_pages(iterable, page_size):
+    """将迭代器按固定大小分页
+
+    Args:
+        iterable: 任意可迭代对象
+        page_size: 每页的元素数量
+
+    Yields:
+        list: 每页的元素列表
+    """
+    page = []
+    for value in iterable:
+        page.append(value)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
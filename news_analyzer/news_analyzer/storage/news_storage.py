@@ -5,41 +5,81 @@
 """
 
 import os
-import json
+import time
 import logging
 import shutil
+import threading
 from datetime import datetime
 
+from news_analyzer.storage.item_utils import (item_key, content_hash, to_timestamp,
+                                             snapshot_sort_key, snapshot_time, SNAPSHOT_NAME_PATTERN)
+from news_analyzer.storage.json_stream import iter_pages
+from news_analyzer.storage.backends import create_backend
+from news_analyzer.storage.time_index import TimeIndex
+from news_analyzer.storage.search_index import SearchIndex
+from news_analyzer.storage.stats_store import StatsStore
+from news_analyzer.storage.snapshot_cache import SnapshotCache, measure_items
+from news_analyzer.storage.history_index import HistoryIndex
+
+
+# 配置存储位置和后端的环境变量
+DATA_DIR_ENV = 'NEWS_ANALYZER_DATA_DIR'
+BACKEND_ENV = 'NEWS_ANALYZER_STORAGE_BACKEND'
+
 
 class NewsStorage:
     """新闻数据存储类"""
     
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir=None, backend=None, cache_bytes=64 * 1024 * 1024):
         """初始化存储器
         
         Args:
-            data_dir: 数据存储目录
+            data_dir: 数据存储目录（可选，默认读取环境变量 NEWS_ANALYZER_DATA_DIR，
+                      仍未设置时使用 "data"）；相对路径优先相对于程序目录
+            backend: 快照存储后端名称 json/ndjson/sqlite（可选，默认读取环境变量
+                     NEWS_ANALYZER_STORAGE_BACKEND，仍未设置时使用 json）
+            cache_bytes: 已解析快照缓存的内存占用上限（按解析后的条目估算）
         """
         self.logger = logging.getLogger('news_analyzer.storage')
         
-        # 优先使用绝对路径，兼容运行位置
+        data_dir = data_dir or os.environ.get(DATA_DIR_ENV) or "data"
+        backend = backend or os.environ.get(BACKEND_ENV) or "json"
+        
+        # 相对路径优先相对于程序目录，不存在时相对于当前工作目录
         self.app_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         self.data_dir = os.path.join(self.app_root, data_dir)
-        
-        # 如果上述路径不存在，尝试使用绝对路径
         if not os.path.exists(self.data_dir):
             self.data_dir = os.path.abspath(data_dir)
-            
-        # 如果仍然不存在，尝试使用 C:\Users\Administrator\Desktop\news_analyzer\data
-        if not os.path.exists(self.data_dir):
-            self.data_dir = r"C:\Users\Administrator\Desktop\news_analyzer\data"
         
-        # 确保目录存在
+        # 快照存储后端
         self._ensure_dir(self.data_dir)
-        self._ensure_dir(os.path.join(self.data_dir, "news"))
+        self.backend = create_backend(backend, os.path.join(self.data_dir, "news"))
+        
+        # 索引描述的是某个后端中的快照，非默认后端使用单独的索引目录
+        index_name = "index" if self.backend.name == "json" else f"index_{self.backend.name}"
+        self.index_dir = os.path.join(self.data_dir, index_name)
+        
+        # 确保目录存在
         self._ensure_dir(os.path.join(self.data_dir, "analysis"))
+        self._ensure_dir(self.index_dir)
         
-        self.logger.info(f"数据存储目录: {self.data_dir}")
+        # 跨快照的时间索引（供时间范围查询使用）
+        self._lock = threading.RLock()
+        self.time_index = TimeIndex(os.path.join(self.index_dir, "time_index.db"))
+        
+        # 全文索引
+        self.search_index = SearchIndex(os.path.join(self.index_dir, "search.db"))
+        
+        # 已解析快照的读取缓存，各面板共享
+        self.snapshot_cache = SnapshotCache(cache_bytes)
+        
+        # 统计聚合
+        self.stats = StatsStore(os.path.join(self.index_dir, "stats.db"))
+        
+        # 内存映射的历史索引（供浏览大量历史新闻使用）
+        self.history_index = HistoryIndex(self.index_dir)
+        
+        self.logger.info(f"数据存储目录: {self.data_dir} (存储后端: {self.backend.name})")
     
     def _ensure_dir(self, directory):
         """确保目录存在
@@ -70,18 +110,95 @@ class NewsStorage:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             filename = f"news_{timestamp}.json"
         
-        filepath = os.path.join(self.data_dir, "news", filename)
+        filepath = self.backend.location(filename)
         
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(news_items, f, ensure_ascii=False, indent=2)
-            
+            self.backend.save(filename, news_items)
+            self.snapshot_cache.put(filename, news_items, self.backend.stat(filename))
             self.logger.info(f"保存了 {len(news_items)} 条新闻到 {filepath}")
-            return filepath
         
         except Exception as e:
             self.logger.error(f"保存新闻数据失败: {str(e)}")
             return None
+        
+        self._index_snapshot(filename, news_items)
+        return filepath
+    
+    def save_news_pages(self, pages, filename=None):
+        """流式保存分页的新闻数据
+        
+        逐页写入并更新全文索引和统计，全部写完后快照才对读取可见，
+        内存中只保留当前页。pages可以是生成器：每页在取下一页之前已写入索引，
+        生成器可以据此对后续条目去重。
+        
+        Args:
+            pages: 产生新闻条目列表的可迭代对象
+            filename: 文件名（可选，默认使用时间戳）
+            
+        Returns:
+            str: 保存的文件路径，没有任何条目时返回None
+        """
+        if not filename:
+            saved_at = time.time()
+            filename = datetime.fromtimestamp(saved_at).strftime("news_%Y%m%d_%H%M%S.json")
+            # 避免与同一秒内保存的快照重名
+            while self.backend.exists(filename):
+                saved_at += 1
+                filename = datetime.fromtimestamp(saved_at).strftime("news_%Y%m%d_%H%M%S.json")
+        
+        filepath = self.backend.location(filename)
+        fallback = snapshot_time(filename)
+        
+        def indexed_pages():
+            # 每页写入后、读取下一页之前更新索引
+            for page in pages:
+                yield page
+                self.search_index.add_items(page, fallback, filename)
+                self.stats.record_items(page, fallback)
+        
+        try:
+            count = self.backend.save_pages(filename, indexed_pages())
+            self.snapshot_cache.invalidate(filename)
+        except Exception as e:
+            self.logger.error(f"保存新闻数据失败: {str(e)}")
+            return None
+        
+        if not count:
+            self.logger.warning("没有新闻数据可保存")
+            return None
+        
+        # 时间索引在下次查询时同步
+        try:
+            mtime, size = self.backend.stat(filename)
+            self.search_index.mark_file_indexed(filename, mtime, size)
+            self.stats.mark_ingested(filename)
+        except Exception as e:
+            self.logger.error(f"更新索引失败: {str(e)}")
+        
+        self.logger.info(f"保存了 {count} 条新闻到 {filepath}")
+        return filepath
+    
+    def _index_snapshot(self, filename, news_items):
+        """增量更新新保存快照的索引
+        
+        索引更新失败不影响已保存的数据，下次查询时会重新同步。
+        
+        Args:
+            filename: 文件名
+            news_items: 新闻条目列表
+        """
+        try:
+            mtime, size = self.backend.stat(filename)
+            self.time_index.add_snapshot(filename, news_items, mtime, size)
+            
+            self.search_index.add_items(news_items, snapshot_time(filename), filename)
+            self.search_index.mark_file_indexed(filename, mtime, size)
+            
+            # 只有刷新快照计入统计，归档中的新闻在原快照保存时已经统计过
+            if SNAPSHOT_NAME_PATTERN.match(filename):
+                self.stats.record_items(news_items, snapshot_time(filename), filename)
+        except Exception as e:
+            self.logger.error(f"更新索引失败: {str(e)}")
     
     def load_news(self, filename=None):
         """加载新闻数据
@@ -101,37 +218,437 @@ class NewsStorage:
             
             filename = files[-1]  # 最新的文件
         
-        filepath = os.path.join(self.data_dir, "news", filename)
-        
         try:
-            if not os.path.exists(filepath):
-                self.logger.warning(f"文件不存在: {filepath}")
+            signature = self.backend.stat(filename)
+            if signature is None:
+                self.logger.warning(f"文件不存在: {self.backend.location(filename)}")
                 return []
             
-            with open(filepath, 'r', encoding='utf-8') as f:
-                news_items = json.load(f)
+            # 缓存保存和返回的都是条目副本，调用方可以修改返回的条目
+            news_items = self.snapshot_cache.get(filename, signature)
+            if news_items is not None:
+                return news_items
+            
+            news_items = self.backend.load(filename)
             
-            self.logger.info(f"从 {filepath} 加载了 {len(news_items)} 条新闻")
+            self.snapshot_cache.put(filename, news_items, signature)
+            self.logger.info(f"从 {self.backend.location(filename)} 加载了 {len(news_items)} 条新闻")
             return news_items
         
         except Exception as e:
             self.logger.error(f"加载新闻数据失败: {str(e)}")
             return []
     
+    def iter_news_pages(self, filename, page_size=200):
+        """分页流式读取快照中的新闻
+        
+        逐个解析文件中的条目，只在内存中保留当前页，适合浏览很大的快照。
+        已缓存的快照直接从缓存分页；内存占用在缓存上限内的快照完整读取后会放入缓存。
+        
+        Args:
+            filename: 文件名
+            page_size: 每页条目数
+            
+        Yields:
+            list: 每页的新闻条目列表
+        """
+        signature = self.backend.stat(filename)
+        if signature is None:
+            self.logger.warning(f"文件不存在: {self.backend.location(filename)}")
+            return
+        
+        cached = self.snapshot_cache.get(filename, signature)
+        if cached is not None:
+            for start in range(0, len(cached), page_size):
+                yield cached[start:start + page_size]
+            return
+        
+        # 边读取边累计内存占用，超过单个快照的缓存上限后不再收集
+        collected, size = [], 0
+        for page in iter_pages(self.backend.iter_items(filename), page_size):
+            if collected is not None:
+                size += measure_items(page)
+                if self.snapshot_cache.cacheable(size):
+                    collected.extend(page)
+                else:
+                    collected = None
+            yield page
+        
+        if collected is not None:
+            self.snapshot_cache.put(filename, collected, signature, size)
+    
     def list_news_files(self):
         """列出所有新闻文件
         
         Returns:
-            list: 文件名列表，按日期排序
+            list: 文件名列表，按日期排序（快照和归档按覆盖时间排列）
+        """
+        try:
+            return sorted(self.backend.list_names(), key=snapshot_sort_key)
+        except Exception as e:
+            self.logger.error(f"列出新闻文件失败: {str(e)}")
+            return []
+    
+    def previous_snapshot(self, filename=None):
+        """获取某个快照之前的一个快照
+        
+        Args:
+            filename: 文件名（可选，默认返回最新的快照）
+            
+        Returns:
+            str: 前一个快照的文件名，没有时返回None
+        """
+        files = self.list_news_files()
+        if filename is None:
+            return files[-1] if files else None
+        if filename not in files:
+            return None
+        index = files.index(filename)
+        return files[index - 1] if index > 0 else None
+    
+    def _iter_diff_items(self, snapshot):
+        """逐条迭代快照名称或新闻条目列表中的新闻"""
+        if isinstance(snapshot, str):
+            for page in self.iter_news_pages(snapshot, 1000):
+                yield from page
+        else:
+            yield from snapshot
+    
+    def diff(self, snapshot_a, snapshot_b):
+        """比较两个快照，找出新增、移除和内容变化的新闻
+        
+        按去重键和内容哈希比较，只在内存中保存旧快照的键和哈希，
+        两个快照各流式读取一次（找出移除的新闻时旧快照再读取一次）。
+        
+        Args:
+            snapshot_a: 旧快照的文件名，或新闻条目列表
+            snapshot_b: 新快照的文件名，或新闻条目列表（如尚未保存的刷新结果）
+            
+        Returns:
+            dict: {'added': 新增的新闻, 'changed': 内容变化的新闻（新版本）,
+                   'removed': 移除的新闻, 'unchanged': 未变化的新闻条数}
+        """
+        old_hashes = {}
+        for item in self._iter_diff_items(snapshot_a):
+            if isinstance(item, dict):
+                key = item_key(item)
+                if key:
+                    old_hashes[key] = content_hash(item)
+        
+        added, changed = [], []
+        seen = set()
+        for item in self._iter_diff_items(snapshot_b):
+            if not isinstance(item, dict):
+                continue
+            key = item_key(item)
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            
+            old_hash = old_hashes.get(key)
+            if old_hash is None:
+                added.append(item)
+            elif old_hash != content_hash(item):
+                changed.append(item)
+        
+        removed = []
+        if len(seen) - len(added) < len(old_hashes):
+            for item in self._iter_diff_items(snapshot_a):
+                if not isinstance(item, dict):
+                    continue
+                key = item_key(item)
+                if key in old_hashes and key not in seen:
+                    removed.append(item)
+                    seen.add(key)
+        
+        return {
+            'added': added,
+            'changed': changed,
+            'removed': removed,
+            'unchanged': len(old_hashes) - len(removed) - len(changed)
+        }
+    
+    def delete_news_file(self, filename):
+        """删除新闻快照文件
+        
+        Args:
+            filename: 文件名
+            
+        Returns:
+            bool: 是否删除成功
         """
-        news_dir = os.path.join(self.data_dir, "news")
-        if not os.path.exists(news_dir):
-            self.logger.warning(f"新闻目录不存在: {news_dir}")
+        try:
+            with self._lock:
+                deleted = self.backend.delete(filename)
+                self.snapshot_cache.invalidate(filename)
+            if deleted:
+                self.time_index.remove_files([filename])
+                self.search_index.forget_files([filename])
+                self.logger.info(f"删除了新闻文件 {self.backend.location(filename)}")
+            return deleted
+        except Exception as e:
+            self.logger.error(f"删除新闻文件失败: {str(e)}")
+            return False
+    
+    def snapshot_catalog(self):
+        """获取所有快照的元数据
+        
+        Returns:
+            list: [(文件名, 修改时间, 文件大小), ...]，按日期排序
+        """
+        try:
+            return sorted(self.backend.catalog(), key=lambda entry: snapshot_sort_key(entry[0]))
+        except Exception as e:
+            self.logger.error(f"读取快照列表失败: {str(e)}")
             return []
+    
+    def query(self, start=None, end=None, category=None, source=None, limit=100, offset=0):
+        """按时间范围查询所有快照中的新闻
+        
+        结果按时间倒序排列（最新的在前），同一新闻只保留最新快照中的版本。
         
+        Args:
+            start: 起始时间（datetime或时间戳，包含），None表示不限
+            end: 结束时间（datetime或时间戳，包含），None表示不限
+            category: 分类过滤（可选）
+            source: 来源名称过滤（可选）
+            limit: 返回的最大条目数，None表示不限
+            offset: 跳过的条目数
+            
+        Returns:
+            list: 新闻条目列表
+        """
         try:
-            files = [f for f in os.listdir(news_dir) if f.endswith('.json')]
-            return sorted(files)
+            page = self.query_entries(
+                start, end, category=category, source=source, limit=limit, offset=offset
+            )
         except Exception as e:
-            self.logger.error(f"列出新闻文件失败: {str(e)}")
-            return []
\ No newline at end of file
+            self.logger.error(f"查询时间索引失败: {str(e)}")
+            return []
+        
+        results = self.load_entries(page)
+        self.logger.info(f"时间范围查询返回 {len(results)} 条新闻")
+        return results
+    
+    def query_entries(self, start=None, end=None, category=None, source=None, descending=True,
+                      limit=None, offset=0):
+        """按时间范围查询时间索引条目，不读取新闻内容
+        
+        Args:
+            start: 起始时间（datetime或时间戳，包含），None表示不限
+            end: 结束时间（datetime或时间戳，包含），None表示不限
+            category: 分类过滤（可选）
+            source: 来源名称过滤（可选）
+            descending: 是否按时间倒序排列
+            limit: 返回的最大条目数，None表示返回全部匹配的条目
+            offset: 跳过的条目数
+            
+        Returns:
+            list: [(时间戳, 文件名, 位置), ...]，可传给load_entries读取新闻
+        """
+        with self._lock:
+            self.time_index.sync(self.snapshot_catalog(), self.load_news)
+        
+        return self.time_index.select(
+            to_timestamp(start), to_timestamp(end),
+            category=category, source=source, descending=descending,
+            limit=limit, offset=offset
+        )
+    
+    def iter_query(self, start=None, end=None, category=None, source=None, batch_size=500):
+        """按快照分批流式读取时间范围内的全部新闻
+        
+        结果按快照顺序排列（快照内按位置），同一新闻只保留最新快照中的版本。
+        每个快照只顺序读取一次，内存中只保留当前快照的条目位置和当前批次，
+        适合导出等需要遍历大量新闻的场景。
+        
+        Args:
+            start: 起始时间（datetime或时间戳，包含），None表示不限
+            end: 结束时间（datetime或时间戳，包含），None表示不限
+            category: 分类过滤（可选）
+            source: 来源名称过滤（可选）
+            batch_size: 每批的最大条目数
+            
+        Yields:
+            tuple: (符合条件的总条数, 新闻条目列表)
+        """
+        with self._lock:
+            self.time_index.sync(self.snapshot_catalog(), self.load_news)
+        
+        start, end = to_timestamp(start), to_timestamp(end)
+        counts = self.time_index.count_by_file(start, end, category=category, source=source)
+        total = sum(count for _, count in counts)
+        
+        batch = []
+        for filename, _ in counts:
+            wanted = set(self.time_index.positions(
+                filename, start, end, category=category, source=source
+            ))
+            pos = 0
+            for page in self.iter_news_pages(filename, page_size=batch_size):
+                for item in page:
+                    if pos in wanted:
+                        batch.append(item)
+                        if len(batch) >= batch_size:
+                            yield total, batch
+                            batch = []
+                    pos += 1
+        
+        if batch:
+            yield total, batch
+    
+    def load_entries(self, entries):
+        """读取时间索引条目对应的新闻
+        
+        Args:
+            entries: query_entries返回的条目列表（或其中一段）
+            
+        Returns:
+            list: 新闻条目列表，顺序与entries一致
+        """
+        # 按快照分组读取，每个文件只读取一次
+        snapshots = {}
+        results = []
+        for _, filename, pos in entries:
+            if filename not in snapshots:
+                snapshots[filename] = self.load_news(filename)
+            items = snapshots[filename]
+            if pos < len(items):
+                results.append(items[pos])
+        return results
+
+    
+    def open_history_index(self):
+        """打开内存映射的历史索引，快照有变化时先更新
+        
+        新增的快照以增量方式追加，快照被删除或改写时从时间索引流式重建；
+        需要同步时间索引，应在后台线程中调用。
+        
+        Returns:
+            HistoryIndexReader: 索引读取器，调用方用完后应调用close()；失败时返回None
+        """
+        try:
+            with self._lock:
+                self.time_index.sync(self.snapshot_catalog(), self.load_news)
+            self.history_index.update(self.time_index)
+            return self.history_index.open()
+        except Exception as e:
+            self.logger.error(f"打开历史索引失败: {str(e)}")
+            return None
+    
+    def merge_history_index(self):
+        """历史索引的增量积累较多时完整重建，合并增量（应在后台线程中调用）
+        
+        Returns:
+            bool: 是否进行了合并
+        """
+        try:
+            if not self.history_index.needs_merge():
+                return False
+            self.history_index.rebuild(self.time_index)
+            return True
+        except Exception as e:
+            self.logger.error(f"合并历史索引失败: {str(e)}")
+            return False
+    
+    def sync_search_index(self):
+        """为尚未建立全文索引的快照补建索引"""
+        indexed = self.search_index.indexed_files()
+        catalog = self.snapshot_catalog()
+        
+        for filename, mtime, size in catalog:
+            if indexed.get(filename) == (mtime, size):
+                continue
+            
+            fallback = snapshot_time(filename)
+            added = 0
+            for page in self.iter_news_pages(filename, 1000):
+                added += self.search_index.add_items(page, fallback, filename)
+            self.search_index.mark_file_indexed(filename, mtime, size)
+            self.logger.info(f"为 {filename} 建立全文索引，新增 {added} 条")
+        
+        # 已删除的快照中、不再出现在其他快照里的新闻从索引中移除
+        missing = set(indexed) - {filename for filename, _, _ in catalog}
+        if missing:
+            removed = self.search_index.forget_files(missing)
+            self.logger.info(f"从全文索引中移除了 {len(missing)} 个已删除的快照，{removed} 条新闻")
+        
+        if self.search_index.needs_purge:
+            self.search_index.purge_unowned()
+        if self.search_index.needs_retokenize:
+            self.search_index.retokenize()
+    
+    def sync_stats(self):
+        """将尚未计入统计的快照补充计入
+        
+        用于统计功能启用前已存在的数据。应在整理快照之前调用，
+        使原始快照在被合并前完成统计。
+        
+        Returns:
+            int: 补充统计的快照数
+        """
+        synced = 0
+        for filename, _, _ in self.snapshot_catalog():
+            if self.stats.is_file_ingested(filename):
+                continue
+            
+            fallback = snapshot_time(filename)
+            for page in self.iter_news_pages(filename, 1000):
+                self.stats.record_items(page, fallback)
+            self.stats.mark_ingested(filename)
+            synced += 1
+        
+        if synced:
+            self.logger.info(f"补充统计了 {synced} 个快照")
+        return synced
+    
+    def iter_search(self, query, start=None, end=None, source=None, category=None, batch_size=500):
+        """按批次读取全文搜索的全部结果（按索引顺序），查询失败时抛出异常
+        
+        Args:
+            query: 搜索关键词
+            start: 起始时间（datetime或时间戳），None表示不限
+            end: 结束时间（datetime或时间戳），None表示不限
+            source: 来源名称过滤（可选）
+            category: 分类过滤（可选）
+            batch_size: 每批的最大条目数
+            
+        Yields:
+            list: 新闻条目列表
+        """
+        if not query or not query.strip():
+            return
+        
+        self.sync_search_index()
+        yield from self.search_index.iter_matches(
+            query, to_timestamp(start), to_timestamp(end),
+            source=source, category=category, batch_size=batch_size
+        )
+    
+    def search(self, query, start=None, end=None, source=None, category=None, limit=50, offset=0):
+        """全文搜索所有已保存的新闻
+        
+        Args:
+            query: 搜索关键词
+            start: 起始时间（datetime或时间戳），None表示不限
+            end: 结束时间（datetime或时间戳），None表示不限
+            source: 来源名称过滤（可选）
+            category: 分类过滤（可选）
+            limit: 返回的最大结果数
+            offset: 跳过的结果数
+            
+        Returns:
+            list: [{'item': 新闻条目, 'score': 相关度, 'snippet': 摘要片段}, ...]，按相关度排序
+        """
+        if not query or not query.strip():
+            return []
+        
+        try:
+            self.sync_search_index()
+            return self.search_index.search(
+                query, to_timestamp(start), to_timestamp(end),
+                source=source, category=category, limit=limit, offset=offset
+            )
+        except Exception as e:
+            self.logger.error(f"全文搜索失败: {str(e)}")
+            return []
@@ -0,0 +1,521 @@
+"""
+历史新闻全文索引
+
+基于SQLite FTS5的持久化全文索引，覆盖所有已保存的新闻。
+中文、日文等CJK文本按相邻两字切分（bigram），拉丁文字按单词切分，
+因此不依赖外部分词库即可检索任意语言的新闻。每段CJK文本的末字另外作为单字索引，
+使单字查询既能前缀匹配以该字开头的bigram，也能匹配出现在末尾的该字。
+
+索引记录每条新闻出现在哪些快照中，快照被删除（整理或保留策略）后，
+不再出现在任何快照中的新闻会从索引中移除。
+"""
+
+import re
+import json
+import sqlite3
+import logging
+import threading
+
+from news_analyzer.storage.item_utils import item_key, item_time, content_hash
+
+
+# CJK统一表意文字、日文假名、韩文音节
+_CJK_RANGES = (
+    '\u3040-\u30ff'
+    '\u3400-\u4dbf'
+    '\u4e00-\u9fff'
+    '\uac00-\ud7af'
+    '\uf900-\ufaff'
+)
+_TOKEN_PATTERN = re.compile(f'[{_CJK_RANGES}]+|[^\\W_]+', re.UNICODE)
+_CJK_PATTERN = re.compile(f'[{_CJK_RANGES}]')
+
+
+def tokenize(text):
+    """将文本切分为索引词
+
+    CJK连续字符按bigram切分（单字保持不变），其他文字按单词切分并转为小写。
+
+    Args:
+        text: 原始文本
+
+    Returns:
+        list: 词列表
+    """
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text or ''):
+        run = match.group(0)
+        if _CJK_PATTERN.match(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+def _index_tokens(text):
+    """生成写入全文索引的词：tokenize的结果加上每段CJK文本的末字"""
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text or ''):
+        run = match.group(0)
+        if _CJK_PATTERN.match(run):
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+            tokens.append(run[-1])
+        else:
+            tokens.append(run.lower())
+    return tokens
+
+
+class SearchIndex:
+    """全文索引类"""
+
+    SNIPPET_RADIUS = 40
+
+    # 数据库结构版本：1表示正在为旧数据补建新闻与快照的对应关系，
+    # 2表示全文索引还是旧的分词方式（没有CJK末字），3表示已完成
+    SCHEMA_VERSION = 3
+    _OWNERSHIP_VERSION = 2
+
+    def __init__(self, db_path):
+        """初始化全文索引
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.search_index')
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._conn:
+            version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    id INTEGER PRIMARY KEY,
+                    key TEXT UNIQUE NOT NULL,
+                    hash TEXT NOT NULL,
+                    ts REAL,
+                    source TEXT,
+                    category TEXT,
+                    data TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_items_ts ON items(ts)")
+            self._conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
+                    title, body, tokenize='unicode61 remove_diacritics 2'
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS indexed_files (
+                    name TEXT PRIMARY KEY,
+                    mtime REAL,
+                    size INTEGER
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS item_files (
+                    file TEXT NOT NULL,
+                    item_id INTEGER NOT NULL,
+                    PRIMARY KEY (file, item_id)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_item_files_item ON item_files(item_id)")
+
+            if version == 0:
+                if self._conn.execute("SELECT 1 FROM items LIMIT 1").fetchone():
+                    # 旧数据没有记录新闻所在的快照：重新读取所有快照补建，完成后清除无主的新闻
+                    self._conn.execute("DELETE FROM indexed_files")
+                    self._conn.execute("PRAGMA user_version = 1")
+                else:
+                    self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @property
+    def needs_purge(self):
+        """是否需要在所有快照重新索引后清除不属于任何快照的新闻"""
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0] < self._OWNERSHIP_VERSION
+
+    @property
+    def needs_retokenize(self):
+        """是否需要按当前的分词方式重建全文索引"""
+        with self._lock:
+            return self._conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION
+
+    def purge_unowned(self):
+        """删除不属于任何快照的新闻（所有快照都已记录对应关系后调用）
+
+        Returns:
+            int: 删除的新闻数
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            cursor.execute(
+                "DELETE FROM items_fts WHERE rowid IN (SELECT id FROM items WHERE NOT EXISTS "
+                "(SELECT 1 FROM item_files WHERE item_files.item_id = items.id))"
+            )
+            cursor.execute(
+                "DELETE FROM items WHERE NOT EXISTS "
+                "(SELECT 1 FROM item_files WHERE item_files.item_id = items.id)"
+            )
+            removed = cursor.rowcount
+            cursor.execute(f"PRAGMA user_version = {self._OWNERSHIP_VERSION}")
+        if removed:
+            self.logger.info(f"从全文索引中清除了 {removed} 条已删除的新闻")
+        return removed
+
+    def retokenize(self, batch_size=1000):
+        """按当前的分词方式重写全文索引中所有新闻的词
+
+        按ID分批处理，每批单独提交，期间不会长时间阻塞搜索。
+
+        Args:
+            batch_size: 每批处理的新闻数
+
+        Returns:
+            int: 处理的新闻数
+        """
+        last_id, total = 0, 0
+        while True:
+            with self._lock, self._conn:
+                rows = self._conn.execute(
+                    "SELECT id, data FROM items WHERE id > ? ORDER BY id LIMIT ?", (last_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+                    break
+                updates = []
+                for item_id, data in rows:
+                    item = json.loads(data)
+                    updates.append((
+                        ' '.join(_index_tokens(item.get('title', ''))),
+                        ' '.join(_index_tokens(item.get('description', ''))),
+                        item_id
+                    ))
+                self._conn.executemany("UPDATE items_fts SET title = ?, body = ? WHERE rowid = ?", updates)
+            last_id = rows[-1][0]
+            total += len(rows)
+        if total:
+            self.logger.info(f"已按新的分词方式重建 {total} 条新闻的全文索引")
+        return total
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def add_items(self, news_items, fallback_time=None, filename=None):
+        """增量添加或更新新闻
+
+        内容未变化的新闻只记录所在的快照，因此重复刷新的开销很小。
+
+        Args:
+            news_items: 新闻条目列表
+            fallback_time: 条目缺少时间信息时使用的时间戳
+            filename: 新闻所在的快照文件名（可选），快照删除后据此移除新闻
+
+        Returns:
+            int: 新增或更新的条目数
+        """
+        changed = 0
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            for item in news_items:
+                if not isinstance(item, dict):
+                    continue
+                key = item_key(item)
+                if not key:
+                    continue
+
+                digest = content_hash(item)
+                row = cursor.execute(
+                    "SELECT id, hash FROM items WHERE key = ?", (key,)
+                ).fetchone()
+                if row and row[1] == digest:
+                    if filename:
+                        cursor.execute(
+                            "INSERT OR IGNORE INTO item_files (file, item_id) VALUES (?, ?)",
+                            (filename, row[0])
+                        )
+                    continue
+
+                values = (
+                    digest, item_time(item, fallback_time),
+                    item.get('source_name', ''), item.get('category', ''),
+                    json.dumps(item, ensure_ascii=False)
+                )
+                title_tokens = ' '.join(_index_tokens(item.get('title', '')))
+                body_tokens = ' '.join(_index_tokens(item.get('description', '')))
+
+                if row:
+                    cursor.execute(
+                        "UPDATE items SET hash = ?, ts = ?, source = ?, category = ?, data = ? "
+                        "WHERE id = ?", values + (row[0],)
+                    )
+                    cursor.execute(
+                        "UPDATE items_fts SET title = ?, body = ? WHERE rowid = ?",
+                        (title_tokens, body_tokens, row[0])
+                    )
+                else:
+                    cursor.execute(
+                        "INSERT INTO items (key, hash, ts, source, category, data) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", (key,) + values
+                    )
+                    row = (cursor.lastrowid,)
+                    cursor.execute(
+                        "INSERT INTO items_fts (rowid, title, body) VALUES (?, ?, ?)",
+                        (row[0], title_tokens, body_tokens)
+                    )
+                if filename:
+                    cursor.execute(
+                        "INSERT OR IGNORE INTO item_files (file, item_id) VALUES (?, ?)",
+                        (filename, row[0])
+                    )
+                changed += 1
+        return changed
+
+    def existing_keys(self, keys):
+        """查询哪些去重键已经在索引中
+
+        Args:
+            keys: 去重键列表
+
+        Returns:
+            set: 已存在的去重键
+        """
+        keys = list(keys)
+        found = set()
+        with self._lock:
+            # 分批查询，避免超出SQLite的参数数量限制
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key FROM items WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(row[0] for row in rows)
+        return found
+
+    def get_items(self, keys):
+        """按去重键读取索引中保存的新闻
+
+        Args:
+            keys: 去重键列表
+
+        Returns:
+            dict: {去重键: 新闻条目}，不在索引中的键不包含在内
+        """
+        keys = list(keys)
+        items = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, data FROM items WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                items.update((key, json.loads(data)) for key, data in rows)
+        return items
+
+    def indexed_files(self):
+        """获取已建立索引的快照文件
+
+        Returns:
+            dict: {文件名: (修改时间, 文件大小)}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT name, mtime, size FROM indexed_files").fetchall()
+        return {name: (mtime, size) for name, mtime, size in rows}
+
+    def mark_file_indexed(self, name, mtime, size):
+        """记录快照文件已建立索引"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed_files (name, mtime, size) VALUES (?, ?, ?)",
+                (name, mtime, size)
+            )
+
+    def forget_files(self, names):
+        """移除已删除的快照，以及不再出现在任何其他快照中的新闻
+
+        Args:
+            names: 文件名列表
+
+        Returns:
+            int: 从索引中移除的新闻数
+        """
+        removed = 0
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            for name in names:
+                item_ids = [row[0] for row in cursor.execute(
+                    "SELECT item_id FROM item_files WHERE file = ?", (name,)
+                )]
+                cursor.execute("DELETE FROM item_files WHERE file = ?", (name,))
+                cursor.execute("DELETE FROM indexed_files WHERE name = ?", (name,))
+
+                # 分批处理，避免超出SQLite的参数数量限制
+                for start in range(0, len(item_ids), 500):
+                    chunk = item_ids[start:start + 500]
+                    placeholders = ','.join('?' * len(chunk))
+                    orphans = [row[0] for row in cursor.execute(
+                        f"SELECT id FROM items WHERE id IN ({placeholders}) AND NOT EXISTS "
+                        "(SELECT 1 FROM item_files WHERE item_files.item_id = items.id)", chunk
+                    )]
+                    if not orphans:
+                        continue
+                    placeholders = ','.join('?' * len(orphans))
+                    cursor.execute(f"DELETE FROM items_fts WHERE rowid IN ({placeholders})", orphans)
+                    cursor.execute(f"DELETE FROM items WHERE id IN ({placeholders})", orphans)
+                    removed += len(orphans)
+        return removed
+
+    @staticmethod
+    def _build_match(query):
+        """将用户输入转换为FTS5查询表达式"""
+        terms = []
+        for token in tokenize(query):
+            escaped = token.replace('"', '""')
+            # 单个CJK字符使用前缀匹配：命中以该字开头的bigram，以及作为末字单独索引的该字
+            if len(token) == 1 and _CJK_PATTERN.match(token):
+                terms.append(f'"{escaped}"*')
+            else:
+                terms.append(f'"{escaped}"')
+        return ' '.join(terms)
+
+    def _snippet(self, item, query):
+        """生成包含查询词的摘要片段（纯文本）"""
+        words = [w.lower() for w in re.split(r'\s+', query.strip()) if w]
+        description = (item.get('description') or '').strip()
+
+        # 优先在正文中定位查询词，正文中没有时使用标题
+        for text in (description, (item.get('title') or '').strip()):
+            lower = text.lower()
+            for word in words:
+                position = lower.find(word)
+                if position < 0:
+                    continue
+
+                start = max(0, position - self.SNIPPET_RADIUS)
+                end = min(len(text), position + len(word) + self.SNIPPET_RADIUS)
+                snippet = text[start:end]
+                if start > 0:
+                    snippet = '…' + snippet
+                if end < len(text):
+                    snippet += '…'
+                return snippet
+
+        return description[:self.SNIPPET_RADIUS * 2]
+
+    @staticmethod
+    def _filters(start, end, source, category):
+        """生成时间、来源和分类过滤条件"""
+        sql, params = [], []
+        if start is not None:
+            sql.append("AND items.ts >= ?")
+            params.append(start)
+        if end is not None:
+            sql.append("AND items.ts <= ?")
+            params.append(end)
+        if source is not None:
+            sql.append("AND items.source = ?")
+            params.append(source)
+        if category is not None:
+            sql.append("AND items.category = ?")
+            params.append(category)
+        return sql, params
+
+    def search(self, query, start=None, end=None, source=None, category=None,
+               limit=50, offset=0):
+        """全文搜索
+
+        Args:
+            query: 搜索关键词
+            start: 起始时间戳（可选）
+            end: 结束时间戳（可选）
+            source: 来源名称过滤（可选）
+            category: 分类过滤（可选）
+            limit: 返回的最大结果数
+            offset: 跳过的结果数
+
+        Returns:
+            list: [{'item': 新闻条目, 'score': 相关度, 'snippet': 摘要片段}, ...]，按相关度排序
+
+        Raises:
+            sqlite3.OperationalError: 查询失败（如索引损坏）
+        """
+        match = self._build_match(query)
+        if not match:
+            return []
+
+        sql = [
+            "SELECT items.data, bm25(items_fts, 3.0, 1.0) AS score",
+            "FROM items_fts JOIN items ON items.id = items_fts.rowid",
+            "WHERE items_fts MATCH ?"
+        ]
+        filters, params = self._filters(start, end, source, category)
+        sql.extend(filters)
+        sql.append("ORDER BY score LIMIT ? OFFSET ?")
+        params = [match] + params + [limit, offset]
+
+        with self._lock:
+            rows = self._conn.execute(' '.join(sql), params).fetchall()
+
+        results = []
+        for data, score in rows:
+            item = json.loads(data)
+            results.append({
+                'item': item,
+                # bm25越小越相关，转换为越大越相关
+                'score': -score,
+                'snippet': self._snippet(item, query)
+            })
+        return results
+
+    def iter_matches(self, query, start=None, end=None, source=None, category=None, batch_size=500):
+        """按批次读取所有匹配的新闻（按索引ID顺序，不计算相关度）
+
+        使用ID作为分页位置（id > 上一批最后的ID），每批查询的开销与已读取的数量无关，
+        适合导出等需要完整结果的场景。
+
+        Args:
+            query: 搜索关键词
+            start: 起始时间戳（可选）
+            end: 结束时间戳（可选）
+            source: 来源名称过滤（可选）
+            category: 分类过滤（可选）
+            batch_size: 每批的最大条目数
+
+        Yields:
+            list: 新闻条目列表
+
+        Raises:
+            sqlite3.OperationalError: 查询失败（如索引损坏）
+        """
+        match = self._build_match(query)
+        if not match:
+            return
+
+        filters, filter_params = self._filters(start, end, source, category)
+        sql = ' '.join([
+            "SELECT items.id, items.data",
+            "FROM items_fts JOIN items ON items.id = items_fts.rowid",
+            "WHERE items_fts MATCH ? AND items_fts.rowid > ?"
+        ] + filters + ["ORDER BY items_fts.rowid LIMIT ?"])
+
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, [match, last_id] + filter_params + [batch_size]).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [json.loads(data) for _, data in rows]
+            if len(rows) < batch_size:
+                return
@@ -0,0 +1,148 @@
+"""
+快照读取缓存
+
+缓存已解析的快照内容，按快照修改时间和大小校验是否过期，
+按解析后条目的内存占用淘汰最久未使用的快照。
+缓存保存和返回的都是条目的副本，调用方修改返回的条目不会影响缓存。
+"""
+
+import sys
+import logging
+import threading
+from collections import OrderedDict
+
+
+def measure_items(news_items):
+    """估算已解析条目占用的内存字节数（列表、条目字典及其字段值）
+
+    Args:
+        news_items: 新闻条目列表
+
+    Returns:
+        int: 估算的字节数
+    """
+    size = sys.getsizeof(news_items)
+    for item in news_items:
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            size += sum(sys.getsizeof(value) for value in item.values())
+    return size
+
+
+def _copy_items(news_items):
+    return [dict(item) if isinstance(item, dict) else item for item in news_items]
+
+
+class SnapshotCache:
+    """已解析快照的LRU缓存类"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entry_bytes=None):
+        """初始化缓存
+
+        Args:
+            max_bytes: 缓存条目的内存占用总和上限（按解析后的大小估算）
+            max_entry_bytes: 单个可缓存快照的内存占用上限，默认为max_bytes的一半
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.snapshot_cache')
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 2
+
+        self._lock = threading.Lock()
+        # {快照名称: ((修改时间, 大小), 新闻条目列表, 内存占用)}
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def cacheable(self, size):
+        """判断内存占用为size的快照是否可以放入缓存
+
+        Args:
+            size: 解析后条目的内存占用（measure_items的返回值）
+        """
+        return size <= self.max_entry_bytes
+
+    def get(self, key, signature):
+        """读取缓存的快照
+
+        Args:
+            key: 快照名称
+            signature: 快照当前的签名 (修改时间, 大小)
+
+        Returns:
+            list: 新闻条目列表的副本，未命中或快照已变化时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            if entry[0] != signature:
+                self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            news_items = entry[1]
+
+        return _copy_items(news_items)
+
+    def put(self, key, news_items, signature, size=None):
+        """缓存解析后的快照（保存条目的副本）
+
+        Args:
+            key: 快照名称
+            news_items: 新闻条目列表
+            signature: 读取内容时的快照签名 (修改时间, 大小)
+            size: 条目的内存占用，None表示在此计算
+        """
+        if signature is None:
+            return
+        if size is None:
+            size = measure_items(news_items)
+        if not self.cacheable(size):
+            self.invalidate(key)
+            return
+
+        news_items = _copy_items(news_items)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (signature, news_items, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate(self, key):
+        """移除指定快照的缓存"""
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry[2]
+
+    def stats(self):
+        """获取缓存统计信息
+
+        Returns:
+            dict: 命中数、未命中数、缓存的快照数和估算的内存占用
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._bytes
+            }
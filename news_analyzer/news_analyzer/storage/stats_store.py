@@ -0,0 +1,282 @@
+"""
+新闻统计聚合
+
+在每次保存刷新结果时增量更新统计数据（按来源、分类、小时、日期计数，
+新旧新闻比例以及抓取耗时），保存在 data/index/stats.db 中。
+统计数据独立于原始快照，快照被整理或删除后统计历史仍然完整。
+"""
+
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+
+from news_analyzer.storage.item_utils import item_key, parse_date_string
+
+
+class StatsStore:
+    """新闻统计聚合类"""
+
+    # 支持查询的统计维度
+    DIMENSIONS = ('source', 'category', 'hour', 'day')
+
+    def __init__(self, db_path):
+        """初始化统计存储
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.stats')
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen_items (
+                    key_hash TEXT PRIMARY KEY,
+                    first_seen REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS counters (
+                    dimension TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    items INTEGER NOT NULL DEFAULT 0,
+                    new_items INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (dimension, bucket)
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fetch_stats (
+                    source TEXT PRIMARY KEY,
+                    fetches INTEGER NOT NULL DEFAULT 0,
+                    failures INTEGER NOT NULL DEFAULT 0,
+                    items INTEGER NOT NULL DEFAULT 0,
+                    total_seconds REAL NOT NULL DEFAULT 0,
+                    max_seconds REAL NOT NULL DEFAULT 0,
+                    last_seconds REAL,
+                    last_fetch REAL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS ingested_files (
+                    name TEXT PRIMARY KEY,
+                    ingested_at REAL
+                )
+            """)
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def record_items(self, news_items, ingested_at=None, filename=None):
+        """记录一批入库的新闻
+
+        Args:
+            news_items: 新闻条目列表
+            ingested_at: 入库时间戳（可选，默认当前时间）
+            filename: 对应的快照文件名（可选），记录后不会被重复统计
+
+        Returns:
+            tuple: (条目数, 新条目数)
+        """
+        ingested_at = ingested_at or time.time()
+        counts = {}
+
+        def bump(dimension, bucket, is_new):
+            entry = counts.setdefault((dimension, bucket or '未知'), [0, 0])
+            entry[0] += 1
+            if is_new:
+                entry[1] += 1
+
+        total = new_total = 0
+        with self._lock, self._conn:
+            if filename:
+                row = self._conn.execute(
+                    "SELECT 1 FROM ingested_files WHERE name = ?", (filename,)
+                ).fetchone()
+                if row:
+                    return 0, 0
+
+            for item in news_items:
+                if not isinstance(item, dict):
+                    continue
+                key = item_key(item)
+                if not key:
+                    continue
+
+                key_hash = hashlib.sha1(key.encode('utf-8')).hexdigest()[:20]
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO seen_items (key_hash, first_seen) VALUES (?, ?)",
+                    (key_hash, ingested_at)
+                )
+                is_new = cursor.rowcount == 1
+
+                collected = parse_date_string(item.get('collected_at', '')) or ingested_at
+                moment = datetime.fromtimestamp(collected)
+
+                bump('total', 'all', is_new)
+                bump('source', item.get('source_name'), is_new)
+                bump('category', item.get('category'), is_new)
+                bump('hour', moment.strftime('%Y-%m-%d %H:00'), is_new)
+                bump('day', moment.strftime('%Y-%m-%d'), is_new)
+
+                total += 1
+                if is_new:
+                    new_total += 1
+
+            self._conn.executemany("""
+                INSERT INTO counters (dimension, bucket, items, new_items) VALUES (?, ?, ?, ?)
+                ON CONFLICT(dimension, bucket) DO UPDATE SET
+                    items = items + excluded.items,
+                    new_items = new_items + excluded.new_items
+            """, [(dim, bucket, n, new) for (dim, bucket), (n, new) in counts.items()])
+
+            if filename:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO ingested_files (name, ingested_at) VALUES (?, ?)",
+                    (filename, ingested_at)
+                )
+
+        return total, new_total
+
+    def record_fetch(self, source, seconds, item_count=0, success=True, fetched_at=None):
+        """记录一次新闻源抓取
+
+        Args:
+            source: 新闻源名称
+            seconds: 抓取耗时（秒）
+            item_count: 获取的条目数
+            success: 是否成功
+            fetched_at: 抓取时间戳（可选，默认当前时间）
+        """
+        fetched_at = fetched_at or time.time()
+        with self._lock, self._conn:
+            self._conn.execute("""
+                INSERT INTO fetch_stats
+                    (source, fetches, failures, items, total_seconds, max_seconds, last_seconds, last_fetch)
+                VALUES (?, 1, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(source) DO UPDATE SET
+                    fetches = fetches + 1,
+                    failures = failures + excluded.failures,
+                    items = items + excluded.items,
+                    total_seconds = total_seconds + excluded.total_seconds,
+                    max_seconds = MAX(max_seconds, excluded.max_seconds),
+                    last_seconds = excluded.last_seconds,
+                    last_fetch = excluded.last_fetch
+            """, (source, 0 if success else 1, item_count, seconds, seconds, seconds, fetched_at))
+
+    def is_file_ingested(self, filename):
+        """检查快照是否已计入统计"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM ingested_files WHERE name = ?", (filename,)
+            ).fetchone()
+        return row is not None
+
+    def mark_ingested(self, filename):
+        """将快照标记为已计入统计（用于由已统计数据生成的归档）"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ingested_files (name, ingested_at) VALUES (?, ?)",
+                (filename, time.time())
+            )
+
+    def summary(self):
+        """获取总体统计
+
+        Returns:
+            dict: 条目总数、新条目数、重复条目数、新条目比例和已统计快照数
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT items, new_items FROM counters WHERE dimension = 'total' AND bucket = 'all'"
+            ).fetchone()
+            snapshots = self._conn.execute("SELECT COUNT(*) FROM ingested_files").fetchone()[0]
+            unique = self._conn.execute("SELECT COUNT(*) FROM seen_items").fetchone()[0]
+
+        items, new_items = row if row else (0, 0)
+        return {
+            'items': items,
+            'new_items': new_items,
+            'repeat_items': items - new_items,
+            'new_ratio': new_items / items if items else 0.0,
+            'unique_items': unique,
+            'snapshots': snapshots
+        }
+
+    def counts(self, dimension, start=None, end=None, limit=None):
+        """按维度查询计数
+
+        Args:
+            dimension: 统计维度，取值见 DIMENSIONS
+            start: 起始桶（包含，仅对hour/day有效，如 '2025-06-01'）
+            end: 结束桶（包含，仅对hour/day有效）
+            limit: 返回的最大行数（可选）
+
+        Returns:
+            list: [{'bucket', 'items', 'new_items', 'repeat_items'}, ...]；
+                  source/category按条目数降序，hour/day按时间升序
+        """
+        if dimension not in self.DIMENSIONS:
+            raise ValueError(f"不支持的统计维度: {dimension}")
+
+        sql = ["SELECT bucket, items, new_items FROM counters WHERE dimension = ?"]
+        params = [dimension]
+        if start is not None:
+            sql.append("AND bucket >= ?")
+            params.append(start)
+        if end is not None:
+            sql.append("AND bucket <= ?")
+            params.append(end)
+        if dimension in ('hour', 'day'):
+            sql.append("ORDER BY bucket")
+        else:
+            sql.append("ORDER BY items DESC")
+        if limit is not None:
+            sql.append("LIMIT ?")
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(' '.join(sql), params).fetchall()
+
+        return [
+            {'bucket': bucket, 'items': items, 'new_items': new_items,
+             'repeat_items': items - new_items}
+            for bucket, items, new_items in rows
+        ]
+
+    def fetch_latencies(self):
+        """获取各新闻源的抓取耗时统计
+
+        Returns:
+            list: 按平均耗时降序排列的统计字典列表
+        """
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT source, fetches, failures, items, total_seconds, max_seconds, last_seconds
+                FROM fetch_stats
+            """).fetchall()
+
+        results = [
+            {
+                'source': source,
+                'fetches': fetches,
+                'failures': failures,
+                'items': items,
+                'avg_seconds': total_seconds / fetches if fetches else 0.0,
+                'max_seconds': max_seconds,
+                'last_seconds': last_seconds
+            }
+            for source, fetches, failures, items, total_seconds, max_seconds, last_seconds in rows
+        ]
+        results.sort(key=lambda r: r['avg_seconds'], reverse=True)
+        return results
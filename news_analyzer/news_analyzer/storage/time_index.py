@@ -0,0 +1,371 @@
+"""
+新闻时间索引
+
+为所有快照中的新闻条目维护按归一化时间排序的索引，支持跨快照的
+时间范围查询。索引保存在 data/index/time_index.db（SQLite）中：
+每个快照的条目在保存时追加一次，另有一张按去重键记录"当前版本"
+（最新快照中的版本）的表，查询时直接按时间范围读取，不需要在内存中合并。
+快照按文件的修改时间和大小判断是否需要重新索引。
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+
+from news_analyzer.storage.item_utils import item_key, item_time, snapshot_time, snapshot_sort_key
+
+
+class TimeIndex:
+    """新闻时间索引类"""
+
+    # 新条目比当前版本更新（快照更新，或同一快照中位置更靠后）时替换当前版本
+    _UPSERT_LATEST = """
+        INSERT INTO latest (key, ts, file, pos, sort_ts) {source}
+        ON CONFLICT(key) DO UPDATE SET
+            ts = excluded.ts, file = excluded.file, pos = excluded.pos, sort_ts = excluded.sort_ts
+        WHERE (excluded.sort_ts, excluded.file, excluded.pos) >= (latest.sort_ts, latest.file, latest.pos)
+    """
+
+    def __init__(self, db_path):
+        """初始化时间索引
+
+        Args:
+            db_path: SQLite数据库文件路径
+        """
+        self.logger = logging.getLogger('news_analyzer.storage.time_index')
+        self.db_path = db_path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+        # 旧版本的JSON索引不再使用
+        legacy_path = os.path.join(os.path.dirname(db_path), 'time_index.json')
+        if os.path.exists(legacy_path):
+            try:
+                os.remove(legacy_path)
+            except OSError:
+                pass
+
+    def _create_tables(self):
+        with self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    name TEXT PRIMARY KEY,
+                    sort_ts REAL NOT NULL,
+                    mtime REAL,
+                    size INTEGER
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    file TEXT NOT NULL,
+                    pos INTEGER NOT NULL,
+                    ts REAL NOT NULL,
+                    key TEXT NOT NULL,
+                    source TEXT,
+                    category TEXT,
+                    title TEXT,
+                    PRIMARY KEY (file, pos)
+                ) WITHOUT ROWID
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_key ON entries(key)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS latest (
+                    key TEXT PRIMARY KEY,
+                    ts REAL NOT NULL,
+                    file TEXT NOT NULL,
+                    pos INTEGER NOT NULL,
+                    sort_ts REAL NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_latest_ts ON latest(ts)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_latest_file ON latest(file)")
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _iter_rows(filename, items):
+        """为单个快照生成索引行"""
+        fallback = snapshot_time(filename)
+        for pos, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            key = item_key(item)
+            if not key:
+                continue
+            ts = item_time(item, fallback)
+            if ts is None:
+                continue
+            yield (
+                filename, pos, ts, key,
+                item.get('source_name', ''),
+                item.get('category', ''),
+                (item.get('title') or '').strip()
+            )
+
+    def _remove(self, cursor, names):
+        """删除快照的条目，原先以这些快照中的版本为准的新闻改用其余快照中最新的版本"""
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS removed_keys (key TEXT PRIMARY KEY)")
+        cursor.execute("DELETE FROM removed_keys")
+        for name in names:
+            cursor.execute(
+                "INSERT OR IGNORE INTO removed_keys SELECT key FROM latest WHERE file = ?", (name,)
+            )
+            cursor.execute("DELETE FROM latest WHERE file = ?", (name,))
+            cursor.execute("DELETE FROM entries WHERE file = ?", (name,))
+            cursor.execute("DELETE FROM files WHERE name = ?", (name,))
+
+        cursor.execute(self._UPSERT_LATEST.format(source="""
+            SELECT e.key, e.ts, e.file, e.pos, f.sort_ts
+            FROM entries e JOIN files f ON f.name = e.file
+            WHERE e.key IN (SELECT key FROM removed_keys)
+        """))
+        cursor.execute("DELETE FROM removed_keys")
+
+    def _add(self, cursor, filename, items, mtime, size):
+        """追加一个快照的条目"""
+        sort_ts = snapshot_sort_key(filename)[0]
+        cursor.execute(
+            "INSERT INTO files (name, sort_ts, mtime, size) VALUES (?, ?, ?, ?)",
+            (filename, sort_ts, mtime, size)
+        )
+        cursor.executemany(
+            "INSERT OR REPLACE INTO entries (file, pos, ts, key, source, category, title) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", self._iter_rows(filename, items)
+        )
+        cursor.execute(self._UPSERT_LATEST.format(source="""
+            SELECT key, ts, file, pos, ? FROM entries WHERE file = ? ORDER BY pos
+        """), (sort_ts, filename))
+
+    def files(self):
+        """获取已建立索引的快照
+
+        Returns:
+            dict: {文件名: (修改时间, 文件大小)}
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT name, mtime, size FROM files").fetchall()
+        return {name: (mtime, size) for name, mtime, size in rows}
+
+    def sync(self, catalog, loader):
+        """与存储中的快照列表同步索引
+
+        Args:
+            catalog: [(filename, mtime, size), ...]
+            loader: 读取快照内容的函数，参数为文件名，返回条目列表
+
+        Returns:
+            bool: 索引是否发生变化
+        """
+        with self._lock:
+            indexed = self.files()
+            current = {name: (mtime, size) for name, mtime, size in catalog}
+
+            removed = [name for name, signature in indexed.items() if current.get(name) != signature]
+            added = [name for name, signature in current.items() if indexed.get(name) != signature]
+            if not removed and not added:
+                return False
+
+            with self._conn:
+                cursor = self._conn.cursor()
+                self._remove(cursor, removed)
+                for name in added:
+                    mtime, size = current[name]
+                    self._add(cursor, name, loader(name), mtime, size)
+
+            self.logger.info(f"时间索引已更新: 移除 {len(removed)} 个快照，添加 {len(added)} 个快照")
+            return True
+
+    def add_snapshot(self, filename, items, mtime, size):
+        """增量添加新保存的快照（同名快照已存在时替换）
+
+        Args:
+            filename: 快照文件名
+            items: 快照中的新闻条目列表
+            mtime: 文件修改时间
+            size: 文件大小
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.cursor()
+            self._remove(cursor, [filename])
+            self._add(cursor, filename, items, mtime, size)
+
+    def remove_files(self, names):
+        """移除已删除快照的条目
+
+        Args:
+            names: 文件名列表
+        """
+        with self._lock, self._conn:
+            self._remove(self._conn.cursor(), names)
+
+    def select(self, start=None, end=None, category=None, source=None, descending=True,
+               limit=None, offset=0):
+        """查询时间范围内的索引条目（同一新闻只返回最新快照中的版本）
+
+        Args:
+            start: 起始时间戳（包含），None表示不限
+            end: 结束时间戳（包含），None表示不限
+            category: 分类过滤（可选）
+            source: 来源名称过滤（可选）
+            descending: 是否按时间倒序（最新的在前）
+            limit: 返回的最大条目数，None表示不限（在SQL中分页，只读取需要的行）
+            offset: 跳过的条目数
+
+        Returns:
+            list: [(timestamp, filename, position), ...]
+        """
+        sql, params = self._filtered("SELECT l.ts, l.file, l.pos FROM latest l",
+                                     start, end, category, source)
+        order = "DESC" if descending else "ASC"
+        sql.append(f"ORDER BY l.ts {order}, l.sort_ts {order}, l.file {order}, l.pos {order}")
+        if limit is not None or offset:
+            sql.append("LIMIT ? OFFSET ?")
+            params.extend([-1 if limit is None else limit, offset])
+
+        with self._lock:
+            return self._conn.execute(' '.join(sql), params).fetchall()
+
+    def count_by_file(self, start=None, end=None, category=None, source=None):
+        """统计每个快照中符合条件的条目数（同一新闻只计最新快照中的版本）
+
+        Args:
+            start: 起始时间戳（包含），None表示不限
+            end: 结束时间戳（包含），None表示不限
+            category: 分类过滤（可选）
+            source: 来源名称过滤（可选）
+
+        Returns:
+            list: [(filename, count), ...]，按快照时间排序
+        """
+        sql, params = self._filtered(
+            "SELECT l.file, COUNT(*) FROM latest l", start, end, category, source
+        )
+        sql.append("GROUP BY l.file ORDER BY MIN(l.sort_ts), l.file")
+
+        with self._lock:
+            return self._conn.execute(' '.join(sql), params).fetchall()
+
+    def positions(self, filename, start=None, end=None, category=None, source=None):
+        """获取单个快照中符合条件的条目位置（同一新闻只取最新快照中的版本）
+
+        Args:
+            filename: 快照文件名
+            start: 起始时间戳（包含），None表示不限
+            end: 结束时间戳（包含），None表示不限
+            category: 分类过滤（可选）
+            source: 来源名称过滤（可选）
+
+        Returns:
+            list: 按位置升序排列的条目位置
+        """
+        sql, params = self._filtered(
+            "SELECT l.pos FROM latest l", start, end, category, source, filename=filename
+        )
+        sql.append("ORDER BY l.pos")
+
+        with self._lock:
+            return [row[0] for row in self._conn.execute(' '.join(sql), params)]
+
+    @staticmethod
+    def _filtered(select, start, end, category, source, filename=None):
+        """为latest表的查询拼接过滤条件，返回 (SQL片段列表, 参数列表)"""
+        sql = [select]
+        conditions, params = [], []
+        if category is not None or source is not None:
+            sql.append("JOIN entries e ON e.file = l.file AND e.pos = l.pos")
+        if filename is not None:
+            conditions.append("l.file = ?")
+            params.append(filename)
+        if start is not None:
+            conditions.append("l.ts >= ?")
+            params.append(start)
+        if end is not None:
+            conditions.append("l.ts <= ?")
+            params.append(end)
+        if category is not None:
+            conditions.append("e.category = ?")
+            params.append(category)
+        if source is not None:
+            conditions.append("e.source = ?")
+            params.append(source)
+        if conditions:
+            sql.append("WHERE " + " AND ".join(conditions))
+        return sql, params
+
+    @contextmanager
+    def read_snapshot(self):
+        """在单独的只读事务中读取索引
+
+        事务期间其他线程写入的快照不可见，适合需要多次查询且要求结果一致的场景
+        （如增量更新历史索引），并且不阻塞索引的写入。
+
+        Yields:
+            TimeIndexSnapshot: 索引的一致视图
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("BEGIN")
+            yield TimeIndexSnapshot(conn)
+        finally:
+            conn.close()
+
+
+class TimeIndexSnapshot:
+    """时间索引在某一时刻的只读视图，由 TimeIndex.read_snapshot 创建"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def files(self):
+        """获取视图中已建立索引的快照
+
+        Returns:
+            dict: {文件名: (修改时间, 文件大小)}
+        """
+        rows = self._conn.execute("SELECT name, mtime, size FROM files").fetchall()
+        return {name: (mtime, size) for name, mtime, size in rows}
+
+    def iter_latest(self, files=None):
+        """按时间升序逐行读取每条新闻的当前版本
+
+        Args:
+            files: 只读取当前版本位于这些快照中的新闻（可选）
+
+        Yields:
+            tuple: (时间戳, 去重键, 文件名, 位置, 来源, 分类, 标题)
+        """
+        sql = ("SELECT l.ts, l.key, l.file, l.pos, e.source, e.category, e.title "
+               "FROM latest l JOIN entries e ON e.file = l.file AND e.pos = l.pos")
+        params = []
+        if files is not None:
+            files = list(files)
+            sql += f" WHERE l.file IN ({','.join('?' * len(files))})"
+            params = files
+        sql += " ORDER BY l.ts, l.sort_ts, l.file, l.pos"
+        yield from self._conn.execute(sql, params)
+
+    def previous_version(self, key, exclude):
+        """获取排除某些快照后，新闻在其余快照中的最新版本
+
+        Args:
+            key: 去重键
+            exclude: 要排除的文件名集合
+
+        Returns:
+            tuple: (时间戳, 文件名, 位置)，没有时返回None
+        """
+        exclude = list(exclude)
+        sql = (
+            "SELECT e.ts, e.file, e.pos FROM entries e JOIN files f ON f.name = e.file "
+            f"WHERE e.key = ? AND e.file NOT IN ({','.join('?' * len(exclude))}) "
+            "ORDER BY f.sort_ts DESC, e.file DESC, e.pos DESC LIMIT 1"
+        )
+        return self._conn.execute(sql, [key] + exclude).fetchone()
@@ -5,6 +5,7 @@
 支持独立聊天和新闻上下文聊天模式。
 """
 
+import time
 import logging
 import math
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, 
@@ -16,6 +17,10 @@ from PyQt5.QtGui import (QColor, QPainter, QPixmap, QIcon, QKeyEvent, QPalette,
                         QLinearGradient, QFont, QRadialGradient)
 
 from news_analyzer.llm.llm_client import LLMClient
+from news_analyzer.llm.context_builder import ContextBuilder
+from news_analyzer.llm.chat_history import ChatHistory
+from news_analyzer.llm.token_utils import estimate_tokens, truncate_to_tokens
+from news_analyzer.storage.bm25_index import BM25Index
 
 
 class StreamHandler(QObject):
@@ -278,11 +283,22 @@ class ChatPanel(QWidget):
         self.logger = logging.getLogger('news_analyzer.ui.chat_panel')
         self.llm_client = LLMClient()
         self.current_news = None
-        self.chat_history = []
+        
+        # 聊天历史：保留最近几轮原文，更早的对话在后台压缩为摘要，每次请求不超过token上限
+        self.chat_history = ChatHistory(
+            complete=lambda prompt, max_tokens: self.llm_client.complete(prompt, max_tokens)
+        )
         
         # 存储可用的新闻标题
         self.available_news_titles = []
         
+        # 新闻上下文构建器：按问题从当前新闻列表中挑选相关新闻
+        self.context_builder = ContextBuilder()
+        
+        # 本地检索索引：包含当前新闻列表和历史新闻，为每个问题检索相关新闻
+        self.retrieval_index = BM25Index()
+        self.retrieval_top_k = 8
+        
         # 流处理器
         self.stream_handler = StreamHandler()
         self.stream_handler.update_signal.connect(self._update_message)
@@ -293,6 +309,9 @@ class ChatPanel(QWidget):
         # 用于追踪当前AI回复
         self.current_ai_bubble = None
         
+        # 当前请求的发起时间，收到首个输出后清空（用于记录首字延迟）
+        self._request_started = None
+        
         # 用于存储打字指示器
         self.typing_indicator = None
         
@@ -502,6 +521,9 @@ class ChatPanel(QWidget):
             title = news.get('title', '无标题')
             self.available_news_titles.append(title)
         
+        self.context_builder.set_items(news_items)
+        self.retrieval_index.add_items(news_items)
+        
         self.logger.debug(f"设置了 {len(self.available_news_titles)} 条可用新闻标题")
     
     def eventFilter(self, obj, event):
@@ -527,7 +549,7 @@ class ChatPanel(QWidget):
             message = """
             <div style='font-family: "Microsoft YaHei", "Segoe UI", sans-serif; line-height: 1.8;'>
                 <h3 style='color: #1976D2; margin-bottom: 10px;'>已切换到新闻上下文模式</h3>
-                <p style='margin: 8px 0;'>提示: 请从新闻列表中选择一篇新闻</p>
+                <p style='margin: 8px 0;'>将根据您的问题从当前新闻列表中挑选相关新闻作为上下文，也可以从新闻列表中选择一篇新闻重点讨论</p>
             </div>
             """
         else:
@@ -609,13 +631,14 @@ class ChatPanel(QWidget):
         if not message:
             return
         
-        # 检查是否需要新闻上下文但没有选择新闻
-        if self.use_news_context and not self.current_news:
+        # 检查是否需要新闻上下文但既没有选择新闻，也没有可用的新闻
+        if (self.use_news_context and not self.current_news
+                and not len(self.context_builder) and not len(self.retrieval_index)):
             self._add_message(f"<div>{message}</div>", is_user=True)
             self._add_message("""
             <div style='font-family: "Microsoft YaHei", "Segoe UI", sans-serif; line-height: 1.8;'>
-                <h3 style='color: #F44336; margin-bottom: 10px;'>未选择新闻</h3>
-                <p style='margin: 8px 0;'>请先从新闻列表中选择一篇新闻，或取消勾选"使用新闻上下文"切换到一般对话模式。</p>
+                <h3 style='color: #F44336; margin-bottom: 10px;'>没有可用的新闻</h3>
+                <p style='margin: 8px 0;'>请先刷新新闻或从新闻列表中选择一篇新闻，或取消勾选"使用新闻上下文"切换到一般对话模式。</p>
             </div>
             """)
             return
@@ -628,14 +651,14 @@ class ChatPanel(QWidget):
         # 添加用户消息
         formatted_message = f"<div style='font-family: \"Microsoft YaHei\", \"Segoe UI\", sans-serif; line-height: 1.8;'>{message}</div>"
         self._add_message(formatted_message, is_user=True)
-        self.chat_history.append({"role": "user", "content": message})
+        self.chat_history.add("user", message)
         
         # 检查是否在询问新闻标题
         if self._is_asking_for_news_titles(message):
             # 直接返回新闻标题，不调用API
             response = self._create_news_title_response()
             self._add_message(response, is_user=False)
-            self.chat_history.append({"role": "assistant", "content": response})
+            self.chat_history.add("assistant", response)
             
             # 重新启用UI
             self.send_button.setEnabled(True)
@@ -676,22 +699,20 @@ class ChatPanel(QWidget):
         try:
             # 准备上下文
             context = ""
-            if self.use_news_context and self.current_news:
-                # 单条新闻上下文处理
-                title = self.current_news.get('title', '')
-                source = self.current_news.get('source_name', '')
-                content = self.current_news.get('description', '')
-                pub_date = self.current_news.get('pub_date', '')
-                link = self.current_news.get('link', '')
+            if self.use_news_context:
+                # 选中的新闻和从本地索引中检索到的相关新闻，按token预算组装；
+                # 索引没有检索到时由上下文构建器按词的稀有程度自行挑选相关新闻
+                retrieved = [item for item, _ in self.retrieval_index.search(user_message, self.retrieval_top_k)]
+                context = self.context_builder.build(
+                    user_message, current_news=self.current_news, retrieved=retrieved or None
+                )
+                self.logger.debug(f"检索到 {len(retrieved)} 条相关新闻")
                 
-                context = f"""新闻标题: {title}
-新闻来源: {source}
-发布日期: {pub_date}
-原文链接: {link}
-
-新闻内容: 
-{content}
-"""
+                # 聊天历史至少要放下摘要和完整的问题，合计超过上限时缩减新闻上下文（末尾是最不相关的新闻）
+                context_budget = max(0, self.chat_history.max_tokens - self.chat_history.min_tokens())
+                if estimate_tokens(context) > context_budget:
+                    context = truncate_to_tokens(context, context_budget)
+                self.logger.debug(f"新闻上下文约 {estimate_tokens(context)} tokens")
             
             # 创建一个初始的AI消息气泡，显示"思考中..."
             initial_content = """
@@ -714,8 +735,9 @@ class ChatPanel(QWidget):
             self._scroll_to_bottom()
             
             # 发起流式请求
+            self._request_started = time.monotonic()
             self.llm_client.chat(
-                messages=self.chat_history, 
+                messages=self.chat_history.messages(reserve_tokens=estimate_tokens(context)), 
                 context=context,
                 stream=True,
                 callback=self.stream_handler.handle_stream
@@ -793,6 +815,13 @@ class ChatPanel(QWidget):
         """更新消息内容，支持流式输出"""
         if not self.current_ai_bubble:
             return
+        
+        # 收到首个输出后立即隐藏打字指示器
+        if self._request_started is not None:
+            self.logger.debug(f"首个输出延迟 {time.monotonic() - self._request_started:.2f} 秒")
+            self._request_started = None
+            if not done:
+                self.typing_indicator.hide_indicator()
             
         # 格式化文本
         formatted_text = self._format_ai_response(text)
@@ -810,7 +839,7 @@ class ChatPanel(QWidget):
             self.typing_indicator.hide_indicator()
             
             # 更新聊天历史
-            self.chat_history.append({"role": "assistant", "content": text})
+            self.chat_history.add("assistant", text)
             
             # 重新启用UI
             self.send_button.setEnabled(True)
@@ -831,7 +860,7 @@ class ChatPanel(QWidget):
                 item.widget().deleteLater()
         
         # 清空聊天历史记录
-        self.chat_history = []
+        self.chat_history.clear()
         self.current_ai_bubble = None
         
         # 添加欢迎消息
@@ -4,16 +4,171 @@
 提供浏览和加载已保存的历史新闻功能。
 """
 
-import os
 import json
 import logging
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QListWidget, 
-                             QListWidgetItem, QLabel, QTextBrowser, 
-                             QPushButton, QSplitter, QComboBox, QFrame,
+                             QListWidgetItem, QListView, QLabel, QTextBrowser, 
+                             QPushButton, QSplitter, QComboBox, QFrame, QLineEdit,
                              QMessageBox, QFileDialog, QProgressBar, 
                              QTabWidget, QGridLayout)
-from PyQt5.QtCore import Qt, pyqtSignal, QSize
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QThread, QAbstractListModel, QModelIndex
+
+from news_analyzer.storage.importer import NewsImporter
+from news_analyzer.storage.exporter import NewsExporter
+from news_analyzer.storage.item_utils import (snapshot_period, to_timestamp, SNAPSHOT_NAME_PATTERN,
+                                             DAILY_ARCHIVE_PATTERN, MONTHLY_ARCHIVE_PATTERN)
+
+
+class SnapshotPageLoader(QThread):
+    """快照分页加载线程
+    
+    在后台流式读取快照，每次只加载一页，收到请求后再继续加载下一页。
+    """
+    
+    # 信号参数中的token用于区分不同的加载请求
+    page_loaded = pyqtSignal(int, list)
+    loading_finished = pyqtSignal(int, int)
+    loading_failed = pyqtSignal(int, str)
+    
+    def __init__(self, storage, filename, token, page_size=200):
+        super().__init__()
+        self.storage = storage
+        self.filename = filename
+        self.token = token
+        self.page_size = page_size
+        
+        # 第一页无需等待请求，立即加载
+        self._more_requested = threading.Event()
+        self._more_requested.set()
+        self._stopped = False
+    
+    def request_more(self):
+        """请求加载下一页"""
+        self._more_requested.set()
+    
+    def stop(self):
+        """停止加载"""
+        self._stopped = True
+        self._more_requested.set()
+    
+    def run(self):
+        """运行线程"""
+        total = 0
+        try:
+            for page in self.storage.iter_news_pages(self.filename, self.page_size):
+                self._more_requested.wait()
+                if self._stopped:
+                    return
+                self._more_requested.clear()
+                
+                total += len(page)
+                self.page_loaded.emit(self.token, page)
+            
+            if not self._stopped:
+                self.loading_finished.emit(self.token, total)
+        except Exception as e:
+            self.loading_failed.emit(self.token, str(e))
+
+
+class HistorySearchThread(QThread):
+    """历史全文搜索线程
+    
+    首次搜索时需要为尚未索引的快照建立索引，放在后台执行避免阻塞界面。
+    """
+    
+    search_complete = pyqtSignal(str, list)
+    
+    def __init__(self, storage, query, start=None, end=None, limit=200):
+        super().__init__()
+        self.storage = storage
+        self.query = query
+        self.start_time = start
+        self.end_time = end
+        self.limit = limit
+    
+    def run(self):
+        """运行线程"""
+        results = self.storage.search(
+            self.query, self.start_time, self.end_time, limit=self.limit
+        )
+        self.search_complete.emit(self.query, results)
+
+
+class HistoryIndexThread(QThread):
+    """历史索引打开线程
+    
+    快照有变化时需要更新内存映射的历史索引，放在后台执行避免阻塞界面；
+    索引打开后，增量积累较多时继续在后台合并，下次打开时使用合并后的索引。
+    """
+    
+    index_ready = pyqtSignal(int, object)
+    index_failed = pyqtSignal(int, str)
+    
+    def __init__(self, storage, token):
+        super().__init__()
+        self.storage = storage
+        self.token = token
+    
+    def run(self):
+        """运行线程"""
+        reader = self.storage.open_history_index()
+        if reader is None:
+            self.index_failed.emit(self.token, "无法建立历史索引")
+        else:
+            self.index_ready.emit(self.token, reader)
+            self.storage.merge_history_index()
+
+
+class HistoryIndexModel(QAbstractListModel):
+    """历史索引的列表模型
+    
+    只保存记录区间，视图请求某一行时才从内存映射的索引中读取标题，
+    浏览任意多条新闻时内存占用基本不变。
+    """
+    
+    def __init__(self, reader, lo, hi, descending=True, parent=None):
+        """初始化模型
+        
+        Args:
+            reader: HistoryIndexReader实例
+            lo: 区间起始记录序号（包含）
+            hi: 区间结束记录序号（不包含）
+            descending: 是否按时间倒序显示
+        """
+        super().__init__(parent)
+        self.reader = reader
+        self.lo = lo
+        self.hi = hi
+        self.descending = descending
+    
+    def _record_row(self, row):
+        return self.hi - 1 - row if self.descending else self.lo + row
+    
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.hi - self.lo
+    
+    def entry(self, row):
+        """获取第row行的时间索引条目 (时间戳, 文件名, 位置)"""
+        return self.reader.entry(self._record_row(row))
+    
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or not 0 <= index.row() < self.rowCount():
+            return None
+        
+        row = self._record_row(index.row())
+        if role == Qt.DisplayRole:
+            record = self.reader.record(row)
+            published = datetime.fromtimestamp(record.timestamp).strftime("%Y-%m-%d %H:%M")
+            return f"{self.reader.title(row) or '无标题'}\n{record.source or '未知来源'} - {published}"
+        if role == Qt.ToolTipRole:
+            return self.reader.title(row)
+        if role == Qt.UserRole:
+            return self.reader.entry(row)
+        return None
 
 
 class HistoryPanel(QWidget):
@@ -22,6 +177,15 @@ class HistoryPanel(QWidget):
     # 自定义信号：历史新闻加载完成
     history_loaded = pyqtSignal(list)
     
+    # 按时间范围浏览时，加载到主界面的最多新闻条数
+    RANGE_QUERY_LIMIT = 500
+    
+    # 浏览历史文件时每页加载的新闻条数
+    PAGE_SIZE = 200
+    
+    # 全文搜索最多显示的结果数
+    SEARCH_LIMIT = 200
+    
     def __init__(self, storage, parent=None):
         super().__init__(parent)
         
@@ -31,19 +195,25 @@ class HistoryPanel(QWidget):
         # 初始化状态标签（提前创建防止错误）
         self.status_label = QLabel("就绪")
         
-        # 显式设置新闻数据存储目录路径
-        self.news_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'news')
-        if not os.path.exists(self.news_dir):
-            # 备选路径 - 直接使用绝对路径
-            self.news_dir = r"C:\Users\Administrator\Desktop\news_analyzer\data\news"
-            if not os.path.exists(self.news_dir):
-                # 如果仍不存在，创建该目录
-                try:
-                    os.makedirs(self.news_dir, exist_ok=True)
-                except Exception as e:
-                    self.logger.error(f"创建目录失败: {str(e)}")
+        # 按时间范围查询或全文搜索得到的新闻
+        self.query_news = []
+        self._search_thread = None
+        
+        # 按时间范围浏览使用的历史索引
+        self._index_thread = None
+        self._index_token = 0
+        self._index_reader = None
+        
+        # 历史文件分页加载状态
+        self._page_loader = None
+        self._page_token = 0
+        self._loading_filename = None
+        self._loaded_count = 0
+        self._stale_loaders = []
         
-        self.logger.info(f"历史新闻目录: {self.news_dir}")
+        # 正在进行的导入和导出任务
+        self._import_service = None
+        self._export_service = None
         
         self._init_ui()
     
@@ -118,6 +288,7 @@ class HistoryPanel(QWidget):
         self.time_range.addItem("今天")
         self.time_range.addItem("本周")
         self.time_range.addItem("本月")
+        self.time_range.addItem("全部新闻")
         self.time_range.setStyleSheet("""
             QComboBox {
                 border: 1px solid #BDBDBD;
@@ -127,6 +298,7 @@ class HistoryPanel(QWidget):
                 background-color: white;
             }
         """)
+        self.time_range.currentIndexChanged.connect(self._on_time_range_changed)
         control_layout.addWidget(QLabel("时间范围:"))
         control_layout.addWidget(self.time_range)
         
@@ -149,7 +321,20 @@ class HistoryPanel(QWidget):
         self.refresh_button.clicked.connect(self._refresh_history_list)
         control_layout.addWidget(self.refresh_button)
         
-        control_layout.addStretch()
+        # 全文搜索框
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("全文搜索所有历史新闻，按Enter搜索...")
+        self.search_input.setStyleSheet("""
+            QLineEdit {
+                border: 1px solid #BDBDBD;
+                border-radius: 4px;
+                padding: 4px 8px;
+                background-color: white;
+            }
+        """)
+        self.search_input.returnPressed.connect(self._search_history)
+        control_layout.addWidget(self.search_input, 1)
+        
         layout.addLayout(control_layout)
         
         # 创建分割器 - 左侧是历史文件列表，右侧是预览
@@ -180,6 +365,24 @@ class HistoryPanel(QWidget):
         """)
         left_layout.addWidget(self.history_list)
         
+        # 与前一个快照比较
+        self.diff_button = QPushButton("较上一次新增")
+        self.diff_button.setToolTip("显示所选快照相比前一个快照新增和更新的新闻")
+        self.diff_button.setStyleSheet("""
+            QPushButton {
+                background-color: #ECEFF1;
+                border: 1px solid #CFD8DC;
+                border-radius: 4px;
+                padding: 4px 8px;
+                color: #455A64;
+            }
+            QPushButton:hover {
+                background-color: #CFD8DC;
+            }
+        """)
+        self.diff_button.clicked.connect(self._show_snapshot_diff)
+        left_layout.addWidget(self.diff_button)
+        
         # 右侧面板
         right_panel = QWidget()
         right_layout = QVBoxLayout(right_panel)
@@ -194,6 +397,7 @@ class HistoryPanel(QWidget):
         self.news_list = QListWidget()
         self.news_list.setAlternatingRowColors(True)
         self.news_list.itemClicked.connect(self._on_news_selected)
+        self.news_list.verticalScrollBar().valueChanged.connect(self._on_news_list_scrolled)
         self.news_list.setStyleSheet("""
             QListWidget {
                 border: 1px solid #E0E0E0;
@@ -209,6 +413,15 @@ class HistoryPanel(QWidget):
         """)
         right_layout.addWidget(self.news_list, 2)  # 新闻列表占2/3空间
         
+        # 按时间范围浏览的新闻列表（内存映射索引的惰性模型），与新闻列表交替显示
+        self.index_view = QListView()
+        self.index_view.setAlternatingRowColors(True)
+        self.index_view.setUniformItemSizes(True)
+        self.index_view.clicked.connect(self._on_index_item_selected)
+        self.index_view.setStyleSheet(self.news_list.styleSheet().replace("QListWidget", "QListView"))
+        self.index_view.setVisible(False)
+        right_layout.addWidget(self.index_view, 2)
+        
         # 新闻详情预览
         self.preview = QTextBrowser()
         self.preview.setOpenExternalLinks(True)
@@ -287,16 +500,17 @@ class HistoryPanel(QWidget):
         """)
         import_layout = QVBoxLayout(import_group)
         
-        import_title = QLabel("导入JSON新闻文件")
+        import_title = QLabel("导入新闻文件")
         import_title.setStyleSheet("font-weight: bold; font-size: 14px; color: #1976D2;")
         import_layout.addWidget(import_title)
         
-        import_desc = QLabel("选择一个JSON文件导入到系统。文件应包含新闻条目列表。")
+        import_desc = QLabel("选择一个JSON文件（新闻条目列表）或NDJSON文件（每行一条新闻）导入到系统。"
+                             "已存在的新闻会自动跳过。")
         import_desc.setWordWrap(True)
         import_layout.addWidget(import_desc)
         
-        import_button = QPushButton("选择并导入JSON文件")
-        import_button.setStyleSheet("""
+        self.import_button = QPushButton("选择并导入新闻文件")
+        self.import_button.setStyleSheet("""
             QPushButton {
                 background-color: #2196F3;
                 color: white;
@@ -309,8 +523,12 @@ class HistoryPanel(QWidget):
                 background-color: #1E88E5;
             }
         """)
-        import_button.clicked.connect(self._import_news_file)
-        import_layout.addWidget(import_button)
+        self.import_button.clicked.connect(self._import_news_file)
+        import_layout.addWidget(self.import_button)
+        
+        self.import_status_label = QLabel()
+        self.import_status_label.setWordWrap(True)
+        import_layout.addWidget(self.import_status_label)
         
         # 导出部分
         export_group = QFrame()
@@ -382,9 +600,80 @@ class HistoryPanel(QWidget):
         
         export_layout.addLayout(button_layout)
         
+        # 筛选导出部分
+        filter_group = QFrame()
+        filter_group.setFrameShape(QFrame.StyledPanel)
+        filter_group.setStyleSheet("""
+            QFrame {
+                border: 1px solid #E0E0E0;
+                border-radius: 8px;
+                background-color: #F5F5F5;
+                margin-top: 15px;
+                padding: 15px;
+            }
+        """)
+        filter_layout = QVBoxLayout(filter_group)
+        
+        filter_title = QLabel("按条件导出")
+        filter_title.setStyleSheet("font-weight: bold; font-size: 14px; color: #1976D2;")
+        filter_layout.addWidget(filter_title)
+        
+        filter_desc = QLabel("从所有历史数据中筛选新闻，导出为NDJSON或CSV文件。留空的条件表示不限。")
+        filter_desc.setWordWrap(True)
+        filter_layout.addWidget(filter_desc)
+        
+        filter_grid = QGridLayout()
+        
+        filter_grid.addWidget(QLabel("时间范围:"), 0, 0)
+        self.export_range_combo = QComboBox()
+        self.export_range_combo.addItems(["全部时间", "最近7天", "最近30天", "最近90天", "最近一年"])
+        filter_grid.addWidget(self.export_range_combo, 0, 1)
+        
+        filter_grid.addWidget(QLabel("格式:"), 0, 2)
+        self.export_format_combo = QComboBox()
+        self.export_format_combo.addItem("NDJSON", "ndjson")
+        self.export_format_combo.addItem("CSV", "csv")
+        filter_grid.addWidget(self.export_format_combo, 0, 3)
+        
+        filter_grid.addWidget(QLabel("来源:"), 1, 0)
+        self.export_source_input = QLineEdit()
+        filter_grid.addWidget(self.export_source_input, 1, 1)
+        
+        filter_grid.addWidget(QLabel("分类:"), 1, 2)
+        self.export_category_input = QLineEdit()
+        filter_grid.addWidget(self.export_category_input, 1, 3)
+        
+        filter_grid.addWidget(QLabel("关键词:"), 2, 0)
+        self.export_query_input = QLineEdit()
+        self.export_query_input.setPlaceholderText("全文搜索关键词（可选）")
+        filter_grid.addWidget(self.export_query_input, 2, 1, 1, 3)
+        
+        filter_layout.addLayout(filter_grid)
+        
+        self.filter_export_button = QPushButton("导出")
+        self.filter_export_button.setStyleSheet("""
+            QPushButton {
+                background-color: #2196F3;
+                color: white;
+                border-radius: 4px;
+                padding: 8px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #1E88E5;
+            }
+        """)
+        self.filter_export_button.clicked.connect(self._export_filtered)
+        filter_layout.addWidget(self.filter_export_button)
+        
+        self.export_status_label = QLabel()
+        self.export_status_label.setWordWrap(True)
+        filter_layout.addWidget(self.export_status_label)
+        
         # 添加到主布局
         layout.addWidget(import_group)
         layout.addWidget(export_group)
+        layout.addWidget(filter_group)
         layout.addStretch()
     
     def _refresh_export_combo(self):
@@ -392,27 +681,14 @@ class HistoryPanel(QWidget):
         self.export_combo.clear()
         
         try:
-            # 确保目录存在
-            if not os.path.exists(self.news_dir):
-                return
-                
-            # 获取所有JSON文件
-            files = [f for f in os.listdir(self.news_dir) if f.endswith('.json')]
-            files.sort(reverse=True)  # 最新的文件排在前面
+            # 获取所有快照，最新的排在前面
+            files = self.storage.list_news_files()[::-1]
             
             for filename in files:
-                try:
-                    # 从文件名提取日期时间
-                    if filename.startswith("news_") and filename.endswith(".json"):
-                        date_str = filename.replace("news_", "").replace(".json", "")
-                        date_time = datetime.strptime(date_str, "%Y%m%d_%H%M%S")
-                        display_text = f"{date_time.strftime('%Y-%m-%d %H:%M:%S')} ({filename})"
-                    else:
-                        display_text = filename
-                        
-                    self.export_combo.addItem(display_text, filename)
-                except:
-                    self.export_combo.addItem(filename, filename)
+                display_text = self._display_name(filename)
+                if display_text != filename:
+                    display_text = f"{display_text} ({filename})"
+                self.export_combo.addItem(display_text, filename)
             
             if self.export_combo.count() > 0:
                 self.status_label.setText(f"找到 {self.export_combo.count()} 个可导出文件")
@@ -422,27 +698,206 @@ class HistoryPanel(QWidget):
         except Exception as e:
             self.status_label.setText(f"加载文件列表失败: {str(e)}")
     
+    def _time_range_bounds(self):
+        """获取当前时间范围下拉框对应的起止时间
+        
+        Returns:
+            tuple: (起始datetime, 结束datetime)，"全部时间"返回 (None, None)
+        """
+        now = datetime.now()
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        range_text = self.time_range.currentText()
+        
+        if range_text == "今天":
+            return today, now
+        elif range_text == "本周":
+            return today - timedelta(days=today.weekday()), now
+        elif range_text == "本月":
+            return today.replace(day=1), now
+        return None, None
+    
+    def _on_time_range_changed(self, index):
+        """处理时间范围变化事件"""
+        self._stop_page_loader()
+        self._refresh_history_list()
+        
+        start, _ = self._time_range_bounds()
+        if start is None and self.time_range.currentText() != "全部新闻":
+            # 全部时间：恢复按文件浏览
+            self.query_news = []
+            self._show_index_view(False)
+            self.news_list.clear()
+            self.preview.clear()
+            self.info_label.setText("请选择历史文件")
+            return
+        
+        self._load_time_range_news()
+    
+    def _load_time_range_news(self):
+        """通过内存映射的历史索引浏览当前时间范围内的新闻
+        
+        快照有变化时先在后台重建索引。
+        """
+        self._index_token += 1
+        self.history_list.setCurrentRow(-1)
+        self.query_news = []
+        self.preview.clear()
+        self.info_label.setText("正在打开历史索引...")
+        
+        # 保留仍在运行的上一个线程的引用，避免线程对象在运行中被销毁
+        previous = self._index_thread
+        if previous is not None and previous.isRunning():
+            self._stale_loaders.append(previous)
+            previous.finished.connect(lambda: self._stale_loaders.remove(previous))
+        
+        self._index_thread = HistoryIndexThread(self.storage, self._index_token)
+        self._index_thread.index_ready.connect(self._on_index_ready)
+        self._index_thread.index_failed.connect(self._on_index_failed)
+        self._index_thread.start()
+    
+    def _on_index_ready(self, token, reader):
+        """历史索引打开后显示当前时间范围内的新闻"""
+        if token != self._index_token or self.history_list.currentItem() is not None:
+            reader.close()
+            return
+        
+        start, end = self._time_range_bounds()
+        range_text = self.time_range.currentText()
+        lo, hi = reader.range(to_timestamp(start), to_timestamp(end))
+        
+        old_model = self.index_view.model()
+        self.index_view.setModel(HistoryIndexModel(reader, lo, hi, parent=self.index_view))
+        if old_model is not None:
+            old_model.deleteLater()
+        if self._index_reader is not None:
+            self._index_reader.close()
+        self._index_reader = reader
+        self._show_index_view(True)
+        
+        if hi == lo:
+            self.info_label.setText(f"{range_text}没有新闻")
+            return
+        
+        self.info_label.setText(f"{range_text}共 {hi - lo} 条新闻（已去重）")
+        self.status_label.setText(f"已打开{range_text}的 {hi - lo} 条新闻")
+    
+    def _on_index_failed(self, token, error_msg):
+        """处理历史索引打开失败事件"""
+        if token != self._index_token:
+            return
+        
+        self.info_label.setText(f"查询失败: {error_msg}")
+        self.logger.error(f"按时间范围浏览新闻失败: {error_msg}")
+    
+    def _show_index_view(self, visible):
+        """在历史索引列表和新闻列表之间切换"""
+        self.index_view.setVisible(visible)
+        self.news_list.setVisible(not visible)
+    
+    def _on_index_item_selected(self, index):
+        """处理历史索引列表中的新闻选择事件，按需读取完整新闻"""
+        entry = index.data(Qt.UserRole)
+        try:
+            news_items = self.storage.load_entries([entry])
+        except Exception as e:
+            self.status_label.setText(f"读取新闻失败: {str(e)}")
+            return
+        
+        if news_items:
+            self._show_preview(news_items[0])
+    
+    def _search_history(self):
+        """在所有历史新闻中全文搜索（受时间范围限制）"""
+        query = self.search_input.text().strip()
+        if not query:
+            return
+        
+        if self._search_thread is not None and self._search_thread.isRunning():
+            self.status_label.setText("上一次搜索尚未完成，请稍候")
+            return
+        
+        self._stop_page_loader()
+        start, end = self._time_range_bounds()
+        self.status_label.setText(f"正在搜索: {query}")
+        
+        self._search_thread = HistorySearchThread(
+            self.storage, query, start, end, self.SEARCH_LIMIT
+        )
+        self._search_thread.search_complete.connect(self._on_search_complete)
+        self._search_thread.start()
+    
+    def _on_search_complete(self, query, results):
+        """处理全文搜索结果"""
+        self._index_token += 1
+        self._show_index_view(False)
+        self.history_list.setCurrentRow(-1)
+        self.news_list.clear()
+        self.preview.clear()
+        self.query_news = [result['item'] for result in results]
+        
+        if not results:
+            self.info_label.setText(f"没有找到与 '{query}' 相关的历史新闻")
+            self.status_label.setText("搜索完成")
+            return
+        
+        for result in results:
+            news = result['item']
+            title = news.get('title', '无标题').strip()
+            source = news.get('source_name', '未知来源')
+            pub_date = news.get('pub_date', '').strip()
+            
+            list_item = QListWidgetItem(f"{title}\n{source} - {pub_date}\n{result['snippet']}")
+            list_item.setData(Qt.UserRole, news)
+            self.news_list.addItem(list_item)
+        
+        self.info_label.setText(f"搜索 '{query}' 找到 {len(results)} 条历史新闻（按相关度排序）")
+        self.status_label.setText("搜索完成")
+        self.logger.info(f"历史全文搜索 '{query}' 找到 {len(results)} 条结果")
+    
+    def _add_news_items(self, news_items):
+        """将新闻条目添加到新闻列表"""
+        for news in news_items:
+            title = news.get('title', '无标题')
+            source = news.get('source_name', '未知来源')
+            pub_date = news.get('pub_date', '')
+            
+            # 创建列表项
+            list_item = QListWidgetItem(f"{title}\n{source} - {pub_date}")
+            list_item.setData(Qt.UserRole, news)  # 存储完整新闻数据
+            self.news_list.addItem(list_item)
+    
+    def _display_name(self, filename):
+        """生成历史文件的显示名称"""
+        start, _ = snapshot_period(filename)
+        if start is None:
+            return filename
+        if SNAPSHOT_NAME_PATTERN.match(filename):
+            return start.strftime("%Y-%m-%d %H:%M:%S")
+        if DAILY_ARCHIVE_PATTERN.match(filename):
+            return start.strftime("%Y-%m-%d（日归档）")
+        if MONTHLY_ARCHIVE_PATTERN.match(filename):
+            return start.strftime("%Y-%m（月归档）")
+        return filename
+    
+    def refresh_history(self):
+        """刷新历史文件列表和导出文件列表"""
+        self._refresh_history_list()
+        self._refresh_export_combo()
+    
     def _refresh_history_list(self):
         """刷新历史文件列表"""
         self.history_list.clear()
         
         try:
-            # 确保数据目录存在
-            if not os.path.exists(self.news_dir):
-                try:
-                    os.makedirs(self.news_dir, exist_ok=True)
-                except Exception as e:
-                    self.status_label.setText(f"创建目录失败: {str(e)}")
-                    return
-                    
-            # 获取所有JSON文件
+            # 获取所有快照（按时间范围过滤），最新的排在前面
+            start, end = self._time_range_bounds()
             history_files = []
-            for filename in os.listdir(self.news_dir):
-                if filename.endswith('.json'):
-                    history_files.append(filename)
-            
-            # 按时间排序
-            history_files.sort(reverse=True)
+            for filename in self.storage.list_news_files()[::-1]:
+                if start is not None:
+                    period_start, period_end = snapshot_period(filename)
+                    if period_start is None or period_end < start or period_start > end:
+                        continue
+                history_files.append(filename)
             
             if not history_files:
                 self.status_label.setText("没有找到历史新闻文件")
@@ -450,23 +905,9 @@ class HistoryPanel(QWidget):
             
             # 添加到列表，显示更友好的日期格式
             for filename in history_files:
-                try:
-                    # 从文件名提取日期时间（格式：news_YYYYMMDD_HHMMSS.json）
-                    if filename.startswith("news_") and filename.endswith(".json"):
-                        date_str = filename.replace("news_", "").replace(".json", "")
-                        date_time = datetime.strptime(date_str, "%Y%m%d_%H%M%S")
-                        display_text = date_time.strftime("%Y-%m-%d %H:%M:%S")
-                    else:
-                        display_text = filename
-                    
-                    item = QListWidgetItem(display_text)
-                    item.setData(Qt.UserRole, filename)  # 存储实际文件名
-                    self.history_list.addItem(item)
-                except:
-                    # 如果无法解析日期，直接使用文件名
-                    item = QListWidgetItem(filename)
-                    item.setData(Qt.UserRole, filename)
-                    self.history_list.addItem(item)
+                item = QListWidgetItem(self._display_name(filename))
+                item.setData(Qt.UserRole, filename)  # 存储实际文件名
+                self.history_list.addItem(item)
             
             self.status_label.setText(f"共找到 {len(history_files)} 个历史文件")
             self.logger.info(f"刷新历史文件列表，找到 {len(history_files)} 个文件")
@@ -476,54 +917,153 @@ class HistoryPanel(QWidget):
             self.logger.error(f"加载历史文件失败: {str(e)}")
     
     def _on_history_selected(self, item):
-        """处理历史文件选择事件"""
+        """处理历史文件选择事件
+        
+        在后台线程中分页加载文件内容，第一页加载完成即可显示，
+        其余页面在滚动到列表底部时继续加载。
+        """
         # 获取文件名
         filename = item.data(Qt.UserRole)
         
-        # 构建完整文件路径
-        file_path = os.path.join(self.news_dir, filename)
+        # 停止之前的加载任务
+        self._stop_page_loader()
+        
+        # 清空新闻列表和预览
+        self._index_token += 1
+        self._show_index_view(False)
+        self.news_list.clear()
+        self.preview.clear()
+        self.query_news = []
+        
+        self._page_token += 1
+        self._loading_filename = filename
+        self._loaded_count = 0
+        self.info_label.setText(f"正在加载文件 {filename} ...")
+        
+        self._page_loader = SnapshotPageLoader(
+            self.storage, filename, self._page_token, self.PAGE_SIZE
+        )
+        self._page_loader.page_loaded.connect(self._on_page_loaded)
+        self._page_loader.loading_finished.connect(self._on_page_loading_finished)
+        self._page_loader.loading_failed.connect(self._on_page_loading_failed)
+        self._page_loader.start()
+    
+    def _show_snapshot_diff(self):
+        """显示所选快照（未选择时为最新快照）相比前一个快照新增和更新的新闻"""
+        current = self.history_list.currentItem()
+        filename = current.data(Qt.UserRole) if current is not None else self.storage.previous_snapshot()
+        if filename is None:
+            QMessageBox.information(self, "提示", "没有可比较的快照")
+            return
+        
+        previous = self.storage.previous_snapshot(filename)
+        if previous is None:
+            QMessageBox.information(self, "提示", f"{self._display_name(filename)} 之前没有快照")
+            return
         
-        # 加载该文件中的新闻
         try:
-            # 直接从文件读取内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                news_items = json.load(f)
-            
-            # 清空新闻列表和预览
-            self.news_list.clear()
-            self.preview.clear()
-            
-            if not news_items:
-                self.info_label.setText(f"文件 {filename} 中没有新闻")
-                return
-            
-            # 更新信息标签
-            self.info_label.setText(f"文件 {filename} 中包含 {len(news_items)} 条新闻")
-            
-            # 添加新闻到列表
+            diff = self.storage.diff(previous, filename)
+        except Exception as e:
+            self.status_label.setText(f"比较快照失败: {str(e)}")
+            self.logger.error(f"比较快照 {previous} 和 {filename} 失败: {str(e)}")
+            return
+        
+        # 停止分页加载并切换到新闻列表，结果可作为查询结果加载到主界面
+        self._stop_page_loader()
+        self._index_token += 1
+        self._show_index_view(False)
+        self.history_list.setCurrentRow(-1)
+        self.news_list.clear()
+        self.preview.clear()
+        self.query_news = diff['added'] + diff['changed']
+        
+        for label, news_items in (("新增", diff['added']), ("更新", diff['changed'])):
             for news in news_items:
                 title = news.get('title', '无标题')
                 source = news.get('source_name', '未知来源')
                 pub_date = news.get('pub_date', '')
                 
-                # 创建列表项
-                list_item = QListWidgetItem(f"{title}\n{source} - {pub_date}")
-                list_item.setData(Qt.UserRole, news)  # 存储完整新闻数据
+                list_item = QListWidgetItem(f"[{label}] {title}\n{source} - {pub_date}")
+                list_item.setData(Qt.UserRole, news)
                 self.news_list.addItem(list_item)
-            
-            self.status_label.setText(f"已加载 {len(news_items)} 条历史新闻")
-            self.logger.info(f"从文件 {filename} 加载了 {len(news_items)} 条新闻")
-            
-        except Exception as e:
-            self.info_label.setText(f"加载文件失败: {str(e)}")
-            self.status_label.setText("加载失败")
-            self.logger.error(f"加载历史新闻失败: {str(e)}")
+        
+        self.info_label.setText(
+            f"{self._display_name(filename)} 相比 {self._display_name(previous)}："
+            f"新增 {len(diff['added'])} 条，更新 {len(diff['changed'])} 条，"
+            f"移除 {len(diff['removed'])} 条"
+        )
+        self.status_label.setText("快照比较完成")
+    
+    def _stop_page_loader(self):
+        """停止当前的分页加载线程"""
+        if self._page_loader is None:
+            return
+        
+        loader = self._page_loader
+        self._page_loader = None
+        loader.stop()
+        
+        # 保留引用直到线程结束，避免线程对象在运行中被销毁
+        if not loader.isFinished():
+            self._stale_loaders.append(loader)
+            loader.finished.connect(lambda: self._stale_loaders.remove(loader))
+    
+    def _on_page_loaded(self, token, news_items):
+        """处理一页新闻加载完成事件"""
+        if token != self._page_token:
+            return
+        
+        self._add_news_items(news_items)
+        self._loaded_count += len(news_items)
+        
+        self.info_label.setText(
+            f"文件 {self._loading_filename} 已加载 {self._loaded_count} 条新闻（滚动加载更多）"
+        )
+        
+        # 内容不足以出现滚动条时，自动加载下一页
+        if self.news_list.verticalScrollBar().maximum() == 0 and self._page_loader:
+            self._page_loader.request_more()
+    
+    def _on_page_loading_finished(self, token, total):
+        """处理文件全部加载完成事件"""
+        if token != self._page_token:
+            return
+        
+        self._stop_page_loader()
+        
+        if total == 0:
+            self.info_label.setText(f"文件 {self._loading_filename} 中没有新闻")
+            return
+        
+        self.info_label.setText(f"文件 {self._loading_filename} 中包含 {total} 条新闻")
+        self.status_label.setText(f"已加载 {total} 条历史新闻")
+        self.logger.info(f"从文件 {self._loading_filename} 加载了 {total} 条新闻")
+    
+    def _on_page_loading_failed(self, token, error_msg):
+        """处理文件加载失败事件"""
+        if token != self._page_token:
+            return
+        
+        self._stop_page_loader()
+        self.info_label.setText(f"加载文件失败: {error_msg}")
+        self.status_label.setText("加载失败")
+        self.logger.error(f"加载历史新闻失败: {error_msg}")
+    
+    def _on_news_list_scrolled(self, value):
+        """新闻列表滚动到接近底部时加载下一页"""
+        if self._page_loader is None:
+            return
+        
+        scroll_bar = self.news_list.verticalScrollBar()
+        if value >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self._page_loader.request_more()
     
     def _on_news_selected(self, item):
         """处理新闻选择事件"""
-        # 获取新闻数据
-        news_data = item.data(Qt.UserRole)
-        
+        self._show_preview(item.data(Qt.UserRole))
+    
+    def _show_preview(self, news_data):
+        """在预览区显示新闻详情"""
         # 更新预览
         title = news_data.get('title', '无标题')
         source = news_data.get('source_name', '未知来源')
@@ -550,6 +1090,27 @@ class HistoryPanel(QWidget):
     
     def _load_to_main(self):
         """将选中的历史新闻加载到主界面"""
+        # 按时间范围浏览时，加载范围内最新的新闻
+        if self.history_list.currentItem() is None and self.index_view.isVisible():
+            model = self.index_view.model()
+            if model is None or model.rowCount() == 0:
+                QMessageBox.warning(self, "提示", "当前时间范围内没有新闻")
+                return
+            
+            count = min(model.rowCount(), self.RANGE_QUERY_LIMIT)
+            news_items = self.storage.load_entries([model.entry(row) for row in range(count)])
+            self.history_loaded.emit(news_items)
+            self.status_label.setText(f"已将最新的 {len(news_items)} 条新闻加载到主界面")
+            self.logger.info(f"将时间范围内最新的 {len(news_items)} 条新闻加载到主界面")
+            return
+        
+        # 未选择历史文件时，加载全文搜索的结果
+        if self.history_list.currentItem() is None and self.query_news:
+            self.history_loaded.emit(self.query_news)
+            self.status_label.setText(f"已将 {len(self.query_news)} 条新闻加载到主界面")
+            self.logger.info(f"将查询结果中的 {len(self.query_news)} 条新闻加载到主界面")
+            return
+        
         # 检查是否有选中的历史文件
         if self.history_list.currentItem() is None:
             QMessageBox.warning(self, "提示", "请先选择一个历史文件")
@@ -557,7 +1118,6 @@ class HistoryPanel(QWidget):
         
         # 获取文件名
         filename = self.history_list.currentItem().data(Qt.UserRole)
-        file_path = os.path.join(self.news_dir, filename)
         
         # 加载该文件中的新闻
         try:
@@ -565,9 +1125,8 @@ class HistoryPanel(QWidget):
             self.progress_bar.setVisible(True)
             self.progress_bar.setValue(0)
             
-            # 直接从文件读取
-            with open(file_path, 'r', encoding='utf-8') as f:
-                news_items = json.load(f)
+            # 通过存储器读取，刚预览过的文件直接从缓存返回
+            news_items = self.storage.load_news(filename)
             
             # 更新进度
             self.progress_bar.setValue(50)
@@ -599,50 +1158,60 @@ class HistoryPanel(QWidget):
             self.logger.error(f"加载历史新闻到主界面失败: {str(e)}")
     
     def _import_news_file(self):
-        """导入外部新闻文件"""
+        """在后台导入外部新闻文件，与已保存的新闻去重后合并"""
+        if self._import_service is not None:
+            QMessageBox.information(self, "提示", "已有导入任务在进行中")
+            return
+        
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "导入新闻文件", "", "JSON Files (*.json)"
+            self, "导入新闻文件", "",
+            "新闻文件 (*.json *.ndjson *.jsonl);;JSON Files (*.json);;NDJSON Files (*.ndjson *.jsonl)"
         )
         
         if not file_path:
             return
         
-        try:
-            # 读取文件内容
-            with open(file_path, 'r', encoding='utf-8') as f:
-                news_items = json.load(f)
-            
-            if not isinstance(news_items, list):
-                QMessageBox.warning(self, "格式错误", "文件格式不正确，应为新闻条目列表")
-                return
-            
-            # 生成新的文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            new_filename = f"news_{timestamp}.json"
-            new_path = os.path.join(self.news_dir, new_filename)
-            
-            # 确保目录存在
-            os.makedirs(os.path.dirname(new_path), exist_ok=True)
-            
-            # 保存到数据目录
-            with open(new_path, 'w', encoding='utf-8') as f:
-                json.dump(news_items, f, ensure_ascii=False, indent=2)
-            
-            # 刷新列表
-            self._refresh_history_list()
-            self._refresh_export_combo()
-            
-            # 显示成功消息
-            QMessageBox.information(
-                self, "导入成功", 
-                f"成功导入 {len(news_items)} 条新闻\n保存为 {new_filename}"
-            )
-            
-            self.status_label.setText(f"已导入 {len(news_items)} 条新闻")
-            
-        except Exception as e:
-            QMessageBox.critical(self, "导入失败", f"导入新闻文件失败: {str(e)}")
-            self.logger.error(f"导入新闻文件失败: {str(e)}")
+        from news_analyzer.services.background_service import ImportService
+        self._import_service = ImportService(NewsImporter(self.storage), file_path)
+        self._import_service.progress_signal.connect(self._on_import_progress)
+        self._import_service.finished_signal.connect(self._on_import_finished)
+        self._import_service.error_signal.connect(self._on_import_failed)
+        self._import_service.start()
+        
+        self.import_button.setEnabled(False)
+        self.import_status_label.setText("正在导入...")
+        self.logger.info(f"开始导入新闻文件: {file_path}")
+    
+    def _on_import_progress(self, percent, message):
+        """更新导入进度"""
+        self.import_status_label.setText(f"{message} ({percent}%)")
+    
+    def _on_import_finished(self, summary):
+        """处理导入结果"""
+        self._import_service = None
+        self.import_button.setEnabled(True)
+        
+        result = (f"新增 {summary['new']} 条，重复 {summary['duplicate']} 条，"
+                  f"无效 {summary['invalid']} 条")
+        self.import_status_label.setText(result)
+        self.status_label.setText(f"已导入 {summary['new']} 条新闻")
+        
+        if summary['filename']:
+            self.refresh_history()
+            result += f"\n保存为 {summary['filename']}"
+        
+        if summary['error']:
+            QMessageBox.warning(self, "导入未完成", f"{summary['error']}\n\n已处理部分: {result}")
+        else:
+            QMessageBox.information(self, "导入成功", result)
+    
+    def _on_import_failed(self, error_msg):
+        """处理导入失败"""
+        self._import_service = None
+        self.import_button.setEnabled(True)
+        self.import_status_label.setText("导入失败")
+        QMessageBox.critical(self, "导入失败", f"导入新闻文件失败: {error_msg}")
+        self.logger.error(f"导入新闻文件失败: {error_msg}")
     
     def _export_selected_file(self):
         """导出当前选中的文件"""
@@ -660,9 +1229,6 @@ class HistoryPanel(QWidget):
         filename = self.export_combo.itemData(selected_index)
         display_name = self.export_combo.currentText()
         
-        # 构建完整文件路径
-        file_path = os.path.join(self.news_dir, filename)
-        
         # 选择保存路径
         export_path, _ = QFileDialog.getSaveFileName(
             self, "导出新闻", filename, "JSON Files (*.json)"
@@ -672,10 +1238,8 @@ class HistoryPanel(QWidget):
             return
         
         try:
-            # 直接复制文件
-            with open(file_path, 'r', encoding='utf-8') as src_file:
-                news_items = json.load(src_file)
-                
+            news_items = self.storage.load_news(filename)
+            
             with open(export_path, 'w', encoding='utf-8') as dst_file:
                 json.dump(news_items, dst_file, ensure_ascii=False, indent=2)
             
@@ -690,4 +1254,73 @@ class HistoryPanel(QWidget):
         except Exception as e:
             QMessageBox.critical(self, "导出失败", f"导出新闻失败: {str(e)}")
             self.status_label.setText("导出失败")
-            self.logger.error(f"导出新闻失败: {str(e)}")
\ No newline at end of file
+            self.logger.error(f"导出新闻失败: {str(e)}")
+    
+    def _export_filtered(self):
+        """在后台按条件导出新闻"""
+        if self._export_service is not None:
+            QMessageBox.information(self, "提示", "已有导出任务在进行中")
+            return
+        
+        fmt = self.export_format_combo.currentData()
+        default_name = f"news_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+        file_filter = "CSV Files (*.csv)" if fmt == 'csv' else "NDJSON Files (*.ndjson *.jsonl)"
+        export_path, _ = QFileDialog.getSaveFileName(self, "导出新闻", default_name, file_filter)
+        if not export_path:
+            return
+        
+        days = {"最近7天": 7, "最近30天": 30, "最近90天": 90, "最近一年": 365}.get(
+            self.export_range_combo.currentText()
+        )
+        start = datetime.now() - timedelta(days=days) if days else None
+        
+        from news_analyzer.services.background_service import ExportService
+        self._export_service = ExportService(
+            NewsExporter(self.storage), export_path, fmt,
+            start=start,
+            source=self.export_source_input.text().strip() or None,
+            category=self.export_category_input.text().strip() or None,
+            query=self.export_query_input.text().strip() or None
+        )
+        self._export_service.progress_signal.connect(self._on_export_progress)
+        self._export_service.finished_signal.connect(self._on_export_finished)
+        self._export_service.error_signal.connect(self._on_export_failed)
+        self._export_service.start()
+        
+        self.filter_export_button.setEnabled(False)
+        self.export_status_label.setText("正在导出...")
+        self.logger.info(f"开始按条件导出新闻到 {export_path}")
+    
+    def _on_export_progress(self, percent, message):
+        """更新导出进度"""
+        self.export_status_label.setText(f"{message} ({percent}%)")
+    
+    def _on_export_finished(self, summary):
+        """处理导出结果"""
+        self._export_service = None
+        self.filter_export_button.setEnabled(True)
+        
+        if summary['cancelled']:
+            self.export_status_label.setText("导出已取消")
+            return
+        
+        self.export_status_label.setText(f"已导出 {summary['exported']} 条新闻")
+        self.status_label.setText(f"已导出 {summary['exported']} 条新闻")
+        QMessageBox.information(
+            self, "导出成功",
+            f"成功导出 {summary['exported']} 条新闻到:\n{summary['path']}"
+        )
+    
+    def _on_export_failed(self, error_msg):
+        """处理导出失败"""
+        self._export_service = None
+        self.filter_export_button.setEnabled(True)
+        self.export_status_label.setText("导出失败")
+        QMessageBox.critical(self, "导出失败", f"导出新闻失败: {error_msg}")
+        self.logger.error(f"按条件导出新闻失败: {error_msg}")
+    
+    def background_threads(self):
+        """获取仍在运行的后台线程，退出程序时由主窗口停止并等待其结束"""
+        threads = [self._search_thread, self._index_thread, self._page_loader,
+                   self._import_service, self._export_service] + self._stale_loaders
+        return [thread for thread in threads if thread is not None and thread.isRunning()]
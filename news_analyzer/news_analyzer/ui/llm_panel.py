@@ -4,12 +4,15 @@ LLM分析面板
 显示新闻的LLM分析结果，提供分析控制功能。
 """
 
+import os
 import logging
-from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QComboBox, 
+from html import escape
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QComboBox, QCheckBox,
                             QPushButton, QLabel, QTextBrowser, QProgressBar)
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
 from news_analyzer.llm.llm_client import LLMClient
+from news_analyzer.llm.digest import GROUP_BY_CATEGORY, GROUP_BY_STORY
 
 
 class AnalysisThread(QThread):
@@ -19,16 +22,19 @@ class AnalysisThread(QThread):
     analysis_complete = pyqtSignal(str)
     analysis_error = pyqtSignal(str)
     
-    def __init__(self, llm_client, news_item, analysis_type):
+    def __init__(self, llm_client, news_item, analysis_type, use_cache=True):
         super().__init__()
         self.llm_client = llm_client
         self.news_item = news_item
         self.analysis_type = analysis_type
+        self.use_cache = use_cache
     
     def run(self):
         """运行线程"""
         try:
-            result = self.llm_client.analyze_news(self.news_item, self.analysis_type)
+            result = self.llm_client.analyze_news(
+                self.news_item, self.analysis_type, use_cache=self.use_cache
+            )
             self.analysis_complete.emit(result)
         except Exception as e:
             self.analysis_error.emit(str(e))
@@ -37,6 +43,9 @@ class AnalysisThread(QThread):
 class LLMPanel(QWidget):
     """LLM分析面板组件"""
     
+    # 批量分析时同时进行的请求数
+    BATCH_CONCURRENCY = 4
+    
     def __init__(self, parent=None):
         super().__init__(parent)
         
@@ -44,6 +53,14 @@ class LLMPanel(QWidget):
         self.llm_client = LLMClient()
         self.current_news = None
         
+        # 当前新闻列表（分类筛选或搜索结果），供批量分析使用
+        self.batch_news = []
+        self._batch_service = None
+        self._digest_service = None
+        
+        # 增量简报的状态目录，由主窗口设置；未设置时每次生成完整简报
+        self.digest_state_dir = None
+        
         self._init_ui()
     
     def _init_ui(self):
@@ -74,8 +91,37 @@ class LLMPanel(QWidget):
         self.analyze_button.setEnabled(False)  # 初始禁用
         control_layout.addWidget(self.analyze_button)
         
+        # 批量分析按钮：分析当前新闻列表中的全部新闻
+        self.batch_button = QPushButton("批量分析")
+        self.batch_button.setToolTip("分析当前分类或搜索结果中的全部新闻")
+        self.batch_button.clicked.connect(self._on_batch_clicked)
+        self.batch_button.setEnabled(False)
+        control_layout.addWidget(self.batch_button)
+        
         layout.addLayout(control_layout)
         
+        # 简报：将当前新闻列表分组摘要后合并为一份简报
+        digest_layout = QHBoxLayout()
+        self.digest_group = QComboBox()
+        self.digest_group.addItem("按分类", GROUP_BY_CATEGORY)
+        self.digest_group.addItem("按事件", GROUP_BY_STORY)
+        digest_layout.addWidget(QLabel("简报分组:"))
+        digest_layout.addWidget(self.digest_group)
+        
+        self.digest_rolling = QCheckBox("增量更新")
+        self.digest_rolling.setToolTip("沿用上一次的分组摘要，只把新增或变化的新闻交给模型")
+        self.digest_rolling.setChecked(True)
+        digest_layout.addWidget(self.digest_rolling)
+        
+        self.digest_button = QPushButton("生成简报")
+        self.digest_button.setToolTip("将当前分类或搜索结果中的全部新闻整理为一份简报")
+        self.digest_button.clicked.connect(self._on_digest_clicked)
+        self.digest_button.setEnabled(False)
+        digest_layout.addWidget(self.digest_button)
+        digest_layout.addStretch()
+        
+        layout.addLayout(digest_layout)
+        
         # 进度条
         self.progress_bar = QProgressBar()
         self.progress_bar.setVisible(False)
@@ -111,6 +157,166 @@ class LLMPanel(QWidget):
         
         self.logger.debug(f"准备分析新闻: {title}...")
     
+    def set_batch_news(self, news_items):
+        """设置批量分析的新闻列表
+        
+        Args:
+            news_items: 当前新闻列表中的新闻条目
+        """
+        self.batch_news = list(news_items)
+        if self._batch_service is None and self._digest_service is None:
+            self.batch_button.setText(f"批量分析 ({len(self.batch_news)})")
+            self.batch_button.setEnabled(bool(self.batch_news))
+            self.digest_button.setEnabled(bool(self.batch_news))
+    
+    def _on_batch_clicked(self):
+        """开始批量分析，分析进行中时停止"""
+        if self._batch_service is not None:
+            self._batch_service.stop()
+            self.batch_button.setEnabled(False)
+            self.status_label.setText("正在停止批量分析...")
+            return
+        
+        if not self.batch_news:
+            return
+        
+        from news_analyzer.services.background_service import BatchAnalysisService
+        
+        analysis_type = self.analysis_type.currentText()
+        self.result_browser.clear()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.analyze_button.setEnabled(False)
+        self.digest_button.setEnabled(False)
+        self.batch_button.setText("停止")
+        self.status_label.setText(f"正在批量{analysis_type}分析 {len(self.batch_news)} 条新闻...")
+        
+        self._batch_service = BatchAnalysisService(
+            self.llm_client, self.batch_news, analysis_type, self.BATCH_CONCURRENCY
+        )
+        self._batch_service.result_signal.connect(self._on_batch_result)
+        self._batch_service.progress_signal.connect(self._on_batch_progress)
+        self._batch_service.finished_signal.connect(self._on_batch_finished)
+        self._batch_service.error_signal.connect(self._on_batch_failed)
+        self._batch_service.start()
+        
+        self.logger.info(f"开始批量{analysis_type}分析: {len(self.batch_news)} 条新闻")
+    
+    def _on_batch_result(self, result):
+        """显示批量分析中完成的一条结果"""
+        title = escape(result['item'].get('title', '无标题'))
+        if result['error']:
+            if result['error'] == '已取消':
+                return
+            body = f"<p style='color: #d32f2f;'>分析失败: {escape(result['error'])}</p>"
+        else:
+            body = result['result']
+        
+        self.result_browser.append(f"<h3>{result['index'] + 1}. {title}</h3>{body}<hr>")
+    
+    def _on_batch_progress(self, percent, message):
+        """更新批量分析进度"""
+        self.progress_bar.setValue(percent)
+        self.status_label.setText(message)
+    
+    def _on_batch_finished(self, results):
+        """处理批量分析完成事件"""
+        succeeded = sum(1 for result in results if not result['error'])
+        cached = sum(1 for result in results if result['cached'])
+        cancelled = sum(1 for result in results if result['error'] == '已取消')
+        failed = len(results) - succeeded - cancelled
+        
+        text = f"批量分析完成: 成功 {succeeded} 条（缓存 {cached} 条），失败 {failed} 条"
+        if cancelled:
+            text += f"，取消 {cancelled} 条"
+        self._reset_batch_ui(text)
+        self.logger.info(text)
+    
+    def _on_batch_failed(self, error_msg):
+        """处理批量分析失败事件"""
+        self._reset_batch_ui(f"批量分析失败: {error_msg}")
+        self.logger.error(f"批量分析失败: {error_msg}")
+    
+    def _reset_batch_ui(self, status_text):
+        """批量分析结束后恢复界面状态"""
+        self._batch_service = None
+        self.progress_bar.setVisible(False)
+        self.analyze_button.setEnabled(self.current_news is not None)
+        self.status_label.setText(status_text)
+        self.set_batch_news(self.batch_news)
+    
+    def _on_digest_clicked(self):
+        """开始生成简报，生成进行中时停止"""
+        if self._digest_service is not None:
+            self._digest_service.stop()
+            self.digest_button.setEnabled(False)
+            self.status_label.setText("正在停止生成简报...")
+            return
+        
+        if not self.batch_news:
+            return
+        
+        from news_analyzer.llm.digest import DigestBuilder, RollingDigestBuilder
+        from news_analyzer.services.background_service import DigestService
+        
+        group_by = self.digest_group.currentData()
+        if self.digest_rolling.isChecked() and self.digest_state_dir:
+            builder = RollingDigestBuilder(
+                self.llm_client,
+                os.path.join(self.digest_state_dir, f"rolling_{group_by}.json"),
+                group_by=group_by,
+                concurrency=self.BATCH_CONCURRENCY
+            )
+        else:
+            builder = DigestBuilder(self.llm_client, group_by=group_by, concurrency=self.BATCH_CONCURRENCY)
+        
+        self.result_browser.clear()
+        self.progress_bar.setRange(0, 100)
+        self.progress_bar.setValue(0)
+        self.progress_bar.setVisible(True)
+        self.analyze_button.setEnabled(False)
+        self.batch_button.setEnabled(False)
+        self.digest_button.setText("停止")
+        self.status_label.setText(f"正在为 {len(self.batch_news)} 条新闻生成简报...")
+        
+        self._digest_service = DigestService(builder, self.batch_news)
+        self._digest_service.progress_signal.connect(self._on_batch_progress)
+        self._digest_service.finished_signal.connect(self._on_digest_finished)
+        self._digest_service.error_signal.connect(self._on_digest_failed)
+        self._digest_service.start()
+        
+        self.logger.info(f"开始生成简报: {len(self.batch_news)} 条新闻")
+    
+    def _on_digest_finished(self, digest):
+        """处理简报生成完成事件"""
+        if digest['cancelled']:
+            self._reset_digest_ui("已停止生成简报")
+            return
+        
+        self.result_browser.setHtml(digest['html'])
+        text = f"简报生成完成: {len(digest['groups'])} 个分组，调用模型 {digest['calls']} 次"
+        if 'new_items' in digest:
+            text += f"，新增或变化 {digest['new_items']} 条，更新 {digest['updated_groups']} 个分组"
+        else:
+            text += f"，复用缓存 {digest['cache_hits']} 次"
+        self._reset_digest_ui(text)
+    
+    def _on_digest_failed(self, error_msg):
+        """处理简报生成失败事件"""
+        self.result_browser.setHtml(f"<h2>生成简报失败</h2><p>{escape(error_msg)}</p>")
+        self._reset_digest_ui(f"生成简报失败: {error_msg}")
+        self.logger.error(f"生成简报失败: {error_msg}")
+    
+    def _reset_digest_ui(self, status_text):
+        """简报生成结束后恢复界面状态"""
+        self._digest_service = None
+        self.digest_button.setText("生成简报")
+        self.progress_bar.setVisible(False)
+        self.analyze_button.setEnabled(self.current_news is not None)
+        self.status_label.setText(status_text)
+        self.set_batch_news(self.batch_news)
+    
     def _on_analyze_clicked(self):
         """处理分析按钮点击事件"""
         if not self.current_news:
@@ -120,6 +326,14 @@ class LLMPanel(QWidget):
         # 获取分析类型
         analysis_type = self.analysis_type.currentText()
         
+        # 已有缓存结果时直接显示，无需启动分析线程
+        cached = self.llm_client.get_cached_analysis(self.current_news, analysis_type)
+        if cached is not None:
+            self.result_browser.setHtml(cached)
+            self.status_label.setText(f"分析完成（缓存结果）{self._cache_stats_text()}")
+            self.logger.info(f"使用缓存的{analysis_type}分析: {self.current_news.get('title', '')[:30]}...")
+            return
+        
         # 显示消息和进度条
         self.status_label.setText(f"正在进行{analysis_type}分析...")
         self.progress_bar.setVisible(True)
@@ -128,11 +342,12 @@ class LLMPanel(QWidget):
         # 禁用分析按钮
         self.analyze_button.setEnabled(False)
         
-        # 创建并启动分析线程
+        # 创建并启动分析线程（上面已查过缓存，线程中不再重复查询，避免重复计入未命中）
         self.analysis_thread = AnalysisThread(
             self.llm_client, 
             self.current_news, 
-            analysis_type
+            analysis_type,
+            use_cache=False
         )
         self.analysis_thread.analysis_complete.connect(self._on_analysis_complete)
         self.analysis_thread.analysis_error.connect(self._on_analysis_error)
@@ -153,13 +368,20 @@ class LLMPanel(QWidget):
         self.result_browser.setHtml(result)
         
         # 更新状态
-        self.status_label.setText("分析完成")
+        self.status_label.setText(f"分析完成{self._cache_stats_text()}")
         
         # 启用分析按钮
         self.analyze_button.setEnabled(True)
         
         self.logger.info(f"完成了新闻分析: {self.current_news.get('title', '')[:30]}...")
     
+    def _cache_stats_text(self):
+        """生成缓存命中统计文本"""
+        stats = self.llm_client.get_cache_stats()
+        if not stats:
+            return ""
+        return f" | 缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次"
+    
     def _on_analysis_error(self, error_msg):
         """处理分析错误事件
         
@@ -179,3 +401,8 @@ class LLMPanel(QWidget):
         self.analyze_button.setEnabled(True)
         
         self.logger.error(f"新闻分析失败: {error_msg}")
+    
+    def background_threads(self):
+        """获取仍在运行的后台线程，退出程序时由主窗口停止并等待其结束"""
+        threads = [getattr(self, 'analysis_thread', None), self._batch_service, self._digest_service]
+        return [thread for thread in threads if thread is not None and thread.isRunning()]
@@ -346,6 +346,7 @@ class LLMSettingsDialog(QDialog):
             # 创建临时客户端进行测试
             client = LLMClient(api_key=api_key, api_url=api_url, model=model_name)
             result = client.test_connection()
+            client.close()
             
             self.test_button.setEnabled(True)
             self.test_button.setText("测试连接")
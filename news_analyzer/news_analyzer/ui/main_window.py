@@ -8,6 +8,7 @@
 """
 
 import os
+import time
 import logging
 import threading
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
@@ -23,8 +24,13 @@ from news_analyzer.ui.search_panel import SearchPanel
 from news_analyzer.ui.llm_panel import LLMPanel
 from news_analyzer.ui.chat_panel import ChatPanel
 from news_analyzer.ui.llm_settings import LLMSettingsDialog
+from news_analyzer.ui.stats_dialog import StatsDialog
 from news_analyzer.collectors.rss_collector import RSSCollector
 from news_analyzer.llm.llm_client import LLMClient
+from news_analyzer.llm.analysis_cache import AnalysisCache
+from news_analyzer.storage.async_writer import AsyncNewsWriter
+from news_analyzer.storage.compactor import SnapshotCompactor
+from news_analyzer.storage.journal import RefreshJournal
 
 
 class AddSourceDialog(QDialog):
@@ -84,12 +90,27 @@ class MainWindow(QMainWindow):
         self.logger = logging.getLogger('news_analyzer.ui.main_window')
         self.storage = storage
         
+        # 后台写入器，刷新结果在后台线程中保存
+        self.news_writer = AsyncNewsWriter(self.storage)
+        self.news_writer.start()
+        
+        # 刷新预写日志，恢复上次异常退出前未保存的刷新结果
+        self.refresh_journal = RefreshJournal(os.path.join(self.storage.data_dir, "journal"))
+        recovered = self.refresh_journal.replay(self.storage)
+        if recovered:
+            self.logger.info(f"恢复了上次未保存的 {recovered} 条新闻")
+        
         # 使用传入的RSS收集器或创建新的
         self.rss_collector = rss_collector or RSSCollector()
         
         # 后台服务相关属性
         self.refresh_in_progress = False
         self.rss_service = None
+        self.compaction_service = None
+        self.retrieval_service = None
+        
+        # 本次会话上次提交保存的刷新结果 {去重键: 内容哈希}，下次刷新时据此标记新出现的新闻
+        self._refresh_baseline = None
         
         # 设置窗口属性
         self.setWindowTitle("新闻聚合与分析系统")
@@ -98,8 +119,11 @@ class MainWindow(QMainWindow):
         # 加载语言模型设置到环境变量
         self._load_llm_settings()
         
+        # 分析结果缓存，保存在数据目录的analysis子目录中
+        self.analysis_cache = AnalysisCache(os.path.join(self.storage.data_dir, "analysis"))
+        
         # 创建共享的LLM客户端实例
-        self.llm_client = LLMClient()
+        self.llm_client = LLMClient(analysis_cache=self.analysis_cache)
         
         # 初始化UI组件
         self._init_ui()
@@ -113,6 +137,12 @@ class MainWindow(QMainWindow):
         # 更新状态栏显示模型状态
         self._update_status_message()
         
+        # 启动后稍后在后台整理历史数据
+        QTimer.singleShot(10000, lambda: self.compact_history(silent=True))
+        
+        # 在后台为历史新闻建立聊天检索索引
+        QTimer.singleShot(3000, self.index_history)
+        
         self.logger.info("主窗口已初始化")
     
     def _load_llm_settings(self):
@@ -123,6 +153,8 @@ class MainWindow(QMainWindow):
         api_key = settings.value("llm/api_key", "")
         api_url = settings.value("llm/api_url", "")
         model_name = settings.value("llm/model_name", "")
+        timeout = settings.value("llm/timeout", "")
+        retry_count = settings.value("llm/retry_count", "")
         
         # 设置环境变量
         if api_key:
@@ -131,6 +163,10 @@ class MainWindow(QMainWindow):
             os.environ["LLM_API_URL"] = api_url
         if model_name:
             os.environ["LLM_MODEL"] = model_name
+        if timeout:
+            os.environ["LLM_TIMEOUT"] = str(timeout)
+        if retry_count:
+            os.environ["LLM_RETRY_COUNT"] = str(retry_count)
     
     def _update_status_message(self):
         """更新状态栏显示模型信息"""
@@ -206,6 +242,7 @@ class MainWindow(QMainWindow):
         # 创建LLM分析面板 - 使用共享LLM客户端
         self.llm_panel = LLMPanel()
         self.llm_panel.llm_client = self.llm_client
+        self.llm_panel.digest_state_dir = os.path.join(self.storage.data_dir, "digest")
         
         # 添加标签页，默认显示聊天标签
         self.right_panel.addTab(self.chat_panel, "聊天")
@@ -232,6 +269,9 @@ class MainWindow(QMainWindow):
         # 添加新的连接 - 新闻列表更新时更新聊天面板的可用新闻标题
         self.news_list.news_updated.connect(self._update_chat_panel_news)
         
+        # 新闻列表更新时更新分析面板的批量分析范围（当前分类或搜索结果）
+        self.news_list.news_updated.connect(self.llm_panel.set_batch_news)
+        
         # 创建菜单、工具栏和状态栏
         self._create_actions()
         self._create_menus()
@@ -290,6 +330,16 @@ class MainWindow(QMainWindow):
         self.llm_settings_action.setStatusTip("配置语言模型API设置")
         self.llm_settings_action.triggered.connect(self._show_llm_settings)
         
+        # 整理历史数据
+        self.compact_action = QAction("整理历史数据", self)
+        self.compact_action.setStatusTip("合并旧的新闻快照并清理过期数据")
+        self.compact_action.triggered.connect(lambda: self.compact_history())
+        
+        # 新闻统计
+        self.stats_action = QAction("新闻统计", self)
+        self.stats_action.setStatusTip("查看按来源、分类和时间统计的新闻数量及抓取耗时")
+        self.stats_action.triggered.connect(self.show_stats)
+        
         # 退出
         self.exit_action = QAction("退出", self)
         self.exit_action.setStatusTip("退出应用程序")
@@ -313,6 +363,9 @@ class MainWindow(QMainWindow):
         tools_menu = self.menuBar().addMenu("工具")
         tools_menu.addAction(self.settings_action)
         tools_menu.addAction(self.llm_settings_action)
+        tools_menu.addSeparator()
+        tools_menu.addAction(self.compact_action)
+        tools_menu.addAction(self.stats_action)
         
         # 帮助菜单
         help_menu = self.menuBar().addMenu("帮助")
@@ -436,7 +489,10 @@ class MainWindow(QMainWindow):
         
         # 初始化后台服务
         from news_analyzer.services.background_service import RSSFetchService
-        self.rss_service = RSSFetchService(self.rss_collector)
+        self.rss_service = RSSFetchService(
+            self.rss_collector, self.storage.stats, self.refresh_journal,
+            storage=self.storage, baseline=self._refresh_baseline
+        )
         self.rss_service.progress_signal.connect(self._update_progress)
         self.rss_service.finished_signal.connect(self._handle_rss_results)
         self.rss_service.error_signal.connect(self._show_error)
@@ -462,14 +518,22 @@ class MainWindow(QMainWindow):
             # 更新RSS收集器缓存
             self.rss_collector.news_cache = news_items
             
-            # 更新新闻列表
-            self.news_list.update_news(news_items)
+            # 更新新闻列表，高亮上次刷新之后新出现的新闻（已在后台线程中比较）
+            self.news_list.update_news(news_items, self.rss_service.fresh_keys)
             
             # 更新聊天面板的可用新闻
             self.chat_panel.set_available_news_titles(news_items)
             
-            # 保存到存储
-            self.storage.save_news(news_items)
+            # 提交到后台写入器保存，队列已满时退回同步保存；保存成功后删除对应的日志段
+            segment = self.rss_service.journal_segment
+            
+            def committed(filepath):
+                if filepath:
+                    self.refresh_journal.discard(segment)
+            
+            if not self.news_writer.submit(news_items, callback=committed):
+                committed(self.storage.save_news(news_items))
+            self._refresh_baseline = self.rss_service.item_hashes
             
             # 同步分类到侧边栏
             self._sync_categories()
@@ -492,6 +556,87 @@ class MainWindow(QMainWindow):
         self.refresh_action.setEnabled(True)
         self.rss_service = None
     
+    def compact_history(self, silent=False):
+        """在后台整理历史新闻数据
+        
+        Args:
+            silent: 为True时不弹出提示框（用于启动时自动整理）
+        """
+        if self.compaction_service is not None:
+            if not silent:
+                QMessageBox.information(self, "提示", "历史数据整理正在进行中")
+            return
+        
+        # 保留策略：0表示不限制
+        settings = QSettings("NewsAnalyzer", "NewsAggregator")
+        retention_days = int(settings.value("storage/retention_days", 0) or 0)
+        max_total_mb = int(settings.value("storage/max_total_mb", 0) or 0)
+        
+        compactor = SnapshotCompactor(
+            self.storage,
+            max_age_days=retention_days or None,
+            max_total_bytes=max_total_mb * 1024 * 1024 if max_total_mb else None
+        )
+        
+        from news_analyzer.services.background_service import CompactionService
+        self.compaction_service = CompactionService(compactor)
+        self.compaction_service.progress_signal.connect(self._update_compaction_progress)
+        self.compaction_service.finished_signal.connect(self._handle_compaction_results)
+        self.compaction_service.error_signal.connect(self._handle_compaction_error)
+        self.compaction_service.start()
+        
+        self.compact_action.setEnabled(False)
+        self.logger.info("启动历史数据整理任务")
+    
+    def _update_compaction_progress(self, percent, message):
+        """更新整理进度"""
+        if not self.refresh_in_progress:
+            self.status_label.setText(f"整理历史数据: {message} ({percent}%)")
+    
+    def _handle_compaction_results(self, summary):
+        """处理整理结果"""
+        self.compaction_service = None
+        self.compact_action.setEnabled(True)
+        
+        self.status_label.setText(
+            f"历史数据整理完成: 合并 {summary['merged_files']} 个文件，"
+            f"删除 {summary['deleted_files']} 个过期文件"
+        )
+        
+        if hasattr(self, 'history_panel'):
+            self.history_panel.refresh_history()
+        
+        # 合并后的快照文件需要重新登记到检索索引（内容未变的新闻不会重复分词）
+        self.index_history()
+    
+    def _handle_compaction_error(self, error_msg):
+        """处理整理失败"""
+        self.compaction_service = None
+        self.compact_action.setEnabled(True)
+        self.status_label.setText("历史数据整理失败")
+        self.logger.error(f"历史数据整理失败: {error_msg}")
+    
+    def index_history(self):
+        """在后台为历史新闻快照建立聊天检索索引"""
+        if self.retrieval_service is not None:
+            return
+        
+        from news_analyzer.services.background_service import RetrievalIndexService
+        self.retrieval_service = RetrievalIndexService(self.chat_panel.retrieval_index, self.storage)
+        self.retrieval_service.finished_signal.connect(self._handle_index_results)
+        self.retrieval_service.error_signal.connect(self._handle_index_error)
+        self.retrieval_service.start()
+    
+    def _handle_index_results(self, added):
+        """处理检索索引结果"""
+        self.retrieval_service = None
+        self.logger.info(f"聊天检索索引已更新: 新增 {added} 条，共 {len(self.chat_panel.retrieval_index)} 条新闻")
+    
+    def _handle_index_error(self, error_msg):
+        """处理检索索引失败"""
+        self.retrieval_service = None
+        self.logger.error(f"建立聊天检索索引失败: {error_msg}")
+    
     def search_news(self, query):
         """搜索新闻
         
@@ -574,18 +719,27 @@ class MainWindow(QMainWindow):
             # 重新加载设置到环境变量
             self._load_llm_settings()
             
-            # 创建新的LLM客户端
-            self.llm_client = LLMClient()
+            # 创建新的LLM客户端（沿用原有的分析缓存）
+            old_client = self.llm_client
+            self.llm_client = LLMClient(analysis_cache=self.analysis_cache)
             
             # 更新各面板的LLM客户端引用
             self.llm_panel.llm_client = self.llm_client
             self.chat_panel.llm_client = self.llm_client
             
+            # 关闭旧客户端的连接池（进行中的请求结束后才真正关闭）
+            old_client.close()
+            
             # 更新状态栏
             self._update_status_message()
             
             self.logger.info("语言模型设置已更新")
     
+    def show_stats(self):
+        """显示新闻统计对话框"""
+        dialog = StatsDialog(self.storage.stats, self)
+        dialog.exec_()
+    
     def show_about(self):
         """显示关于对话框"""
         QMessageBox.about(self, "关于", 
@@ -593,6 +747,36 @@ class MainWindow(QMainWindow):
                           "一个集成了LLM功能的新闻聚合工具，\n"
                           "支持搜索、分类、智能分析和聊天交互。")
     
+    def _stop_background_tasks(self, timeout=30):
+        """请求所有后台线程停止，并等待它们结束
+        
+        先通知全部线程停止再逐个等待，各线程的收尾工作可以同时进行。
+        
+        Args:
+            timeout: 等待所有线程结束的总时间（秒）
+            
+        Returns:
+            bool: 是否所有线程都已结束
+        """
+        threads = [self.rss_service, self.compaction_service, self.retrieval_service]
+        threads.extend(self.llm_panel.background_threads())
+        if hasattr(self, 'history_panel'):
+            threads.extend(self.history_panel.background_threads())
+        threads = [thread for thread in threads if thread is not None and thread.isRunning()]
+        
+        for thread in threads:
+            if hasattr(thread, 'stop'):
+                thread.stop()
+        
+        deadline = time.monotonic() + timeout
+        finished = True
+        for thread in threads:
+            remaining = max(0, int((deadline - time.monotonic()) * 1000))
+            if not thread.wait(remaining):
+                self.logger.warning(f"后台任务未能在退出前结束: {type(thread).__name__}")
+                finished = False
+        return finished
+    
     def closeEvent(self, event):
         """窗口关闭事件处理"""
         # 保存设置
@@ -605,6 +789,17 @@ class MainWindow(QMainWindow):
                                      QMessageBox.No)
         
         if reply == QMessageBox.Yes:
+            # 等待后台写入器保存完剩余的数据
+            self.status_label.setText("正在保存数据...")
+            
+            # 停止整理、检索索引和批量分析等后台任务，避免线程在程序退出时仍在写入
+            self._stop_background_tasks()
+            
+            if not self.news_writer.close(timeout=30):
+                self.logger.warning("退出时部分新闻数据未能保存")
+            
+            self.llm_client.close()
+            
             self.logger.info("应用程序关闭")
             event.accept()
         else:
@@ -9,20 +9,27 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QListWidget,
                             QListWidgetItem, QLabel, QTextBrowser, 
                             QSplitter, QHBoxLayout)
 from PyQt5.QtCore import pyqtSignal, Qt
-from PyQt5.QtGui import QFont
+from PyQt5.QtGui import QFont, QColor
+
+from news_analyzer.storage.item_utils import item_key
 
 
 class NewsItem(QListWidgetItem):
     """自定义新闻列表项类"""
     
-    def __init__(self, news_data):
+    # 新出现的新闻的背景色
+    FRESH_COLOR = QColor("#E8F5E9")
+    
+    def __init__(self, news_data, fresh=False):
         """初始化新闻列表项
         
         Args:
             news_data: 新闻数据字典
+            fresh: 是否为上次刷新之后新出现的新闻
         """
         super().__init__()
         self.news_data = news_data
+        self.fresh = fresh
         
         # 设置显示文本
         title = news_data.get('title', '无标题')
@@ -30,12 +37,18 @@ class NewsItem(QListWidgetItem):
         date = news_data.get('pub_date', '')
         
         display_text = f"{title}\n[{source}] {date}"
+        if fresh:
+            display_text = f"[新] {display_text}"
         self.setText(display_text)
         
         # 设置字体
         font = QFont()
         font.setBold(True)
         self.setFont(font)
+        
+        # 高亮新出现的新闻
+        if fresh:
+            self.setBackground(self.FRESH_COLOR)
 
 
 class NewsListPanel(QWidget):
@@ -87,11 +100,12 @@ class NewsListPanel(QWidget):
         self.status_label = QLabel("加载新闻...")
         layout.addWidget(self.status_label)
     
-    def update_news(self, news_items):
+    def update_news(self, news_items, fresh_keys=None):
         """更新新闻列表
         
         Args:
             news_items: 新闻条目列表
+            fresh_keys: 需要高亮的新出现新闻的去重键集合（可选）
         """
         # 清空当前列表
         self.news_list.clear()
@@ -100,13 +114,19 @@ class NewsListPanel(QWidget):
         self.current_news = news_items
         
         # 添加新闻项到列表
+        fresh_count = 0
         for news in news_items:
-            item = NewsItem(news)
+            fresh = bool(fresh_keys) and item_key(news) in fresh_keys
+            fresh_count += fresh
+            item = NewsItem(news, fresh)
             self.news_list.addItem(item)
         
         # 更新状态标签
         count = len(news_items)
-        self.status_label.setText(f"共 {count} 条新闻")
+        if fresh_keys is not None:
+            self.status_label.setText(f"共 {count} 条新闻，其中 {fresh_count} 条为新出现")
+        else:
+            self.status_label.setText(f"共 {count} 条新闻")
         
         # 清空预览
         self.preview.setHtml("")
@@ -0,0 +1,153 @@
+"""
+新闻统计对话框
+
+展示按来源、分类、日期、小时聚合的新闻数量和各新闻源的抓取耗时，
+数据直接读取增量维护的统计聚合，不需要重新扫描历史快照。
+"""
+
+import csv
+import logging
+from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel,
+                            QPushButton, QTabWidget, QTableWidget,
+                            QTableWidgetItem, QHeaderView, QFileDialog,
+                            QMessageBox)
+from PyQt5.QtCore import Qt
+
+
+class StatsDialog(QDialog):
+    """新闻统计对话框"""
+
+    COUNT_HEADERS = ["条目数", "新条目", "重复条目"]
+    FETCH_HEADERS = ["新闻源", "抓取次数", "失败次数", "条目数",
+                     "平均耗时(秒)", "最长耗时(秒)", "最近耗时(秒)"]
+
+    def __init__(self, stats_store, parent=None):
+        super().__init__(parent)
+
+        self.logger = logging.getLogger('news_analyzer.ui.stats_dialog')
+        self.stats_store = stats_store
+
+        self.setWindowTitle("新闻统计")
+        self.setMinimumSize(700, 500)
+        self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
+
+        self._init_ui()
+        self.refresh()
+
+    def _init_ui(self):
+        """初始化UI"""
+        layout = QVBoxLayout(self)
+
+        self.summary_label = QLabel()
+        layout.addWidget(self.summary_label)
+
+        self.tabs = QTabWidget()
+        self.tables = {}
+        for dimension, title, first_header in (('source', "来源", "来源"),
+                                               ('category', "分类", "分类"),
+                                               ('day', "每日", "日期"),
+                                               ('hour', "每小时", "时间")):
+            table = self._create_table([first_header] + self.COUNT_HEADERS)
+            self.tables[dimension] = table
+            self.tabs.addTab(table, title)
+
+        self.fetch_table = self._create_table(self.FETCH_HEADERS)
+        self.tabs.addTab(self.fetch_table, "抓取耗时")
+        layout.addWidget(self.tabs)
+
+        button_layout = QHBoxLayout()
+        button_layout.addStretch()
+
+        refresh_button = QPushButton("刷新")
+        refresh_button.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_button)
+
+        export_button = QPushButton("导出当前表格")
+        export_button.clicked.connect(self._export_current_table)
+        button_layout.addWidget(export_button)
+
+        close_button = QPushButton("关闭")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+
+        layout.addLayout(button_layout)
+
+    def _create_table(self, headers):
+        table = QTableWidget(0, len(headers))
+        table.setHorizontalHeaderLabels(headers)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        table.setSelectionBehavior(QTableWidget.SelectRows)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        return table
+
+    def _fill_table(self, table, rows):
+        table.setRowCount(len(rows))
+        for row, values in enumerate(rows):
+            for column, value in enumerate(values):
+                if isinstance(value, float):
+                    value = f"{value:.2f}"
+                elif value is None:
+                    value = "-"
+                cell = QTableWidgetItem(str(value))
+                if column > 0:
+                    cell.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                table.setItem(row, column, cell)
+
+    def refresh(self):
+        """重新读取统计数据"""
+        try:
+            summary = self.stats_store.summary()
+            self.summary_label.setText(
+                f"共统计 {summary['snapshots']} 次保存，{summary['items']} 条新闻，"
+                f"其中新条目 {summary['new_items']} 条 ({summary['new_ratio']:.1%})，"
+                f"重复 {summary['repeat_items']} 条，不同新闻 {summary['unique_items']} 条"
+            )
+
+            for dimension, table in self.tables.items():
+                counts = self.stats_store.counts(dimension)
+                # 时间维度最新的在前
+                if dimension in ('day', 'hour'):
+                    counts.reverse()
+                self._fill_table(table, [
+                    (c['bucket'], c['items'], c['new_items'], c['repeat_items'])
+                    for c in counts
+                ])
+
+            self._fill_table(self.fetch_table, [
+                (f['source'], f['fetches'], f['failures'], f['items'],
+                 f['avg_seconds'], f['max_seconds'], f['last_seconds'])
+                for f in self.stats_store.fetch_latencies()
+            ])
+        except Exception as e:
+            self.logger.error(f"读取统计数据失败: {str(e)}")
+            self.summary_label.setText(f"读取统计数据失败: {str(e)}")
+
+    def _export_current_table(self):
+        """将当前标签页的表格导出为CSV"""
+        table = self.tabs.currentWidget()
+        title = self.tabs.tabText(self.tabs.currentIndex())
+
+        filepath, _ = QFileDialog.getSaveFileName(
+            self, "导出统计", f"新闻统计_{title}.csv", "CSV文件 (*.csv)"
+        )
+        if not filepath:
+            return
+
+        try:
+            # 使用带BOM的UTF-8，便于Excel直接打开
+            with open(filepath, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow([
+                    table.horizontalHeaderItem(column).text()
+                    for column in range(table.columnCount())
+                ])
+                for row in range(table.rowCount()):
+                    writer.writerow([
+                        table.item(row, column).text() if table.item(row, column) else ''
+                        for column in range(table.columnCount())
+                    ])
+            self.logger.info(f"导出统计到 {filepath}")
+        except Exception as e:
+            QMessageBox.critical(self, "导出失败", f"无法导出统计: {str(e)}")
+            self.logger.error(f"导出统计失败: {str(e)}")